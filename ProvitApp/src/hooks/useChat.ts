@@ -1,7 +1,8 @@
 import { useState, useCallback, useEffect } from 'react';
 import { ChatSession, ChatMode } from '../types/chat';
-import { openAIService } from '../services/openai';
+import { newIdempotencyKey, openAIService, resetConversationSession } from '../services/openai';
 import { chatStorage, generateId } from '../services/chatStorage';
+import { sendMessageOverSocket, closeChatSocket } from '../services/chatSocket';
 
 interface ChatState {
   currentChat: ChatSession | null;
@@ -63,6 +64,7 @@ export const useChat = () => {
 
   const deleteChat = useCallback((chatId: string) => {
     setState(prev => {
+      closeChatSocket(chatId);
       const updatedHistory = prev.chatHistory.filter(chat => chat.id !== chatId);
       const newCurrentChat = prev.currentChat?.id === chatId 
         ? (updatedHistory.length > 0 ? updatedHistory[0] : null)
@@ -213,11 +215,30 @@ export const useChat = () => {
         { role: 'user' as const, content }
       ];
 
-      const aiResponse = await openAIService.sendMessage(
-        conversationHistory, 
-        currentChatSnapshot.mode, 
-        currentChatSnapshot.roastLevel
-      );
+      // The server may still be answering the socket frame when we fall back;
+      // the shared key makes the HTTP request wait for that reply.
+      const idempotencyKey = newIdempotencyKey();
+      let aiResponse: string;
+      try {
+        // Persistent per-chat socket; partial text streams into the bubble.
+        aiResponse = await sendMessageOverSocket(
+          currentChatSnapshot.id,
+          conversationHistory,
+          currentChatSnapshot.mode,
+          currentChatSnapshot.roastLevel,
+          partial => updateMessage(typingId, partial, false),
+          idempotencyKey
+        );
+      } catch (socketError) {
+        console.warn('WebSocket send failed, falling back to HTTP:', socketError);
+        aiResponse = await openAIService.sendMessage(
+          conversationHistory, 
+          currentChatSnapshot.mode, 
+          currentChatSnapshot.roastLevel,
+          currentChatSnapshot.id,
+          idempotencyKey
+        );
+      }
       
       // Update the typing message with actual response
       updateMessage(typingId, aiResponse, false);
@@ -254,6 +275,9 @@ export const useChat = () => {
     setState(prev => {
       if (!prev.currentChat) return prev;
 
+      // The backend session still holds the old turns; reseed on next send.
+      resetConversationSession(prev.currentChat.id);
+
       const clearedChat = {
         ...prev.currentChat,
         messages: [],
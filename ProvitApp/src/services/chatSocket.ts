@@ -0,0 +1,169 @@
+import { ChatMode } from '../types/chat';
+import { isConversationSynced, markConversationSynced, resetConversationSession } from './openai';
+
+const WS_URL = 'wss://convince.dotverse.tech/api/ws';
+const REPLY_TIMEOUT_MS = 90000;
+
+type HistoryMessage = {role: 'user' | 'assistant' | 'system', content: string};
+
+interface PendingReply {
+  resolve: (message: string) => void;
+  reject: (error: Error) => void;
+  onDelta?: (partial: string) => void;
+  partial: string;
+  timer: ReturnType<typeof setTimeout>;
+  retry?: () => void;
+}
+
+// One persistent connection per chat. Replies stream back as compact frames:
+// {t:'d', c} deltas, then {t:'done', m} with the final cleaned-up message.
+class ChatSocket {
+  private ws: WebSocket | null = null;
+  private opening: Promise<WebSocket> | null = null;
+  private pending = new Map<string, PendingReply>();
+  private nextId = 0;
+
+  constructor(private conversationId: string) {}
+
+  private connect(): Promise<WebSocket> {
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+      return Promise.resolve(this.ws);
+    }
+    if (this.opening) {
+      return this.opening;
+    }
+
+    this.opening = new Promise((resolve, reject) => {
+      const ws = new WebSocket(`${WS_URL}?c=${encodeURIComponent(this.conversationId)}`);
+      ws.onopen = () => {
+        this.ws = ws;
+        this.opening = null;
+        resolve(ws);
+      };
+      ws.onerror = () => {
+        this.opening = null;
+        reject(new Error('WebSocket connection failed'));
+      };
+      ws.onclose = () => {
+        this.ws = null;
+        this.opening = null;
+        this.failAll(new Error('WebSocket closed'));
+      };
+      ws.onmessage = event => this.handleFrame(event.data);
+    });
+    return this.opening;
+  }
+
+  private handleFrame(raw: string) {
+    let frame: any;
+    try {
+      frame = JSON.parse(raw);
+    } catch {
+      return;
+    }
+
+    const pending = frame.id ? this.pending.get(frame.id) : undefined;
+    if (frame.t === 'd' && pending) {
+      pending.partial += frame.c;
+      pending.onDelta?.(pending.partial);
+    } else if (frame.t === 'done' && pending) {
+      this.settle(frame.id);
+      markConversationSynced(this.conversationId);
+      pending.resolve(frame.m);
+    } else if (frame.t === 'err' && pending) {
+      if (frame.code === 'session_expired' && pending.retry) {
+        // Backend lost the session; resend once with the full history.
+        resetConversationSession(this.conversationId);
+        const retry = pending.retry;
+        pending.retry = undefined;
+        retry();
+        return;
+      }
+      this.settle(frame.id);
+      pending.reject(new Error(frame.e || 'WebSocket request failed'));
+    }
+    // 'hb' heartbeats and 'pong' frames only keep the connection warm.
+  }
+
+  private settle(id: string) {
+    const pending = this.pending.get(id);
+    if (pending) {
+      clearTimeout(pending.timer);
+      this.pending.delete(id);
+    }
+  }
+
+  private failAll(error: Error) {
+    this.pending.forEach((pending, id) => {
+      this.settle(id);
+      pending.reject(error);
+    });
+  }
+
+  async send(
+    history: Array<HistoryMessage>,
+    mode: ChatMode,
+    roastLevel: number,
+    onDelta?: (partial: string) => void,
+    idempotencyKey?: string
+  ): Promise<string> {
+    const ws = await this.connect();
+    const id = `${Date.now()}_${this.nextId++}`;
+    const latest = history[history.length - 1];
+
+    return new Promise((resolve, reject) => {
+      const sendFrame = (fullHistory: boolean) => {
+        ws.send(JSON.stringify({
+          t: 'chat',
+          id,
+          mode,
+          r: roastLevel,
+          ...(idempotencyKey ? { k: idempotencyKey } : {}),
+          ...(fullHistory ? { h: history } : { m: latest.content })
+        }));
+      };
+
+      const synced = isConversationSynced(this.conversationId);
+      this.pending.set(id, {
+        resolve,
+        reject,
+        onDelta,
+        partial: '',
+        timer: setTimeout(() => {
+          this.settle(id);
+          reject(new Error('WebSocket reply timed out'));
+        }, REPLY_TIMEOUT_MS),
+        retry: synced ? () => sendFrame(true) : undefined,
+      });
+      sendFrame(!synced);
+    });
+  }
+
+  close() {
+    this.ws?.close();
+    this.ws = null;
+  }
+}
+
+const sockets = new Map<string, ChatSocket>();
+
+export const sendMessageOverSocket = (
+  conversationId: string,
+  history: Array<HistoryMessage>,
+  mode: ChatMode,
+  roastLevel: number,
+  onDelta?: (partial: string) => void,
+  idempotencyKey?: string
+): Promise<string> => {
+  let socket = sockets.get(conversationId);
+  if (!socket) {
+    socket = new ChatSocket(conversationId);
+    sockets.set(conversationId, socket);
+  }
+  return socket.send(history, mode, roastLevel, onDelta, idempotencyKey);
+};
+
+export const closeChatSocket = (conversationId: string) => {
+  sockets.get(conversationId)?.close();
+  sockets.delete(conversationId);
+};
@@ -2,34 +2,110 @@ import { ChatMode } from '../types/chat';
 
 const API_BASE_URL = 'https://convince.dotverse.tech/api';
 
+type ChatHistoryMessage = {role: 'user' | 'assistant' | 'system', content: string};
+
+// Conversations the backend already holds a session for in this app run.
+// Those only upload the new user message; everything else sends full history.
+const syncedConversations = new Set<string>();
+
+export const resetConversationSession = (conversationId: string) => {
+  syncedConversations.delete(conversationId);
+};
+
+export const isConversationSynced = (conversationId: string) => syncedConversations.has(conversationId);
+
+export const markConversationSynced = (conversationId: string) => {
+  syncedConversations.add(conversationId);
+};
+
+// One key per user message, shared by the WebSocket frame and the HTTP
+// fallback so a retry on either transport never runs the message twice.
+export const newIdempotencyKey = () =>
+  `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+
+const IN_PROGRESS_RETRIES = 3;
+
+const postChat = async (body: object, idempotencyKey: string) => {
+  const send = () => fetch(`${API_BASE_URL}/chat`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Idempotency-Key': idempotencyKey,
+    },
+    body: JSON.stringify(body),
+  });
+
+  let response;
+  try {
+    response = await send();
+  } catch {
+    // The first POST may have reached the backend before the network dropped;
+    // the same key makes this retry pick up that reply instead of a new one.
+    response = await send();
+  }
+
+  let data = await response.json().catch(() => ({}));
+  // Another request with this key is still running; wait and ask again for
+  // its reply rather than starting a second one.
+  for (let attempt = 0; attempt < IN_PROGRESS_RETRIES && response.status === 409
+      && data.code === 'idempotency_in_progress'; attempt++) {
+    const retryAfter = Number(response.headers.get('Retry-After')) || 5;
+    await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+    response = await send();
+    data = await response.json().catch(() => ({}));
+  }
+  return { response, data };
+};
+
 export const sendMessage = async (
-  messages: Array<{role: 'user' | 'assistant' | 'system', content: string}>,
+  messages: Array<ChatHistoryMessage>,
   mode: ChatMode,
-  roastLevel: number
+  roastLevel: number,
+  conversationId?: string,
+  idempotencyKey: string = newIdempotencyKey()
 ) => {
   try {
-    const response = await fetch(`${API_BASE_URL}/chat`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({
-        messages,
+    let result;
+    const latestMessage = messages[messages.length - 1];
+
+    if (conversationId && syncedConversations.has(conversationId) && latestMessage) {
+      result = await postChat({
+        conversationId,
+        message: latestMessage,
         mode,
         roastLevel
-      }),
-    });
+      }, idempotencyKey);
+
+      // Session expired or lives elsewhere: fall back to a full upload below.
+      if (result.response.status === 409 && result.data.code === 'session_expired') {
+        syncedConversations.delete(conversationId);
+        result = undefined;
+      }
+    }
+
+    if (!result) {
+      result = await postChat({
+        messages,
+        mode,
+        roastLevel,
+        ...(conversationId ? { conversationId } : {})
+      }, idempotencyKey);
+    }
+
+    const { response, data } = result;
 
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
-
-    const data = await response.json();
     
     if (!data.success) {
       throw new Error(data.error || 'Failed to get response from server');
     }
 
+    if (conversationId) {
+      syncedConversations.add(conversationId);
+    }
+
     return data.message;
   } catch (error) {
     console.error('Backend API Error:', error);
@@ -137,10 +213,12 @@ export class OpenAIService {
   async sendMessage(
     messages: Array<{role: 'user' | 'assistant' | 'system'; content: string}>, 
     mode: ChatMode, 
-    roastLevel: number = 5
+    roastLevel: number = 5,
+    conversationId?: string,
+    idempotencyKey?: string
   ): Promise<string> {
     try {
-      return await sendMessage(messages, mode, roastLevel);
+      return await sendMessage(messages, mode, roastLevel, conversationId, idempotencyKey);
     } catch (error) {
       console.error('OpenAI Service Error:', error);
       // Return a mock response as fallback
@@ -1,14 +1,36 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from limits import parse as parse_rate_limit
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
 import os
 import asyncio
 import threading
 import time
 import logging
+import random
+import contextvars
 import json
 import re
+import hashlib
+import hmac
+import sys
+import sqlite3
+import gzip
+import gc
+import tracemalloc
+import importlib.util
+import bisect
+import tempfile
+import shutil
+import mmap
+import struct
+from contextlib import contextmanager, suppress
 from typing import Any
 from html.parser import HTMLParser
 import html
@@ -17,37 +39,602 @@ import xml.etree.ElementTree as ET
 from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 import queue
-from threading import Thread, Event
-from collections import deque
+from threading import Event
+from collections import deque, OrderedDict
 import weakref
+import socket
+import http.client
 from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
-from urllib.request import Request, urlopen
+from urllib.request import Request, urlopen, build_opener, HTTPHandler, HTTPSHandler
 from urllib.error import HTTPError, URLError
 from urllib.parse import quote_plus, quote
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Windows dev server: the upstream limiter stays per process
+    fcntl = None
+
 # Load environment variables
 load_dotenv()
 
+# JSON codec: orjson when installed, stdlib otherwise. Every hot-path encode
+# and decode goes through these so the backend is chosen in one place.
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _json_dumps_bytes(obj, default=None) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _json_dumps(obj, default=None) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":"))
+
+
+def _json_loads(data):
+    """Parse JSON from bytes or str; bytes are parsed directly without decoding first."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class _FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by the codec above (jsonify, request.get_json)."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.get("indent"):
+            return super().dumps(obj, **kwargs)
+        return _json_dumps(obj, default=self.default)
+
+    def loads(self, s, **kwargs):
+        return _json_loads(s)
+
+    def response(self, *args, **kwargs):
+        if self._app.debug or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(_json_dumps_bytes(obj, default=self.default), mimetype=self.mimetype)
+
+
 app = Flask(__name__)
+app.json = _FastJSONProvider(app)
 CORS(app, origins="*")
 
 # Configuration
 OPENROUTER_TIMEOUT_ASYNC = 60
 OPENROUTER_TIMEOUT_SYNC = 75
 OPENROUTER_RETRY_ATTEMPTS = 2
-OPENROUTER_RETRY_DELAY = 2
+# Retry backoff is decorrelated jitter between these bounds (see _retry_delay).
+OPENROUTER_RETRY_BASE_DELAY = float(os.getenv("OPENROUTER_RETRY_BASE_DELAY", "0.5"))
+OPENROUTER_RETRY_MAX_DELAY = float(os.getenv("OPENROUTER_RETRY_MAX_DELAY", "8"))
+
+# Logging. LOG_MODE=queue (default) hands records to a native writer thread so
+# stdout/stderr writes never run inside a request greenlet; LOG_MODE=sync
+# writes inline. LOG_FORMAT=kv|json. LOG_SAMPLE_RATES="chat=0.1,web-search=0.5"
+# samples INFO/DEBUG records per category; warnings and errors always pass.
+LOG_MODE = os.getenv("LOG_MODE", "queue").lower()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "kv").lower()
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))
+
+
+def _parse_sample_rates(raw):
+    rates = {}
+    for part in (raw or "").split(","):
+        if "=" not in part:
+            continue
+        category, rate = part.split("=", 1)
+        try:
+            rates[category.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+LOG_SAMPLE_RATES = _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+
+def _log_fields(category, **fields):
+    """extra= payload for a structured record: a category plus key/value fields."""
+    return {"category": category, "fields": fields}
+
+
+def _native_attr(module_name, attr):
+    """The un-monkey-patched object under gevent, the regular one otherwise."""
+    try:
+        from gevent import monkey
+
+        if monkey.is_module_patched(module_name):
+            return monkey.get_original(module_name, attr)
+    except ImportError:
+        pass
+    return getattr(importlib.import_module(module_name), attr)
+
+
+class _StructuredFormatter(logging.Formatter):
+    def __init__(self, fmt_kind):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+        self.fmt_kind = fmt_kind
+
+    def format(self, record):
+        fields = getattr(record, "fields", None) or {}
+        category = getattr(record, "category", None)
+        if self.fmt_kind == "json":
+            entry = {
+                "ts": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "msg": record.getMessage(),
+            }
+            if category:
+                entry["category"] = category
+            trace_id = getattr(record, "trace_id", None)
+            if trace_id:
+                entry["trace_id"] = trace_id
+            entry.update(fields)
+            if record.exc_info and not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+            if record.exc_text:
+                entry["exc"] = record.exc_text
+            return _json_dumps(entry, default=str)
+
+        line = super().format(record)
+        extras = []
+        if category:
+            extras.append(f"category={category}")
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            extras.append(f"trace={trace_id}")
+        extras.extend(f"{key}={value}" for key, value in fields.items())
+        if extras:
+            head, sep, tail = line.partition("\n")
+            line = f"{head} {' '.join(extras)}{sep}{tail}"
+        return line
+
+
+# (trace_id, current span_id, sampled) for the request being handled; see
+# the tracing section below for how it crosses the queue and executor hops.
+_trace_context = contextvars.ContextVar("trace_context", default=None)
+
+
+class _TraceIdFilter(logging.Filter):
+    """Stamp the active trace ID on records; runs on the caller, before the queue hop."""
+
+    def filter(self, record):
+        trace = _trace_context.get()
+        if trace is not None:
+            record.trace_id = trace[0]
+        return True
+
+
+class _CategorySampler(logging.Filter):
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not LOG_SAMPLE_RATES:
+            return True
+        rate = LOG_SAMPLE_RATES.get(getattr(record, "category", None) or "default")
+        return rate is None or random.random() < rate
+
+
+class _BackgroundLogHandler(logging.Handler):
+    """Enqueue records for a native writer thread; format off the request path.
+
+    The writer is started lazily per process so it survives gunicorn's fork.
+    """
+
+    def __init__(self, target):
+        super().__init__()
+        self.target = target
+        self.queue = _native_attr("queue", "SimpleQueue")()
+        self.dropped = 0
+        self._writer_pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_writer(self):
+        if self._writer_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._writer_pid != os.getpid():
+                _native_attr("_thread", "start_new_thread")(self._drain, ())
+                self._writer_pid = os.getpid()
+
+    def emit(self, record):
+        try:
+            self._ensure_writer()
+            if self.queue.qsize() >= LOG_QUEUE_MAX:
+                self.dropped += 1
+                return
+            if record.exc_info:
+                # Tracebacks pin frames; render them now and drop the references.
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            self.queue.put(record)
+        except Exception:
+            self.handleError(record)
+
+    def _drain(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                break
+            try:
+                self.target.handle(record)
+            except Exception:
+                pass
+
+    def flush(self):
+        deadline = time.time() + 2
+        while not self.queue.empty() and time.time() < deadline:
+            time.sleep(0.01)
+        self.target.flush()
 
-logging.basicConfig(level=logging.INFO)
+
+def _configure_logging():
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(_StructuredFormatter(LOG_FORMAT))
+
+    handler = _BackgroundLogHandler(stream_handler) if LOG_MODE == "queue" else stream_handler
+    handler.addFilter(_CategorySampler())
+    handler.addFilter(_TraceIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+    return handler
+
+
+log_handler = _configure_logging()
 logger = logging.getLogger(__name__)
 
+
+def _logging_snapshot():
+    snapshot = {
+        'mode': LOG_MODE,
+        'format': LOG_FORMAT,
+        'sample_rates': LOG_SAMPLE_RATES,
+    }
+    if isinstance(log_handler, _BackgroundLogHandler):
+        snapshot['queue_depth'] = log_handler.queue.qsize()
+        snapshot['dropped'] = log_handler.dropped
+    return snapshot
+
+
+# Per-stage latency histograms. Fixed buckets (upper bounds in ms) keep
+# observe() to a bisect and an increment. A background thread in each worker
+# writes its counts to STAGE_METRICS_DIR/<pid>.json every
+# STAGE_METRICS_FLUSH_SECONDS; /api/metrics merges every live worker's file,
+# so the numbers cover the whole gunicorn instance. gunicorn.conf.py clears
+# the directory on startup and files of exited workers are dropped on merge.
+STAGE_BUCKETS_MS = (
+    1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000, 40000, 80000, 160000
+)
+STAGE_METRICS_DIR = os.getenv(
+    "STAGE_METRICS_DIR", os.path.join(tempfile.gettempdir(), "convince-stage-metrics")
+)
+STAGE_METRICS_FLUSH_SECONDS = float(os.getenv("STAGE_METRICS_FLUSH_SECONDS", "5"))
+
+
+class _StageHistograms:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.sums = {}
+
+    def observe(self, stage, elapsed_ms):
+        index = bisect.bisect_left(STAGE_BUCKETS_MS, elapsed_ms)
+        with self.lock:
+            counts = self.counts.get(stage)
+            if counts is None:
+                counts = self.counts[stage] = [0] * (len(STAGE_BUCKETS_MS) + 1)
+                self.sums[stage] = 0.0
+            counts[index] += 1
+            self.sums[stage] += elapsed_ms
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                stage: {"counts": list(counts), "sum_ms": self.sums[stage]}
+                for stage, counts in self.counts.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+            self.sums.clear()
+
+
+_stage_histograms = _StageHistograms()
+
+
+def _record_stage_latency(stage, started):
+    _stage_histograms.observe(stage, (time.perf_counter() - started) * 1000)
+
+
+def _observe_stage(stage, started):
+    """Record a stage that began at perf_counter() `started`: histogram sample plus trace span."""
+    _record_stage_latency(stage, started)
+    _record_span(stage, started)
+
+
+@contextmanager
+def _stage_timer(stage):
+    started = time.perf_counter()
+    try:
+        with _trace_span(stage):
+            yield
+    finally:
+        _record_stage_latency(stage, started)
+
+
+def _timed_call(stage, fn, *args):
+    with _stage_timer(stage):
+        return fn(*args)
+
+
+def _publish_stage_histograms():
+    try:
+        os.makedirs(STAGE_METRICS_DIR, exist_ok=True)
+        path = os.path.join(STAGE_METRICS_DIR, f"{os.getpid()}.json")
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{os.getpid()}.", suffix=".tmp", dir=STAGE_METRICS_DIR)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_json_dumps_bytes({
+                    "buckets_ms": list(STAGE_BUCKETS_MS),
+                    "stages": _stage_histograms.snapshot(),
+                }))
+            os.replace(tmp_path, path)
+        except OSError:
+            with suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        logger.warning(f"Stage metrics publish failed: {str(e)}")
+
+
+def start_stage_metrics_publisher():
+    """Publish this worker's histograms every STAGE_METRICS_FLUSH_SECONDS, off the request path."""
+    if STAGE_METRICS_FLUSH_SECONDS <= 0:
+        return
+
+    def publish():
+        while not shutdown_event.is_set():
+            time.sleep(STAGE_METRICS_FLUSH_SECONDS)
+            _publish_stage_histograms()
+
+    threading.Thread(target=publish, daemon=True, name="stage-metrics").start()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # EPERM and friends: the process exists, we just can't signal it.
+        return True
+    return True
+
+
+def _merged_stage_histograms():
+    """This worker's live counts plus the last published counts of every other worker."""
+    merged = _stage_histograms.snapshot()
+    workers = 1
+    own_file = f"{os.getpid()}.json"
+    try:
+        names = os.listdir(STAGE_METRICS_DIR)
+    except OSError:
+        names = []
+
+    for name in names:
+        pid = name.split(".", 1)[0]
+        if pid.isdigit() and not _pid_alive(int(pid)):
+            # A recycled or crashed worker; its counts and temp files go.
+            with suppress(OSError):
+                os.unlink(os.path.join(STAGE_METRICS_DIR, name))
+            continue
+        if name == own_file or not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(STAGE_METRICS_DIR, name), "rb") as f:
+                data = _json_loads(f.read())
+        except (OSError, ValueError):
+            continue
+        if data.get("buckets_ms") != list(STAGE_BUCKETS_MS):
+            continue
+        workers += 1
+        for stage, hist in (data.get("stages") or {}).items():
+            target = merged.setdefault(stage, {"counts": [0] * (len(STAGE_BUCKETS_MS) + 1), "sum_ms": 0.0})
+            target["counts"] = [a + b for a, b in zip(target["counts"], hist["counts"])]
+            target["sum_ms"] += hist["sum_ms"]
+    return merged, workers
+
+
+def _histogram_percentile(counts, q):
+    """Upper bound of the bucket holding the q-th sample; overflow reports the last bound."""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    running = 0
+    for index, count in enumerate(counts):
+        running += count
+        if running >= rank:
+            return STAGE_BUCKETS_MS[min(index, len(STAGE_BUCKETS_MS) - 1)]
+    return STAGE_BUCKETS_MS[-1]
+
+
+def _stage_latency_snapshot():
+    merged, workers = _merged_stage_histograms()
+    stages = {}
+    for stage, hist in sorted(merged.items()):
+        count = sum(hist["counts"])
+        stages[stage] = {
+            "count": count,
+            "avg_ms": round(hist["sum_ms"] / count, 1) if count else 0,
+            "p50_ms": _histogram_percentile(hist["counts"], 0.50),
+            "p95_ms": _histogram_percentile(hist["counts"], 0.95),
+            "p99_ms": _histogram_percentile(hist["counts"], 0.99),
+        }
+    return {"workers": workers, "stages": stages}
+
+
+def _stage_latency_prometheus():
+    merged, _ = _merged_stage_histograms()
+    lines = [
+        "# HELP convince_stage_latency_ms Request stage latency in milliseconds.",
+        "# TYPE convince_stage_latency_ms histogram",
+    ]
+    for stage, hist in sorted(merged.items()):
+        running = 0
+        for bound, count in zip(STAGE_BUCKETS_MS, hist["counts"]):
+            running += count
+            lines.append(f'convince_stage_latency_ms_bucket{{stage="{stage}",le="{bound}"}} {running}')
+        total = sum(hist["counts"])
+        lines.append(f'convince_stage_latency_ms_bucket{{stage="{stage}",le="+Inf"}} {total}')
+        lines.append(f'convince_stage_latency_ms_sum{{stage="{stage}"}} {hist["sum_ms"]:.3f}')
+        lines.append(f'convince_stage_latency_ms_count{{stage="{stage}"}} {total}')
+    return "\n".join(lines) + "\n"
+
+
+# Request tracing. Each chat request (HTTP or WebSocket frame) starts a trace
+# whose context lives in _trace_context. Greenlets and asyncio tasks get their
+# own copy; the two hops that would lose it are handed the context explicitly:
+# request_queue entries carry a copied Context that run_processor uses for the
+# task, and _run_in_executor runs pool work inside a copy of the caller's
+# context. Stage timers double as spans. With TRACE_FILE set, finished spans of
+# TRACE_SAMPLE_RATE of traces are written as JSON lines by the log writer.
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+
+
+class _JSONLineFormatter(logging.Formatter):
+    def format(self, record):
+        return _json_dumps(record.msg, default=str)
+
+
+def _configure_jsonl_sink(path, name):
+    """Logger that appends each dict it is given to path as one JSON line."""
+    if not path:
+        return None
+    file_handler = logging.FileHandler(path, encoding="utf-8")
+    file_handler.setFormatter(_JSONLineFormatter())
+    handler = _BackgroundLogHandler(file_handler) if LOG_MODE == "queue" else file_handler
+
+    sink = logging.getLogger(name)
+    sink.handlers = [handler]
+    sink.propagate = False
+    sink.setLevel(logging.INFO)
+    return sink
+
+
+trace_sink = _configure_jsonl_sink(TRACE_FILE, "convince.trace")
+
+
+def _start_trace(name, traceparent=None):
+    """Begin a trace for this request; returns a handle for _finish_trace.
+
+    A valid W3C traceparent header keeps the caller's trace ID.
+    """
+    trace_id = None
+    if traceparent:
+        parts = traceparent.strip().split("-")
+        if len(parts) == 4 and len(parts[1]) == 32:
+            trace_id = parts[1]
+    trace_id = trace_id or os.urandom(16).hex()
+    span_id = os.urandom(8).hex()
+    sampled = trace_sink is not None and random.random() < TRACE_SAMPLE_RATE
+    _trace_context.set((trace_id, span_id, sampled))
+    return {"name": name, "trace_id": trace_id, "span_id": span_id, "sampled": sampled,
+            "started": time.perf_counter()}
+
+
+def _finish_trace(handle, **attrs):
+    if handle["sampled"]:
+        _write_span(handle["trace_id"], handle["span_id"], None, handle["name"], handle["started"], None, attrs)
+    _trace_context.set(None)
+
+
+def _write_span(trace_id, span_id, parent_id, name, started, error, attrs):
+    now = time.perf_counter()
+    span = {
+        "trace_id": trace_id,
+        "span_id": span_id,
+        "parent_id": parent_id,
+        "name": name,
+        "start": round(time.time() - (now - started), 6),
+        "duration_ms": round((now - started) * 1000, 3),
+        "thread": threading.current_thread().name,
+    }
+    if error:
+        span["error"] = error
+    if attrs:
+        span["attrs"] = attrs
+    trace_sink.info(span)
+
+
+def _record_span(name, started, **attrs):
+    """Leaf span for work that already finished, under the current span."""
+    trace = _trace_context.get()
+    if trace is not None and trace[2]:
+        _write_span(trace[0], os.urandom(8).hex(), trace[1], name, started, None, attrs)
+
+
+@contextmanager
+def _trace_span(name, **attrs):
+    trace = _trace_context.get()
+    if trace is None or not trace[2]:
+        yield
+        return
+
+    trace_id, parent_id, _ = trace
+    span_id = os.urandom(8).hex()
+    token = _trace_context.set((trace_id, span_id, True))
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _trace_context.reset(token)
+        _write_span(trace_id, span_id, parent_id, name, started, error, attrs)
+
+
+def _run_in_executor(pool, fn, *args):
+    """loop.run_in_executor that runs fn inside a copy of the caller's context."""
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(pool, contextvars.copy_context().run, fn, *args)
+
+
+# Load tests drive the backend from one address; they turn the limiter off.
+app.config["RATELIMIT_ENABLED"] = os.getenv("RATELIMIT_ENABLED", "true").lower() == "true"
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour", "10 per minute"],
-    storage_uri="memory://",
+    # memory:// counts per worker; redis:// makes the limits host- or fleet-wide.
+    storage_uri=os.getenv("RATELIMIT_STORAGE_URI", "memory://"),
 )
 limiter.init_app(app)
+# Chat budget per remote address, shared by POST /api/chat and WebSocket chat
+# frames (see _take_chat_rate_limit), so switching transport or reconnecting
+# doesn't reset it.
+CHAT_RATE_LIMIT = os.getenv("CHAT_RATE_LIMIT", "10 per minute")
+CHAT_RATE_LIMIT_SCOPE = "chat"
 
 # API config
 API_KEY = os.getenv("OPENROUTER_API_KEY", "")
@@ -56,15 +643,44 @@ API_MODEL = os.getenv("OPENROUTER_MODEL", "google/gemini-3-flash-preview")
 ENABLE_LANGCHAIN_TOOLS = os.getenv("ENABLE_LANGCHAIN_TOOLS", "false").lower() == "true"
 LANGCHAIN_MAX_TOOL_ROUNDS = int(os.getenv("LANGCHAIN_MAX_TOOL_ROUNDS", "3"))
 
-LANGCHAIN_AVAILABLE = False
-try:
-    from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
-    from langchain_core.tools import tool
-    from langchain_openai import ChatOpenAI
+# LangChain pulls in pydantic, openai and tiktoken, so it is only imported on
+# first real use. Availability is checked via find_spec, which does not import.
+LANGCHAIN_AVAILABLE = all(
+    importlib.util.find_spec(name) is not None
+    for name in ("langchain_core", "langchain_openai")
+)
+HumanMessage = AIMessage = SystemMessage = ToolMessage = None
+tool = None
+ChatOpenAI = None
+_langchain_loaded = False
+_langchain_import_lock = threading.Lock()
+
+
+def _load_langchain():
+    """Import the LangChain stack on first use. Returns False if unavailable."""
+    global LANGCHAIN_AVAILABLE, _langchain_loaded
+    global HumanMessage, AIMessage, SystemMessage, ToolMessage, tool, ChatOpenAI
+    if _langchain_loaded or not LANGCHAIN_AVAILABLE:
+        return LANGCHAIN_AVAILABLE
+
+    with _langchain_import_lock:
+        if _langchain_loaded:
+            return LANGCHAIN_AVAILABLE
+        started_at = time.perf_counter()
+        try:
+            from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
+            from langchain_core.tools import tool
+            from langchain_openai import ChatOpenAI
+        except Exception as langchain_import_error:
+            LANGCHAIN_AVAILABLE = False
+            logger.warning(f"LangChain imports unavailable: {str(langchain_import_error)}")
+        else:
+            logger.info(
+                f"LangChain imported lazily in {(time.perf_counter() - started_at) * 1000:.0f}ms"
+            )
+        _langchain_loaded = True
+    return LANGCHAIN_AVAILABLE
 
-    LANGCHAIN_AVAILABLE = True
-except Exception as langchain_import_error:
-    logger.warning(f"LangChain imports unavailable: {str(langchain_import_error)}")
 
 if not API_KEY:
     logger.warning("OPENROUTER_API_KEY not found in environment variables")
@@ -88,53 +704,1005 @@ def _extract_content(content: str) -> str:
     return content.strip(' \n\t[]')
 
 
-def _call_proxy(messages: list) -> str:
-    """Send a chat request via plain HTTP to the HackClub proxy."""
-    if not API_KEY or not API_KEY.strip():
-        raise PermissionError("OPENROUTER_API_KEY is missing or empty")
+def _build_proxy_request(messages: list, target, stream: bool = False) -> Request:
+    if not target.api_key or not target.api_key.strip():
+        raise PermissionError(f"API key for upstream {target.name} is missing or empty")
 
-    url = f"{API_BASE_URL}/chat/completions"
+    url = f"{target.base_url}/chat/completions"
     payload = {
-        "model": API_MODEL,
+        "model": target.model,
         "messages": messages,
     }
-    body = json.dumps(payload).encode("utf-8")
-
-    req = Request(url=url, data=body, method="POST", headers={
-        "Authorization": f"Bearer {API_KEY}",
+    if stream:
+        payload["stream"] = True
+        # Ask for a final usage chunk; providers that ignore it just omit usage.
+        payload["stream_options"] = {"include_usage": True}
+    body = _json_dumps_bytes(payload)
+
+    return Request(url=url, data=body, method="POST", headers={
+        "Authorization": f"Bearer {target.api_key}",
         "Content-Type": "application/json",
         "User-Agent": "convince-ai-backend/1.0",
     })
 
+
+def _proxy_http_error(e: HTTPError) -> Exception:
+    body_text = ""
     try:
-        with urlopen(req, timeout=60) as response:
-            data = json.loads(response.read().decode("utf-8"))
-    except HTTPError as e:
+        body_text = e.read().decode("utf-8", errors="replace")
+    except Exception:
         body_text = ""
+
+    if e.code == 403:
+        return PermissionError(
+            f"Provider rejected the request (403). Check OPENROUTER_API_KEY, OPENROUTER_SERVER_URL, and OPENROUTER_MODEL. Response: {body_text[:400]}"
+        )
+
+    return RuntimeError(
+        f"Upstream HTTP error {e.code}: {body_text[:400]}"
+    )
+
+
+# Adaptive upstream concurrency. Every worker on the host shares one limit and
+# one in-flight count through a small mmap'd file (UPSTREAM_LIMITER_FILE), so
+# six workers with ten pool threads each can't pile 60 calls onto the provider.
+# The limit follows AIMD: an overload signal (429, 5xx, timeout, network error)
+# cuts it by UPSTREAM_LIMIT_BACKOFF at most once per round trip, short-term
+# latency rising past UPSTREAM_LATENCY_TOLERANCE x the long-term EWMA trims
+# it by 5%, and successes while at least half the limit is in use grow it by
+# about one per limit's worth of calls. A call that finds the limit full waits
+# up to UPSTREAM_LIMIT_WAIT_SECONDS for a slot, then fails with UpstreamBusyError.
+UPSTREAM_LIMITER_ENABLED = os.getenv("UPSTREAM_LIMITER", "on").lower() != "off"
+UPSTREAM_LIMITER_FILE = os.getenv(
+    "UPSTREAM_LIMITER_FILE",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "convince-upstream-limiter"),
+)
+UPSTREAM_LIMIT_INITIAL = float(os.getenv("UPSTREAM_LIMIT_INITIAL", "20"))
+UPSTREAM_LIMIT_MIN = float(os.getenv("UPSTREAM_LIMIT_MIN", "2"))
+UPSTREAM_LIMIT_MAX = float(os.getenv("UPSTREAM_LIMIT_MAX", "60"))
+UPSTREAM_LIMIT_BACKOFF = float(os.getenv("UPSTREAM_LIMIT_BACKOFF", "0.7"))
+UPSTREAM_LATENCY_TOLERANCE = float(os.getenv("UPSTREAM_LATENCY_TOLERANCE", "2.0"))
+UPSTREAM_LIMIT_WAIT_SECONDS = float(os.getenv("UPSTREAM_LIMIT_WAIT_SECONDS", "5"))
+
+
+class UpstreamBusyError(RuntimeError):
+    """The host-wide upstream concurrency limit stayed full for the whole wait."""
+
+
+class UpstreamUnavailableError(RuntimeError):
+    """The upstream circuit breaker is open, so the call was not attempted."""
+
+
+def _upstream_status(exc):
+    # urllib errors carry .code; the openai client's (LangChain path) .status_code.
+    cause = exc.__cause__ or exc
+    if isinstance(cause, HTTPError):
+        return cause.code
+    status = getattr(cause, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _is_upstream_overload(exc):
+    status = _upstream_status(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    cause = exc.__cause__ or exc
+    return (
+        isinstance(cause, (URLError, TimeoutError, ConnectionError))
+        or type(cause).__name__ in ("APIConnectionError", "APITimeoutError")
+    )
+
+
+def _is_retriable(exc):
+    """Whether another attempt could succeed. Auth errors, bad requests and our
+    own limiter or breaker refusing the call never will."""
+    if isinstance(exc, (PermissionError, UpstreamBusyError, UpstreamUnavailableError)):
+        return False
+    if isinstance(exc, ValueError):
+        # Empty or unparseable reply.
+        return True
+    status = _upstream_status(exc)
+    if status is not None:
+        return status in (408, 425, 429) or status >= 500
+    return _is_upstream_overload(exc)
+
+
+def _retry_after_seconds(exc):
+    cause = exc.__cause__ or exc
+    headers = getattr(cause, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(cause, "response", None), "headers", None)
+    value = headers.get("Retry-After") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(exc, previous=None):
+    """Seconds to wait before retrying after exc, or None if retrying can't help.
+
+    Decorrelated jitter: uniform between the base delay and three times the
+    previous delay, capped. A Retry-After from the provider is a floor; one
+    longer than the cap means giving up now rather than holding the request.
+    """
+    if not _is_retriable(exc):
+        return None
+    delay = min(
+        OPENROUTER_RETRY_MAX_DELAY,
+        random.uniform(OPENROUTER_RETRY_BASE_DELAY, (previous or OPENROUTER_RETRY_BASE_DELAY) * 3),
+    )
+    retry_after = _retry_after_seconds(exc)
+    if retry_after is not None:
+        if retry_after > OPENROUTER_RETRY_MAX_DELAY:
+            return None
+        delay = max(delay, retry_after)
+    return delay
+
+
+class _SharedUpstreamLimiter:
+    # magic, version, limit, long_rtt, short_rtt, last_cut, rejections, drops, successes
+    _HEADER = struct.Struct("<4sIddddQQQ")
+    _SLOT = struct.Struct("<iI")  # pid, in-flight calls of that process
+    _SLOTS = 128
+    _MAGIC = b"CVUL"
+
+    def __init__(self, path):
+        self.path = path
+        self.size = self._HEADER.size + self._SLOTS * self._SLOT.size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._mm = None
+        self._slot = None
+
+    def _map(self):
+        # Opened lazily in each process: a forked worker needs its own file
+        # description, otherwise flock() would not exclude it from its parent.
+        if self._pid == os.getpid():
+            return self._mm
+        if self.path and fcntl is not None:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size < self.size:
+                    os.ftruncate(fd, self.size)
+                mm = mmap.mmap(fd, self.size)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            fd, mm = None, mmap.mmap(-1, self.size)
+        self._fd, self._mm, self._pid, self._slot = fd, mm, os.getpid(), None
+        return mm
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            mm = self._map()
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if mm[:4] != self._MAGIC:
+                    mm[:] = bytes(self.size)
+                    self._HEADER.pack_into(mm, 0, self._MAGIC, 1, UPSTREAM_LIMIT_INITIAL, 0.0, 0.0, 0.0, 0, 0, 0)
+                yield mm
+            finally:
+                if self._fd is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _slots(self, mm):
+        for index in range(self._SLOTS):
+            yield index, self._SLOT.unpack_from(mm, self._HEADER.size + index * self._SLOT.size)
+
+    def _set_slot(self, mm, index, pid, in_flight):
+        self._SLOT.pack_into(mm, self._HEADER.size + index * self._SLOT.size, pid, in_flight)
+
+    def _own_slot(self, mm):
+        pid = os.getpid()
+        if self._slot is None:
+            free = None
+            for index, (slot_pid, _) in self._slots(mm):
+                if slot_pid == pid:
+                    self._slot = index
+                    return index
+                if slot_pid == 0 and free is None:
+                    free = index
+            if free is None:
+                self._in_flight(mm, reclaim=True)
+                free = next((index for index, (slot_pid, _) in self._slots(mm) if not slot_pid), None)
+                if free is None:
+                    return None
+            self._set_slot(mm, free, pid, 0)
+            self._slot = free
+        return self._slot
+
+    def _in_flight(self, mm, reclaim=False):
+        total = 0
+        for index, (pid, in_flight) in self._slots(mm):
+            if not pid:
+                continue
+            if reclaim and pid != os.getpid() and not _pid_alive(pid):
+                # A worker that died mid-call never released its slots.
+                self._set_slot(mm, index, 0, 0)
+                continue
+            total += in_flight
+        return total
+
+    def _add_in_flight(self, mm, delta):
+        index = self._own_slot(mm)
+        if index is not None:
+            pid, in_flight = self._SLOT.unpack_from(mm, self._HEADER.size + index * self._SLOT.size)
+            self._set_slot(mm, index, os.getpid(), max(0, in_flight + delta))
+
+    def acquire(self):
+        deadline = time.monotonic() + UPSTREAM_LIMIT_WAIT_SECONDS
+        delay = 0.01
+        while True:
+            with self._locked() as mm:
+                limit = self._HEADER.unpack_from(mm, 0)[2]
+                in_flight = self._in_flight(mm)
+                if in_flight >= int(limit):
+                    in_flight = self._in_flight(mm, reclaim=True)
+                if in_flight < max(1, int(limit)):
+                    self._add_in_flight(mm, 1)
+                    return time.perf_counter(), in_flight + 1
+                if time.monotonic() >= deadline:
+                    header = list(self._HEADER.unpack_from(mm, 0))
+                    header[6] += 1
+                    self._HEADER.pack_into(mm, 0, *header)
+                    raise UpstreamBusyError(
+                        f"Upstream concurrency limit ({int(limit)}) stayed full for {UPSTREAM_LIMIT_WAIT_SECONDS:g}s"
+                    )
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+    def release(self, started, in_flight, outcome):
+        rtt = time.perf_counter() - started
+        now_ts = time.time()
+        with self._locked() as mm:
+            self._add_in_flight(mm, -1)
+            magic, version, limit, long_rtt, short_rtt, last_cut, rejections, drops, successes = (
+                self._HEADER.unpack_from(mm, 0)
+            )
+            if outcome == "drop":
+                drops += 1
+                # Every call in flight when the provider choked reports a drop;
+                # cut once per round trip rather than once per call.
+                if now_ts - last_cut > max(short_rtt, 0.5):
+                    limit = max(UPSTREAM_LIMIT_MIN, limit * UPSTREAM_LIMIT_BACKOFF)
+                    last_cut = now_ts
+            elif outcome == "ok":
+                successes += 1
+                long_rtt = rtt if not long_rtt else long_rtt * 0.95 + rtt * 0.05
+                short_rtt = rtt if not short_rtt else short_rtt * 0.7 + rtt * 0.3
+                if short_rtt > long_rtt * UPSTREAM_LATENCY_TOLERANCE:
+                    if now_ts - last_cut > short_rtt:
+                        limit = max(UPSTREAM_LIMIT_MIN, limit * 0.95)
+                        last_cut = now_ts
+                elif in_flight * 2 >= limit:
+                    limit = min(UPSTREAM_LIMIT_MAX, limit + 1 / limit)
+            self._HEADER.pack_into(
+                mm, 0, magic, version, limit, long_rtt, short_rtt, last_cut, rejections, drops, successes
+            )
+
+    @contextmanager
+    def slot(self):
+        """Hold one host-wide upstream slot for the duration of the block."""
+        if not UPSTREAM_LIMITER_ENABLED:
+            yield
+            return
+        started, in_flight = self.acquire()
+        outcome = "ignore"
+        try:
+            yield
+            outcome = "ok"
+        except Exception as e:
+            outcome = "drop" if _is_upstream_overload(e) else "ignore"
+            raise
+        finally:
+            self.release(started, in_flight, outcome)
+
+    def snapshot(self):
+        if not UPSTREAM_LIMITER_ENABLED:
+            return {"enabled": False}
+        with self._locked() as mm:
+            _, _, limit, long_rtt, short_rtt, _, rejections, drops, successes = self._HEADER.unpack_from(mm, 0)
+            in_flight = self._in_flight(mm)
+            processes = sum(1 for _, (pid, _) in self._slots(mm) if pid)
+        return {
+            "enabled": True,
+            "shared": self._fd is not None,
+            "limit": round(limit, 2),
+            "min": UPSTREAM_LIMIT_MIN,
+            "max": UPSTREAM_LIMIT_MAX,
+            "in_flight": in_flight,
+            "processes": processes,
+            "long_rtt_ms": round(long_rtt * 1000, 1),
+            "short_rtt_ms": round(short_rtt * 1000, 1),
+            "rejections": rejections,
+            "overload_drops": drops,
+            "successes": successes,
+        }
+
+
+upstream_limiter = _SharedUpstreamLimiter(UPSTREAM_LIMITER_FILE)
+
+# Hedged upstream calls. Once HEDGE_MIN_SAMPLES calls have completed, a call
+# still unanswered after the HEDGE_PERCENTILE of recent upstream latencies gets
+# a second, identical attempt and the first successful answer wins. The other
+# attempt is cancelled: its upstream connection is shut down, and if its answer
+# was already in, it counts toward global usage but not the request's. Both
+# attempts run on upstream_executor. Hedges spend
+# from a budget that earns HEDGE_BUDGET_RATIO per call, so they add at most
+# that fraction of extra upstream load. Stats are per worker.
+HEDGE_ENABLED = os.getenv("UPSTREAM_HEDGING", "on").lower() != "off"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.9"))
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.05"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.5"))
+
+
+class _UpstreamHedger:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=256)
+        self._tokens = 0.0
+        self.stats = {
+            "calls": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "hedge_losses": 0,
+            "budget_denied": 0,
+            "cancelled": 0,
+        }
+
+    def observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def delay(self):
+        """Seconds to wait before hedging, or None while there is too little history."""
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE))
+        return max(HEDGE_MIN_DELAY_SECONDS, ordered[index])
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _spend(self):
+        with self._lock:
+            if self._tokens < 1:
+                self.stats["budget_denied"] += 1
+                return False
+            self._tokens -= 1
+            self.stats["hedged"] += 1
+            return True
+
+    def call(self, fn, *args):
+        with self._lock:
+            self.stats["calls"] += 1
+            # Cap the savings so a quiet hour can't fund a burst of hedges.
+            self._tokens = min(self._tokens + HEDGE_BUDGET_RATIO, 10.0)
+        delay = self.delay() if HEDGE_ENABLED else None
+        if delay is None:
+            return self._timed(fn, *args, None)
+
+        results = queue.Queue()
+        race = _HedgeRace()
+
+        def attempt(tag):
+            try:
+                results.put((tag, True, self._timed(fn, *args, race)))
+            except Exception as e:
+                results.put((tag, False, e))
+
+        def start(tag):
+            # The copied context keeps the trace on log lines.
+            upstream_executor.submit(contextvars.copy_context().run, attempt, tag)
+
+        start("primary")
+        try:
+            tag, ok, value = results.get(timeout=delay)
+        except queue.Empty:
+            if not self._spend():
+                tag, ok, value = results.get()
+            else:
+                start("hedge")
+                tag, ok, value = results.get()
+                if ok:
+                    # The winner already shut down the other attempt.
+                    self._count("cancelled")
+                else:
+                    # First finisher failed; the other attempt may still succeed.
+                    tag, ok, value = results.get()
+                if ok:
+                    self._count("hedge_wins" if tag == "hedge" else "hedge_losses")
+
+        if not ok:
+            raise value
+        return value
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        value = fn(*args)
+        self.observe(time.perf_counter() - started)
+        return value
+
+    def snapshot(self):
+        delay = self.delay()
+        with self._lock:
+            return {
+                "enabled": HEDGE_ENABLED,
+                "percentile": HEDGE_PERCENTILE,
+                "budget_ratio": HEDGE_BUDGET_RATIO,
+                "delay_ms": round(delay * 1000, 1) if delay is not None else None,
+                "budget_tokens": round(self._tokens, 2),
+                **self.stats,
+            }
+
+
+upstream_hedger = _UpstreamHedger()
+
+
+class UpstreamAttemptCancelled(RuntimeError):
+    """Another attempt at the same hedged call already won."""
+
+
+class _HedgeRace:
+    """Shared by a hedged call's attempts: the first to succeed shuts down the others' connections."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sockets = []
+        self.won = False
+
+    def track(self, sock):
+        with self._lock:
+            if not self.won:
+                self._sockets.append(sock)
+                return
+        self._shutdown(sock)
+
+    def win(self):
+        """Claim the win; False if another attempt already has it."""
+        with self._lock:
+            if self.won:
+                return False
+            self.won = True
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            self._shutdown(sock)
+        return True
+
+    @staticmethod
+    def _shutdown(sock):
+        # Wakes an attempt blocked reading the socket; the winner's own socket
+        # is already closed, so that one just fails quietly.
+        with suppress(OSError):
+            sock.shutdown(socket.SHUT_RDWR)
+
+    def opener(self):
+        """A urllib opener whose connections this race can shut down."""
+        return build_opener(_RaceHTTPHandler(self), _RaceHTTPSHandler(self))
+
+
+class _RaceConnectionMixin:
+    def __init__(self, *args, race, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._race = race
+
+    def connect(self):
+        super().connect()
+        self._race.track(self.sock)
+
+
+class _RaceHTTPConnection(_RaceConnectionMixin, http.client.HTTPConnection):
+    pass
+
+
+class _RaceHTTPSConnection(_RaceConnectionMixin, http.client.HTTPSConnection):
+    pass
+
+
+class _RaceHandlerMixin:
+    def __init__(self, race):
+        super().__init__()
+        self._race = race
+
+    def do_open(self, http_class, req, **kwargs):
+        return super().do_open(self.connection_class, req, race=self._race, **kwargs)
+
+
+class _RaceHTTPHandler(_RaceHandlerMixin, HTTPHandler):
+    connection_class = _RaceHTTPConnection
+
+
+class _RaceHTTPSHandler(_RaceHandlerMixin, HTTPSHandler):
+    connection_class = _RaceHTTPSConnection
+
+
+# Upstream pool. UPSTREAM_POOL lists OpenAI-compatible targets as comma-separated
+# `base_url|model|KEY_ENV` entries; model and KEY_ENV (the name of the env var
+# holding that target's key) default to OPENROUTER_MODEL and OPENROUTER_API_KEY.
+# Unset, the pool is just OPENROUTER_SERVER_URL. Every target gets the same
+# persona conversation. A call takes the better of two random healthy targets
+# by latency EWMA, and a failed attempt moves straight on to the next target
+# instead of waiting out the retry delay. UPSTREAM_EJECT_FAILURES consecutive
+# failures eject a target for UPSTREAM_EJECT_SECONDS, doubling on each repeat
+# ejection up to UPSTREAM_EJECT_MAX_SECONDS. With two or more targets, each
+# worker probes GET {base_url}/models every UPSTREAM_HEALTH_INTERVAL seconds;
+# a failed probe counts as a failure and a good one re-admits the target.
+UPSTREAM_POOL = os.getenv("UPSTREAM_POOL", "")
+UPSTREAM_EWMA_ALPHA = float(os.getenv("UPSTREAM_EWMA_ALPHA", "0.3"))
+UPSTREAM_FAILURE_PENALTY_SECONDS = float(os.getenv("UPSTREAM_FAILURE_PENALTY_SECONDS", "10"))
+UPSTREAM_EJECT_FAILURES = int(os.getenv("UPSTREAM_EJECT_FAILURES", "3"))
+UPSTREAM_EJECT_SECONDS = float(os.getenv("UPSTREAM_EJECT_SECONDS", "30"))
+UPSTREAM_EJECT_MAX_SECONDS = float(os.getenv("UPSTREAM_EJECT_MAX_SECONDS", "300"))
+UPSTREAM_HEALTH_INTERVAL = float(os.getenv("UPSTREAM_HEALTH_INTERVAL", "15"))
+UPSTREAM_HEALTH_TIMEOUT = float(os.getenv("UPSTREAM_HEALTH_TIMEOUT", "5"))
+
+
+class _UpstreamTarget:
+    def __init__(self, base_url, model, api_key):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key
+        self.name = f"{urlparse(self.base_url).netloc}/{model}"
+        self.ewma = None
+        self.failures = 0  # consecutive
+        self.ejections = 0  # consecutive, sets the next ejection's length
+        self.ejected_until = 0.0
+        self.last_probe = None
+        self.stats = {"calls": 0, "errors": 0, "ejections": 0, "readmissions": 0}
+
+
+def _parse_upstream_pool(raw):
+    targets = []
+    for entry in raw.split(","):
+        parts = [part.strip() for part in entry.split("|")]
+        if not parts[0]:
+            continue
+        model = parts[1] if len(parts) > 1 and parts[1] else API_MODEL
+        api_key = os.getenv(parts[2], "") if len(parts) > 2 and parts[2] else API_KEY
+        target = _UpstreamTarget(parts[0], model, api_key)
+        if any(existing.name == target.name for existing in targets):
+            target.name = f"{target.name}#{len(targets) + 1}"
+        targets.append(target)
+    return targets or [_UpstreamTarget(API_BASE_URL, API_MODEL, API_KEY)]
+
+
+class _UpstreamPool:
+    def __init__(self, targets):
+        self.targets = targets
+        self._lock = threading.Lock()
+
+    def choose(self, exclude=()):
+        now = time.monotonic()
+        with self._lock:
+            candidates = [target for target in self.targets if target not in exclude]
+            if not candidates:
+                return None
+            healthy = [target for target in candidates if target.ejected_until <= now]
+            if not healthy:
+                # Everything left is ejected: fail open to the one due back first.
+                return min(candidates, key=lambda target: target.ejected_until)
+            if len(healthy) == 1:
+                return healthy[0]
+            # Two random choices rather than the single fastest, so a target
+            # that just got quick doesn't take the whole worker's traffic.
+            # Unmeasured targets score 0 and get tried.
+            return min(random.sample(healthy, 2), key=lambda target: target.ewma or 0.0)
+
+    def record_success(self, target, seconds=None, probe=False):
+        with self._lock:
+            readmitted = target.failures >= UPSTREAM_EJECT_FAILURES
+            if not probe:
+                target.stats["calls"] += 1
+            target.failures = 0
+            target.ejections = 0
+            target.ejected_until = 0.0
+            if seconds is not None:
+                target.ewma = seconds if target.ewma is None else target.ewma + UPSTREAM_EWMA_ALPHA * (seconds - target.ewma)
+            if readmitted:
+                target.stats["readmissions"] += 1
+        if readmitted:
+            logger.info("Upstream target re-admitted", extra=_log_fields("upstream", target=target.name))
+
+    def record_failure(self, target, probe=False):
+        now = time.monotonic()
+        ejected_for = None
+        with self._lock:
+            if not probe:
+                target.stats["calls"] += 1
+                target.stats["errors"] += 1
+            target.failures += 1
+            penalty = UPSTREAM_FAILURE_PENALTY_SECONDS
+            target.ewma = penalty if target.ewma is None else target.ewma + UPSTREAM_EWMA_ALPHA * (penalty - target.ewma)
+            # A target back from ejection that fails again goes straight back out.
+            if len(self.targets) > 1 and target.failures >= UPSTREAM_EJECT_FAILURES and target.ejected_until <= now:
+                ejected_for = min(UPSTREAM_EJECT_MAX_SECONDS, UPSTREAM_EJECT_SECONDS * 2 ** target.ejections)
+                target.ejected_until = now + ejected_for
+                target.ejections += 1
+                target.stats["ejections"] += 1
+        if ejected_for is not None:
+            logger.warning(
+                "Upstream target ejected",
+                extra=_log_fields("upstream", target=target.name, failures=target.failures, seconds=ejected_for),
+            )
+
+    @contextmanager
+    def attempt(self, target, timed=True):
+        """Record the block's outcome against target; timed=False keeps it out of the EWMA."""
+        started = time.perf_counter()
         try:
-            body_text = e.read().decode("utf-8", errors="replace")
+            yield
+        except (UpstreamBusyError, UpstreamAttemptCancelled):
+            # Our own concurrency limit or hedge, not the target's fault.
+            raise
         except Exception:
-            body_text = ""
+            self.record_failure(target)
+            raise
+        self.record_success(target, time.perf_counter() - started if timed else None)
+
+    def probe(self, target):
+        req = Request(url=f"{target.base_url}/models", method="GET", headers={
+            "Authorization": f"Bearer {target.api_key}",
+            "User-Agent": "convince-ai-backend/1.0",
+        })
+        try:
+            with urlopen(req, timeout=UPSTREAM_HEALTH_TIMEOUT):
+                pass
+            healthy = True
+        except HTTPError as e:
+            # Not every proxy serves /models; answering at all means it is up.
+            healthy = e.code in (404, 405)
+        except Exception:
+            healthy = False
+        target.last_probe = "ok" if healthy else "failed"
+        if healthy:
+            if target.ejected_until > time.monotonic():
+                self.record_success(target, probe=True)
+        else:
+            self.record_failure(target, probe=True)
+
+    def start_health_checks(self):
+        if len(self.targets) < 2 or UPSTREAM_HEALTH_INTERVAL <= 0:
+            return
+
+        def check():
+            while not shutdown_event.is_set():
+                time.sleep(UPSTREAM_HEALTH_INTERVAL)
+                for target in self.targets:
+                    self.probe(target)
+
+        # Looked up at call time, like the async loop thread, so gevent
+        # workers get a greenlet.
+        threading.Thread(target=check, daemon=True, name="upstream-health").start()
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "health_interval_s": UPSTREAM_HEALTH_INTERVAL if len(self.targets) > 1 else None,
+                "targets": [
+                    {
+                        "name": target.name,
+                        "healthy": target.ejected_until <= now,
+                        "ejected_for_s": round(max(0.0, target.ejected_until - now), 1),
+                        "ewma_ms": round(target.ewma * 1000, 1) if target.ewma is not None else None,
+                        "consecutive_failures": target.failures,
+                        "last_probe": target.last_probe,
+                        **target.stats,
+                    }
+                    for target in self.targets
+                ],
+            }
 
-        if e.code == 403:
-            raise PermissionError(
-                f"Provider rejected the request (403). Check OPENROUTER_API_KEY, OPENROUTER_SERVER_URL, and OPENROUTER_MODEL. Response: {body_text[:400]}"
-            ) from e
 
-        raise RuntimeError(
-            f"Upstream HTTP error {e.code}: {body_text[:400]}"
-        ) from e
-    except URLError as e:
-        raise RuntimeError(f"Network error while calling provider: {e.reason}") from e
+upstream_pool = _UpstreamPool(_parse_upstream_pool(UPSTREAM_POOL))
+
+
+# Circuit breaker in front of the upstream. UPSTREAM_BREAKER_FAILURES calls in
+# a row failing with an overload or network error open it; while open, calls
+# fail at once with UpstreamUnavailableError instead of waiting out timeouts.
+# After UPSTREAM_BREAKER_RESET_SECONDS it goes half-open and lets up to
+# UPSTREAM_BREAKER_PROBES calls through: a success closes it, a failure opens
+# it again. State is per worker and shown in /api/health.
+UPSTREAM_BREAKER_ENABLED = os.getenv("UPSTREAM_BREAKER", "on").lower() != "off"
+UPSTREAM_BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+UPSTREAM_BREAKER_RESET_SECONDS = float(os.getenv("UPSTREAM_BREAKER_RESET_SECONDS", "30"))
+UPSTREAM_BREAKER_PROBES = int(os.getenv("UPSTREAM_BREAKER_PROBES", "1"))
+
+
+class _CircuitBreaker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.stats = {"opened": 0, "short_circuited": 0, "probes": 0}
+
+    def _admit(self):
+        """True for a normal call, "probe" for a half-open probe, False to refuse."""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < UPSTREAM_BREAKER_RESET_SECONDS:
+                    self.stats["short_circuited"] += 1
+                    return False
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self.probes_in_flight >= UPSTREAM_BREAKER_PROBES:
+                    self.stats["short_circuited"] += 1
+                    return False
+                self.probes_in_flight += 1
+                self.stats["probes"] += 1
+                return "probe"
+            return True
+
+    def _finish(self, probe, outcome):
+        transition = None
+        with self._lock:
+            if probe:
+                self.probes_in_flight -= 1
+            if outcome == "ok":
+                if self.state != "closed":
+                    transition = "closed"
+                self.state = "closed"
+                self.failures = 0
+            elif outcome == "fail":
+                self.failures += 1
+                if self.state == "half_open" or (self.state == "closed" and self.failures >= UPSTREAM_BREAKER_FAILURES):
+                    self.state = "open"
+                    self.opened_at = time.monotonic()
+                    self.stats["opened"] += 1
+                    transition = "open"
+        if transition == "open":
+            logger.warning(
+                "Upstream circuit breaker opened",
+                extra=_log_fields("upstream", failures=self.failures, seconds=UPSTREAM_BREAKER_RESET_SECONDS),
+            )
+        elif transition == "closed":
+            logger.info("Upstream circuit breaker closed", extra=_log_fields("upstream"))
+
+    @contextmanager
+    def guard(self):
+        """Run the block as one upstream call, or raise UpstreamUnavailableError while open."""
+        if not UPSTREAM_BREAKER_ENABLED:
+            yield
+            return
+        admitted = self._admit()
+        if not admitted:
+            raise UpstreamUnavailableError("Upstream circuit breaker is open; failing fast")
+        probe = admitted == "probe"
+        try:
+            yield
+        except Exception as e:
+            # Errors that prove the upstream answered (403, 400) neither open nor close it.
+            self._finish(probe, "fail" if _is_upstream_overload(e) else "ignore")
+            raise
+        except BaseException:
+            self._finish(probe, "ignore")
+            raise
+        self._finish(probe, "ok")
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = 0.0
+            if self.state == "open":
+                retry_in = max(0.0, UPSTREAM_BREAKER_RESET_SECONDS - (time.monotonic() - self.opened_at))
+            return {
+                "enabled": UPSTREAM_BREAKER_ENABLED,
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "half_open_in_s": round(retry_in, 1),
+                **self.stats,
+            }
+
+
+upstream_breaker = _CircuitBreaker()
+
+
+def _note_upstream_target(request_meta, target):
+    # First success wins: a hedge that also finishes later doesn't overwrite it.
+    if request_meta is not None:
+        request_meta.setdefault("upstream_target", target.name)
+
+
+def _parse_usage(usage):
+    """(prompt, completion, cached, cost) from an OpenAI-style usage block, or None."""
+    if not isinstance(usage, dict):
+        return None
+    details = usage.get("prompt_tokens_details") or {}
+    cost = usage.get("cost")
+    return (
+        int(usage.get("prompt_tokens") or 0),
+        int(usage.get("completion_tokens") or 0),
+        int(details.get("cached_tokens") or 0),
+        float(cost) if isinstance(cost, (int, float)) else None,
+    )
+
+
+def _langchain_usage(ai_message):
+    usage = getattr(ai_message, "usage_metadata", None)
+    if usage:
+        details = usage.get("input_token_details") or {}
+        return (
+            int(usage.get("input_tokens") or 0),
+            int(usage.get("output_tokens") or 0),
+            int(details.get("cache_read") or 0),
+            None,
+        )
+    metadata = getattr(ai_message, "response_metadata", None) or {}
+    return _parse_usage(metadata.get("token_usage"))
+
+
+def _usage_cost(prompt_tokens, completion_tokens, cached_tokens):
+    return (
+        (prompt_tokens - cached_tokens) * TOKEN_PRICE_PROMPT_PER_M
+        + cached_tokens * TOKEN_PRICE_CACHED_PER_M
+        + completion_tokens * TOKEN_PRICE_COMPLETION_PER_M
+    ) / 1_000_000
+
+
+def _record_upstream_usage(request_meta, usage, route):
+    """Count one upstream call's tokens globally and on the request.
+
+    Every call counts globally, including failover attempts and hedges that
+    lost: the provider bills them all. A losing hedge passes request_meta=None,
+    so the request only reports the winner.
+    """
+    with _token_usage_lock:
+        _token_usage_stats["upstream_calls"] += 1
+        if usage is None:
+            _token_usage_stats["calls_without_usage"] += 1
+            prompt_tokens = completion_tokens = cached_tokens = 0
+            cost = 0.0
+        else:
+            prompt_tokens, completion_tokens, cached_tokens, cost = usage
+            if cost is None:
+                cost = _usage_cost(prompt_tokens, completion_tokens, cached_tokens)
+            _token_usage_stats["prompt_tokens"] += prompt_tokens
+            _token_usage_stats["completion_tokens"] += completion_tokens
+            _token_usage_stats["cached_tokens"] += cached_tokens
+            _token_usage_stats["cost_usd"] += cost
+
+        if request_meta is not None:
+            totals = request_meta.setdefault("usage", {
+                "upstream_calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cached_tokens": 0,
+                "cost_usd": 0.0,
+            })
+            totals["upstream_calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["cached_tokens"] += cached_tokens
+            totals["cost_usd"] += cost
+            request_meta["route"] = route
+
+
+def _call_proxy(messages: list, request_meta=None) -> str:
+    """Send a chat request via plain HTTP to the upstream pool, hedged when it runs slow."""
+    return upstream_hedger.call(_call_proxy_attempt, messages, request_meta)
+
+
+def _post_proxy_request(req, race=None):
+    with upstream_limiter.slot():
+        if race is not None and race.won:
+            raise UpstreamAttemptCancelled("hedged call already answered")
+        try:
+            open_url = race.opener().open if race is not None else urlopen
+            with open_url(req, timeout=60) as response:
+                return _json_loads(response.read())
+        except Exception as e:
+            if race is not None and race.won:
+                raise UpstreamAttemptCancelled("hedged call already answered") from e
+            if isinstance(e, HTTPError):
+                raise _proxy_http_error(e) from e
+            if isinstance(e, URLError):
+                raise RuntimeError(f"Network error while calling provider: {e.reason}") from e
+            raise
+
+
+def _call_proxy_attempt(messages: list, request_meta=None, race=None) -> str:
+    tried = []
+    while True:
+        target = upstream_pool.choose(exclude=tried)
+        tried.append(target)
+        try:
+            with upstream_pool.attempt(target):
+                data = _post_proxy_request(_build_proxy_request(messages, target), race)
+            break
+        except (UpstreamBusyError, UpstreamAttemptCancelled):
+            raise
+        except Exception as e:
+            if len(tried) >= len(upstream_pool.targets):
+                raise
+            logger.warning(
+                f"Upstream {target.name} failed, failing over: {str(e)}",
+                extra=_log_fields("upstream", target=target.name),
+            )
 
     content = data["choices"][0]["message"]["content"]
+    # A hedge that lost still counts globally (the provider bills it) but not
+    # on the request, which only reports the winner.
+    won = race is None or (race.win() if content else not race.won)
+    _record_upstream_usage(request_meta if won else None, _parse_usage(data.get("usage")), "direct-proxy")
     if not content:
         raise ValueError("API returned an empty response")
+    if not won:
+        raise UpstreamAttemptCancelled("hedged call already answered")
+    _note_upstream_target(request_meta, target)
     return _extract_content(content)
 
 
-# Thread pool
-executor = ThreadPoolExecutor(max_workers=10)
+def _stream_proxy(messages: list, request_meta=None):
+    """Yield raw content deltas from a streaming (SSE) chat completion.
+
+    Deltas are unprocessed; run the joined text through _extract_content.
+    """
+    target = upstream_pool.choose()
+    req = _build_proxy_request(messages, target, stream=True)
+    usage = None
+
+    with upstream_pool.attempt(target), upstream_limiter.slot():
+        try:
+            with urlopen(req, timeout=60) as response:
+                for raw_line in response:
+                    line = raw_line.strip()
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == b"[DONE]":
+                        break
+                    event = _json_loads(data)
+                    if event.get("usage"):
+                        usage = event["usage"]
+                    choices = event.get("choices") or []
+                    if not choices:
+                        continue
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+        except HTTPError as e:
+            raise _proxy_http_error(e) from e
+        except URLError as e:
+            raise RuntimeError(f"Network error while calling provider: {e.reason}") from e
+    _record_upstream_usage(request_meta, _parse_usage(usage), "direct-proxy")
+    _note_upstream_target(request_meta, target)
+
+
+# Thread pools. init_worker() replaces all three in every forked worker.
+def _create_executors():
+    chat_pool = ThreadPoolExecutor(max_workers=10)
+    # Blocking tool/provider fetches from the async tool loop run here, so long
+    # tool conversations never eat into the chat executor above.
+    tool_pool = ThreadPoolExecutor(
+        max_workers=int(os.getenv("TOOL_EXECUTOR_WORKERS", "6")),
+        thread_name_prefix="tool",
+    )
+    # Hedged proxy calls run both attempts here; callers already hold a chat
+    # executor thread, so sharing that pool could leave them waiting on themselves.
+    upstream_pool_executor = ThreadPoolExecutor(
+        max_workers=int(os.getenv("UPSTREAM_EXECUTOR_WORKERS", "20")),
+        thread_name_prefix="upstream",
+    )
+    return chat_pool, tool_pool, upstream_pool_executor
+
+
+executor, tool_executor, upstream_executor = _create_executors()
 
 # Async components
 async_loop = None
@@ -144,8 +1712,260 @@ shutdown_event = Event()
 # Cache
 response_cache = {}
 CACHE_DURATION = 300  # 5 minutes
+# Replies grounded in REALTIME_CONTEXT / WEB_CONTEXT skip response_cache. They
+# get this tier instead, keyed on the injected context too and kept only while
+# that context is fresh (see _lookup_context_reply).
+context_reply_cache = {}
+_context_cache_stats = {"hits": 0, "misses": 0, "stores": 0}
+_context_cache_stats_lock = threading.Lock()
+# Lookups split by routing mode: tools-mode replies are cached case by case.
+_response_cache_stats = {
+    "default": {"hits": 0, "misses": 0},
+    "tools": {"hits": 0, "misses": 0, "stores": 0, "uncacheable": 0},
+}
+_response_cache_stats_lock = threading.Lock()
 
 request_queue = deque(maxlen=1000)
+
+# Conversation history budget (tokens are estimated, see _estimate_tokens)
+MAX_HISTORY_MESSAGES = int(os.getenv("MAX_HISTORY_MESSAGES", "50"))
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "3000"))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "400"))
+SUMMARY_CACHE_DURATION = 1800
+SUMMARY_CACHE_MAX_ENTRIES = 500
+# LRU: hits move to the end, the front is evicted once past the size limit.
+_summary_cache = OrderedDict()
+_summary_cache_lock = threading.Lock()
+_prompt_token_stats = {
+    "requests": 0,
+    "total_estimate": 0,
+    "max_estimate": 0,
+    "compacted_requests": 0,
+    "summary_cache_hits": 0,
+    "summary_cache_misses": 0,
+}
+_prompt_token_stats_lock = threading.Lock()
+
+# Upstream token usage as reported by the provider (the usage block of every
+# proxy call, stream and LangChain round), summed per request and aggregated
+# by mode, roast level and routing path. Prices are USD per million tokens and
+# only used when the provider reports no cost of its own (OpenRouter does);
+# cached prompt tokens are billed at TOKEN_PRICE_CACHED_PER_M instead.
+TOKEN_PRICE_PROMPT_PER_M = float(os.getenv("TOKEN_PRICE_PROMPT_PER_M", "0"))
+TOKEN_PRICE_COMPLETION_PER_M = float(os.getenv("TOKEN_PRICE_COMPLETION_PER_M", "0"))
+TOKEN_PRICE_CACHED_PER_M = float(os.getenv("TOKEN_PRICE_CACHED_PER_M", "0"))
+# Upper bounds (prompt tokens) of the buckets latency is reported against.
+TOKEN_LATENCY_BUCKETS = (500, 1000, 2000, 4000, 8000)
+_token_usage_stats = {
+    "upstream_calls": 0,
+    "calls_without_usage": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "cached_tokens": 0,
+    "cost_usd": 0.0,
+}
+_token_usage_by_route = {}
+_token_latency_by_prompt = {}
+_token_usage_lock = threading.Lock()
+
+# Shared key/value store: memory:// (per worker), sqlite:///path (shared by the
+# workers on one host, e.g. under /dev/shm) or redis://host:port/db. Under
+# gunicorn the default is a sqlite file on the host: with several workers a
+# per-worker store would miss most session deltas and idempotency keys.
+# gunicorn sets SERVER_SOFTWARE before preload_app imports us.
+_RUNNING_UNDER_GUNICORN = os.getenv("SERVER_SOFTWARE", "").startswith("gunicorn")
+SHARED_STORE_URI = os.getenv(
+    "SHARED_STORE_URI",
+    "sqlite:///" + os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "convince-ai.db")
+    if _RUNNING_UNDER_GUNICORN else "memory://",
+)
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "5000"))
+
+
+class _MemoryTTLStore:
+    def __init__(self, namespace, max_entries):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, raw = entry
+            if expires_at <= time.time():
+                self._data.pop(key, None)
+                return None
+            self._data.move_to_end(key)
+        return _json_loads(raw)
+
+    def set(self, key, value, ttl):
+        raw = _json_dumps(value)
+        with self._lock:
+            self._data[key] = (time.time() + ttl, raw)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, ttl):
+        """set() only if key is absent or expired; True if this call stored it."""
+        raw = _json_dumps(value)
+        now_ts = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now_ts:
+                return False
+            self._data[key] = (now_ts + ttl, raw)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def size(self):
+        return len(self._data)
+
+
+class _SqliteTTLStore:
+    PRUNE_EVERY = 200
+
+    def __init__(self, namespace, max_entries, path):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn_obj = None
+        self._conn_pid = None
+        self._conn  # fail fast on a bad path
+
+    @property
+    def _conn(self):
+        # SQLite connections must not cross fork(); preload_app imports us in
+        # the gunicorn master, so each worker opens its own on first use.
+        if self._conn_obj is None or self._conn_pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            self._conn_obj = conn
+            self._conn_pid = os.getpid()
+        return self._conn_obj
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, key, time.time()),
+            ).fetchone()
+        return _json_loads(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        raw = _json_dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, raw, time.time() + ttl),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune()
+
+    def add(self, key, value, ttl):
+        raw = _json_dumps(value)
+        now_ts = time.time()
+        with self._lock:
+            # Two statements, but INSERT OR IGNORE still lets only one process win.
+            self._conn.execute(
+                "DELETE FROM kv WHERE namespace = ? AND key = ? AND expires_at <= ?", (self.namespace, key, now_ts)
+            )
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, raw, now_ts + ttl),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune()
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def size(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM kv WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+
+    def _prune(self):
+        self._conn.execute(
+            "DELETE FROM kv WHERE namespace = ? AND expires_at <= ?", (self.namespace, time.time())
+        )
+        # Over capacity: drop the entries closest to expiry.
+        self._conn.execute(
+            "DELETE FROM kv WHERE namespace = ? AND key IN ("
+            "SELECT key FROM kv WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_entries),
+        )
+
+
+class _RedisTTLStore:
+    def __init__(self, namespace, uri):
+        import redis
+
+        self.namespace = namespace
+        self._client = redis.Redis.from_url(uri)
+
+    def _key(self, key):
+        return f"convince:{self.namespace}:{key}"
+
+    def get(self, key):
+        raw = self._client.get(self._key(key))
+        return _json_loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(self._key(key), _json_dumps_bytes(value), ex=max(1, int(ttl)))
+
+    def add(self, key, value, ttl):
+        return bool(self._client.set(self._key(key), _json_dumps_bytes(value), ex=max(1, int(ttl)), nx=True))
+
+    def delete(self, key):
+        self._client.delete(self._key(key))
+
+    def size(self):
+        return None
+
+
+def create_shared_store(namespace, max_entries):
+    """Build a TTL store for SHARED_STORE_URI, falling back to memory on error."""
+    uri = SHARED_STORE_URI
+    try:
+        if uri.startswith("sqlite:///"):
+            return _SqliteTTLStore(namespace, max_entries, uri[len("sqlite:///"):] or ":memory:")
+        if uri.startswith(("redis://", "rediss://")):
+            return _RedisTTLStore(namespace, uri)
+    except Exception as e:
+        logger.warning(f"Shared store {uri} unavailable for {namespace}, using memory: {str(e)}")
+    return _MemoryTTLStore(namespace, max_entries)
+
+
+session_store = create_shared_store("session", SESSION_MAX_ENTRIES)
+if _RUNNING_UNDER_GUNICORN and isinstance(session_store, _MemoryTTLStore):
+    logger.warning(
+        "Shared store is per worker (memory://) under gunicorn: session deltas and idempotency keys "
+        "only work on the worker that saw them. Set SHARED_STORE_URI to sqlite:/// or redis:// "
+        "unless running a single worker."
+    )
 active_requests = weakref.WeakSet()
 
 FRANKFURT_TZ = "Europe/Berlin"
@@ -172,9 +1992,23 @@ GOOGLE_NEWS_RSS_URL = "https://news.google.com/rss/search?q="
 ITUNES_SEARCH_API_URL = "https://itunes.apple.com/search"
 GOOGLE_WEB_SEARCH_URL = "https://www.google.com/search"
 
-_langchain_llm = None
+# When set (e.g. by loadtest_offline.py), every web/time provider GET goes to
+# {PROVIDER_STUB_URL}/{host}{path}?{query} instead of the real host.
+PROVIDER_STUB_URL = os.getenv("PROVIDER_STUB_URL", "").rstrip("/")
+
+
+def _provider_url(url):
+    if not PROVIDER_STUB_URL:
+        return url
+    parts = urlparse(url)
+    rewritten = f"{PROVIDER_STUB_URL}/{parts.netloc}{parts.path}"
+    return f"{rewritten}?{parts.query}" if parts.query else rewritten
+
+_langchain_llms = {}
+_langchain_async_llms = weakref.WeakKeyDictionary()
 _langchain_tools = []
 _langchain_tool_map = {}
+_langchain_async_tool_map = {}
 
 
 class _SimpleHTMLTextParser(HTMLParser):
@@ -339,30 +2173,56 @@ def _filter_web_results_by_relevance(query, results):
     return [item for _, item in filtered[:WEB_RESULTS_LIMIT]]
 
 
-def _http_get_json(url, timeout=WEB_SEARCH_TIMEOUT):
+HTTP_ACCEPT_JSON = "application/json"
+HTTP_ACCEPT_TEXT = "text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.8"
+
+
+def _http_get_bytes(url, accept, timeout=WEB_SEARCH_TIMEOUT):
     req = Request(
-        url=url,
+        url=_provider_url(url),
         method="GET",
         headers={
             "User-Agent": "convince-ai-backend/1.0",
-            "Accept": "application/json",
+            "Accept": accept,
         },
     )
     with urlopen(req, timeout=timeout) as response:
-        return json.loads(response.read().decode("utf-8"))
+        return response.read()
+
+
+def _http_get_json(url, timeout=WEB_SEARCH_TIMEOUT):
+    return _json_loads(_http_get_bytes(url, HTTP_ACCEPT_JSON, timeout))
 
 
 def _http_get_text(url, timeout=WEB_SEARCH_TIMEOUT):
-    req = Request(
-        url=url,
-        method="GET",
-        headers={
-            "User-Agent": "convince-ai-backend/1.0",
-            "Accept": "text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.8",
-        },
-    )
-    with urlopen(req, timeout=timeout) as response:
-        return response.read().decode("utf-8", errors="replace")
+    return _http_get_bytes(url, HTTP_ACCEPT_TEXT, timeout).decode("utf-8", errors="replace")
+
+
+async def _http_get_bytes_async(url, accept, timeout=WEB_SEARCH_TIMEOUT):
+    """GET on the async loop via aiohttp; falls back to the tool executor without it."""
+    session = await async_processor.get_http_session()
+    if session is None:
+        return await _run_in_executor(tool_executor, _http_get_bytes, url, accept, timeout)
+
+    import aiohttp
+
+    async with session.get(
+        _provider_url(url),
+        headers={"Accept": accept},
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as response:
+        response.raise_for_status()
+        return await response.read()
+
+
+async def _http_get_json_async(url, timeout=WEB_SEARCH_TIMEOUT):
+    body = await _http_get_bytes_async(url, HTTP_ACCEPT_JSON, timeout)
+    return _json_loads(body)
+
+
+async def _http_get_text_async(url, timeout=WEB_SEARCH_TIMEOUT):
+    body = await _http_get_bytes_async(url, HTTP_ACCEPT_TEXT, timeout)
+    return body.decode("utf-8", errors="replace")
 
 
 def _is_safe_external_url(candidate_url):
@@ -405,19 +2265,22 @@ def _fetch_webpage_text(url):
         return {"url": url, "error": "Blocked URL. Only safe public http/https URLs are allowed."}
 
     try:
-        html = _http_get_text(url, timeout=WEB_SEARCH_TIMEOUT)
-        parser = _SimpleHTMLTextParser()
-        parser.feed(html)
-        content = parser.text()
-        return {
-            "url": url,
-            "content": content[:5000],
-            "truncated": len(content) > 5000,
-        }
+        return _summarize_webpage(url, _http_get_text(url, timeout=WEB_SEARCH_TIMEOUT))
     except Exception as e:
         return {"url": url, "error": f"Failed to fetch page: {str(e)}"}
 
 
+def _summarize_webpage(url, html_text):
+    parser = _SimpleHTMLTextParser()
+    parser.feed(html_text)
+    content = parser.text()
+    return {
+        "url": url,
+        "content": content[:5000],
+        "truncated": len(content) > 5000,
+    }
+
+
 def _fetch_duckduckgo_context(query):
     url = (
         f"{DUCKDUCKGO_API_URL}?q={quote_plus(query)}&format=json"
@@ -620,14 +2483,22 @@ def _fetch_itunes_album_releases(artist_name, keyword="", limit=5):
     if not artist:
         return {"error": "Missing artist name"}
 
+    search_term, url = _itunes_album_search(artist, keyword, limit)
+    data = _http_get_json(url, timeout=WEB_SEARCH_TIMEOUT)
+    return _summarize_itunes_albums(data, search_term, limit)
+
+
+def _itunes_album_search(artist, keyword, limit):
     search_term = artist if not keyword else f"{artist} {keyword.strip()}"
     url = (
         f"{ITUNES_SEARCH_API_URL}?term={quote_plus(search_term)}"
         "&entity=album&attribute=artistTerm"
         f"&limit={max(1, min(limit, 15))}"
     )
+    return search_term, url
 
-    data = _http_get_json(url, timeout=WEB_SEARCH_TIMEOUT)
+
+def _summarize_itunes_albums(data, search_term, limit):
     items = data.get("results") or []
 
     normalized = []
@@ -655,10 +2526,15 @@ def _fetch_npm_package_info(package_name):
     if not cleaned:
         return {"error": "Missing package name"}
 
-    safe_name = cleaned.replace("/", "%2F")
-    url = f"{NPM_REGISTRY_URL}{safe_name}"
-    data = _http_get_json(url, timeout=WEB_SEARCH_TIMEOUT)
+    data = _http_get_json(_npm_package_url(cleaned), timeout=WEB_SEARCH_TIMEOUT)
+    return _summarize_npm_packument(data, cleaned)
+
+
+def _npm_package_url(package_name):
+    return f"{NPM_REGISTRY_URL}{package_name.replace('/', '%2F')}"
 
+
+def _summarize_npm_packument(data, cleaned):
     dist_tags = data.get("dist-tags") or {}
     latest = dist_tags.get("latest")
     versions = data.get("versions") or {}
@@ -677,6 +2553,10 @@ def _fetch_npm_package_info(package_name):
 
 def _fetch_python_release_info():
     data = _http_get_json(ENDOFLIFE_PYTHON_API_URL, timeout=WEB_SEARCH_TIMEOUT)
+    return _summarize_python_releases(data)
+
+
+def _summarize_python_releases(data):
     if not isinstance(data, list) or not data:
         return {"error": "Invalid response from Python release API"}
 
@@ -726,98 +2606,52 @@ def _fetch_python_release_info():
     }
 
 
-def _fetch_web_context(query, for_tool=False):
+def _web_context_providers(query, for_tool):
+    """Ordered (name, fetch, label) triples; merge order decides dedupe priority."""
+    limit = WEB_TOOL_RESULTS_LIMIT if for_tool else WEB_RESULTS_LIMIT
+    return [
+        ("duckduckgo_api", lambda: _fetch_duckduckgo_context(query), "DuckDuckGo context fetch"),
+        ("duckduckgo_html", lambda: _fetch_duckduckgo_html_results(query, limit=limit), "DuckDuckGo HTML search"),
+        ("google_web", lambda: _fetch_google_web_results(query, limit=limit), "Google web search"),
+        ("google_news_rss", lambda: _fetch_google_news_rss_results(query, limit=limit), "Google News RSS search"),
+        ("bing_rss", lambda: _fetch_bing_rss_results(query, limit=limit), "Bing RSS search"),
+        ("wikipedia", lambda: _fetch_wikipedia_context(query), "Wikipedia context fetch"),
+    ]
+
+
+def _get_cached_web_context(query, for_tool):
     mode_key = "tool" if for_tool else "default"
     cache_key = f"{mode_key}:{query.strip().lower()}"
-    now_ts = time.time()
     logger.info(
-        f"[web-search] mode={mode_key} query='{query[:120]}'"
+        "[web-search] lookup", extra=_log_fields("web-search", mode=mode_key, query=query[:120])
     )
 
     cached = _web_context_cache.get(cache_key)
-    if cached and now_ts - cached.get("timestamp", 0.0) < WEB_CONTEXT_CACHE_SECONDS:
+    if cached and time.time() - cached.get("timestamp", 0.0) < WEB_CONTEXT_CACHE_SECONDS:
         logger.info(
-            f"[web-search] cache-hit mode={mode_key} results={len(cached.get('results', []))}"
+            "[web-search] cache-hit",
+            extra=_log_fields("web-search", mode=mode_key, results=len(cached.get("results", []))),
         )
-        return cached.get("results", [])
+        return cache_key, cached.get("results", [])
+    return cache_key, None
 
+
+def _merge_web_context_results(query, for_tool, cache_key, provider_outcomes, started_ts):
+    """Merge per-provider results (or exceptions) in provider order and cache them."""
     results = []
     provider_counts = {}
 
-    try:
-        ddg_results = _fetch_duckduckgo_context(query)
-        provider_counts["duckduckgo_api"] = len(ddg_results)
-        results.extend(ddg_results)
-    except Exception as e:
-        provider_counts["duckduckgo_api"] = 0
-        logger.warning(f"DuckDuckGo context fetch failed: {str(e)}")
-
-    try:
-        html_results = _fetch_duckduckgo_html_results(
-            query,
-            limit=WEB_TOOL_RESULTS_LIMIT if for_tool else WEB_RESULTS_LIMIT,
-        )
-        provider_counts["duckduckgo_html"] = len(html_results)
-        seen_urls = {item.get("url") for item in results}
-        for item in html_results:
-            if item.get("url") not in seen_urls:
-                results.append(item)
-    except Exception as e:
-        provider_counts["duckduckgo_html"] = 0
-        logger.warning(f"DuckDuckGo HTML search failed: {str(e)}")
-
-    try:
-        gweb_results = _fetch_google_web_results(
-            query,
-            limit=WEB_TOOL_RESULTS_LIMIT if for_tool else WEB_RESULTS_LIMIT,
-        )
-        provider_counts["google_web"] = len(gweb_results)
-        seen_urls = {item.get("url") for item in results}
-        for item in gweb_results:
-            if item.get("url") not in seen_urls:
-                results.append(item)
-    except Exception as e:
-        provider_counts["google_web"] = 0
-        logger.warning(f"Google web search failed: {str(e)}")
-
-    try:
-        gnews_results = _fetch_google_news_rss_results(
-            query,
-            limit=WEB_TOOL_RESULTS_LIMIT if for_tool else WEB_RESULTS_LIMIT,
-        )
-        provider_counts["google_news_rss"] = len(gnews_results)
-        seen_urls = {item.get("url") for item in results}
-        for item in gnews_results:
-            if item.get("url") not in seen_urls:
-                results.append(item)
-    except Exception as e:
-        provider_counts["google_news_rss"] = 0
-        logger.warning(f"Google News RSS search failed: {str(e)}")
-
-    try:
-        bing_results = _fetch_bing_rss_results(
-            query,
-            limit=WEB_TOOL_RESULTS_LIMIT if for_tool else WEB_RESULTS_LIMIT,
-        )
-        provider_counts["bing_rss"] = len(bing_results)
-        seen_urls = {item.get("url") for item in results}
-        for item in bing_results:
-            if item.get("url") not in seen_urls:
-                results.append(item)
-    except Exception as e:
-        provider_counts["bing_rss"] = 0
-        logger.warning(f"Bing RSS search failed: {str(e)}")
+    for name, label, outcome in provider_outcomes:
+        if isinstance(outcome, Exception):
+            provider_counts[name] = 0
+            logger.warning(f"{label} failed: {str(outcome)}")
+            continue
 
-    try:
-        wiki_results = _fetch_wikipedia_context(query)
-        provider_counts["wikipedia"] = len(wiki_results)
+        provider_counts[name] = len(outcome)
         seen_urls = {item.get("url") for item in results}
-        for item in wiki_results:
+        for item in outcome:
             if item.get("url") not in seen_urls:
                 results.append(item)
-    except Exception as e:
-        provider_counts["wikipedia"] = 0
-        logger.warning(f"Wikipedia context fetch failed: {str(e)}")
 
     if for_tool:
         final_limit = WEB_TOOL_RESULTS_LIMIT
@@ -827,15 +2661,56 @@ def _fetch_web_context(query, for_tool=False):
         results = _filter_web_results_by_relevance(query, results)
 
     _web_context_cache[cache_key] = {
-        "timestamp": now_ts,
+        "timestamp": started_ts,
         "results": results[:final_limit],
     }
     logger.info(
-        f"[web-search] completed mode={mode_key} results={len(results[:final_limit])} providers={provider_counts}"
+        "[web-search] completed",
+        extra=_log_fields(
+            "web-search",
+            mode="tool" if for_tool else "default",
+            results=len(results[:final_limit]),
+            providers=provider_counts,
+        ),
     )
     return results[:final_limit]
 
 
+def _fetch_web_context(query, for_tool=False):
+    now_ts = time.time()
+    cache_key, cached_results = _get_cached_web_context(query, for_tool)
+    if cached_results is not None:
+        return cached_results
+
+    provider_outcomes = []
+    for name, fetch, label in _web_context_providers(query, for_tool):
+        try:
+            outcome = _timed_call(f"web.{name}", fetch)
+        except Exception as e:
+            outcome = e
+        provider_outcomes.append((name, label, outcome))
+
+    return _merge_web_context_results(query, for_tool, cache_key, provider_outcomes, now_ts)
+
+
+async def _fetch_web_context_async(query, for_tool=False):
+    """Like _fetch_web_context, but queries all providers concurrently."""
+    now_ts = time.time()
+    cache_key, cached_results = _get_cached_web_context(query, for_tool)
+    if cached_results is not None:
+        return cached_results
+
+    providers = _web_context_providers(query, for_tool)
+    outcomes = await asyncio.gather(
+        *(_run_in_executor(tool_executor, _timed_call, f"web.{name}", fetch) for name, fetch, _ in providers),
+        return_exceptions=True,
+    )
+    provider_outcomes = [
+        (name, label, outcome) for (name, _, label), outcome in zip(providers, outcomes)
+    ]
+    return _merge_web_context_results(query, for_tool, cache_key, provider_outcomes, now_ts)
+
+
 def _get_web_context_message(messages):
     if not _should_enrich_with_web(messages):
         return None
@@ -844,7 +2719,8 @@ def _get_web_context_message(messages):
     if not query:
         return None
 
-    web_results = _fetch_web_context(query)
+    with _stage_timer("web_context"):
+        web_results = _fetch_web_context(query)
     if not web_results:
         return {
             "role": "system",
@@ -880,7 +2756,7 @@ def _get_live_frankfurt_time():
         return _live_time_cache["data"]
 
     req = Request(
-        url=LIVE_TIME_API_URL,
+        url=_provider_url(LIVE_TIME_API_URL),
         method="GET",
         headers={
             "User-Agent": "convince-ai-backend/1.0",
@@ -893,7 +2769,7 @@ def _get_live_frankfurt_time():
         started_at = time.time()
         try:
             with urlopen(req, timeout=LIVE_TIME_TIMEOUT) as response:
-                raw_data = json.loads(response.read().decode("utf-8"))
+                raw_data = _json_loads(response.read())
 
             dt_str = raw_data.get("datetime")
             if not dt_str:
@@ -912,7 +2788,8 @@ def _get_live_frankfurt_time():
             _live_time_cache["data"] = data
             elapsed_ms = int((time.time() - started_at) * 1000)
             logger.info(
-                f"[live-time] success provider=worldtimeapi attempt={attempt} elapsed_ms={elapsed_ms}"
+                "[live-time] success",
+                extra=_log_fields("live-time", provider="worldtimeapi", attempt=attempt, elapsed_ms=elapsed_ms),
             )
             return data
 
@@ -965,7 +2842,8 @@ def _get_live_frankfurt_time():
 
         elapsed_ms = int((time.time() - backup_started_at) * 1000)
         logger.info(
-            f"[live-time] success provider=timeapi.io attempt=1 elapsed_ms={elapsed_ms}"
+            "[live-time] success",
+            extra=_log_fields("live-time", provider="timeapi.io", attempt=1, elapsed_ms=elapsed_ms),
         )
         data = {
             "source": "timeapi.io",
@@ -997,7 +2875,8 @@ def _get_realtime_context_message(messages):
     if not _is_time_sensitive_query(messages):
         return None
 
-    time_data = _get_live_frankfurt_time()
+    with _stage_timer("realtime_context"):
+        time_data = _get_live_frankfurt_time()
     frankfurt_dt = datetime.fromisoformat(time_data["frankfurt_iso"])
     frankfurt_date = frankfurt_dt.strftime("%Y-%m-%d")
     frankfurt_weekday = frankfurt_dt.strftime("%A")
@@ -1029,60 +2908,62 @@ def _get_response_style_guard_message():
     }
 
 
+def _frankfurt_datetime_payload(time_data):
+    frankfurt_dt = datetime.fromisoformat(time_data["frankfurt_iso"])
+    return {
+        "timezone": FRANKFURT_TZ,
+        "date": frankfurt_dt.strftime("%Y-%m-%d"),
+        "weekday": frankfurt_dt.strftime("%A"),
+        "time": frankfurt_dt.strftime("%H:%M:%S"),
+        "iso": time_data["frankfurt_iso"],
+        "source": time_data["source"],
+    }
+
+
 def _create_langchain_tools():
-    if not LANGCHAIN_AVAILABLE:
+    if not _load_langchain():
         return [], {}
 
     @tool("get_frankfurt_datetime")
     def get_frankfurt_datetime() -> str:
         """Return the current date, day, and time in Frankfurt (Europe/Berlin)."""
-        time_data = _get_live_frankfurt_time()
-        frankfurt_dt = datetime.fromisoformat(time_data["frankfurt_iso"])
-        payload = {
-            "timezone": FRANKFURT_TZ,
-            "date": frankfurt_dt.strftime("%Y-%m-%d"),
-            "weekday": frankfurt_dt.strftime("%A"),
-            "time": frankfurt_dt.strftime("%H:%M:%S"),
-            "iso": time_data["frankfurt_iso"],
-            "source": time_data["source"],
-        }
-        return json.dumps(payload)
+        return _json_dumps(_frankfurt_datetime_payload(_get_live_frankfurt_time()))
 
     @tool("search_web_context")
     def search_web_context(query: str) -> str:
         """Search the public web for a query and return recent candidate results with links."""
         cleaned_query = (query or "").strip()
         if not cleaned_query:
-            return json.dumps({"query": "", "results": []})
+            return _json_dumps({"query": "", "results": []})
 
         results = _fetch_web_context(cleaned_query, for_tool=True)
-        return json.dumps({"query": cleaned_query, "results": results})
+        return _json_dumps({"query": cleaned_query, "results": results})
 
     @tool("fetch_webpage")
     def fetch_webpage(url: str) -> str:
         """Fetch readable text content from a public webpage URL for deeper verification."""
         cleaned_url = (url or "").strip()
         if not cleaned_url:
-            return json.dumps({"url": "", "error": "Missing URL"})
-        return json.dumps(_fetch_webpage_text(cleaned_url))
+            return _json_dumps({"url": "", "error": "Missing URL"})
+        return _json_dumps(_fetch_webpage_text(cleaned_url))
 
     @tool("get_npm_package_info")
     def get_npm_package_info(package_name: str) -> str:
         """Get authoritative npm registry metadata for a package, including latest version and timestamps."""
         info = _fetch_npm_package_info(package_name)
-        return json.dumps(info)
+        return _json_dumps(info)
 
     @tool("get_python_release_info")
     def get_python_release_info() -> str:
         """Get authoritative current Python stable release information."""
         info = _fetch_python_release_info()
-        return json.dumps(info)
+        return _json_dumps(info)
 
     @tool("get_music_album_releases")
     def get_music_album_releases(artist_name: str, keyword: str = "") -> str:
         """Get latest album releases for an artist from iTunes API, optionally filtered by a keyword like 'BTS'."""
         info = _fetch_itunes_album_releases(artist_name=artist_name, keyword=keyword, limit=5)
-        return json.dumps(info)
+        return _json_dumps(info)
 
     tools = [
         get_frankfurt_datetime,
@@ -1103,23 +2984,100 @@ def _create_langchain_tools():
     return tools, tool_map
 
 
-def _get_langchain_llm():
-    global _langchain_llm
-    if _langchain_llm is None:
-        _langchain_llm = ChatOpenAI(
-            model=API_MODEL,
-            api_key=API_KEY,
-            base_url=API_BASE_URL,
-            timeout=OPENROUTER_TIMEOUT_SYNC,
-        )
-    return _langchain_llm
+def _create_langchain_async_tools():
+    """Coroutine implementations of the tools above for the native async loop.
+
+    The model only sees the schemas of the sync tools; these take the same
+    arguments and return the same JSON, but do their HTTP on the event loop.
+    """
+
+    async def get_frankfurt_datetime():
+        time_data = await _run_in_executor(tool_executor, _get_live_frankfurt_time)
+        return _json_dumps(_frankfurt_datetime_payload(time_data))
+
+    async def search_web_context(query=""):
+        cleaned_query = (query or "").strip()
+        if not cleaned_query:
+            return _json_dumps({"query": "", "results": []})
+
+        results = await _fetch_web_context_async(cleaned_query, for_tool=True)
+        return _json_dumps({"query": cleaned_query, "results": results})
+
+    async def fetch_webpage(url=""):
+        cleaned_url = (url or "").strip()
+        if not cleaned_url:
+            return _json_dumps({"url": "", "error": "Missing URL"})
+        if not _is_safe_external_url(cleaned_url):
+            return _json_dumps({"url": cleaned_url, "error": "Blocked URL. Only safe public http/https URLs are allowed."})
+        try:
+            html_text = await _http_get_text_async(cleaned_url, timeout=WEB_SEARCH_TIMEOUT)
+            return _json_dumps(_summarize_webpage(cleaned_url, html_text))
+        except Exception as e:
+            return _json_dumps({"url": cleaned_url, "error": f"Failed to fetch page: {str(e)}"})
+
+    async def get_npm_package_info(package_name=""):
+        cleaned = (package_name or "").strip()
+        if not cleaned:
+            return _json_dumps({"error": "Missing package name"})
+        data = await _http_get_json_async(_npm_package_url(cleaned), timeout=WEB_SEARCH_TIMEOUT)
+        return _json_dumps(_summarize_npm_packument(data, cleaned))
+
+    async def get_python_release_info():
+        data = await _http_get_json_async(ENDOFLIFE_PYTHON_API_URL, timeout=WEB_SEARCH_TIMEOUT)
+        return _json_dumps(_summarize_python_releases(data))
+
+    async def get_music_album_releases(artist_name="", keyword=""):
+        artist = (artist_name or "").strip()
+        if not artist:
+            return _json_dumps({"error": "Missing artist name"})
+        search_term, url = _itunes_album_search(artist, keyword, 5)
+        data = await _http_get_json_async(url, timeout=WEB_SEARCH_TIMEOUT)
+        return _json_dumps(_summarize_itunes_albums(data, search_term, 5))
+
+    return {
+        "get_frankfurt_datetime": get_frankfurt_datetime,
+        "search_web_context": search_web_context,
+        "fetch_webpage": fetch_webpage,
+        "get_npm_package_info": get_npm_package_info,
+        "get_python_release_info": get_python_release_info,
+        "get_music_album_releases": get_music_album_releases,
+    }
+
+
+def _build_langchain_llm(target):
+    return ChatOpenAI(
+        model=target.model,
+        api_key=target.api_key,
+        base_url=target.base_url,
+        timeout=OPENROUTER_TIMEOUT_SYNC,
+    )
+
+
+def _get_langchain_llm(target):
+    llm = _langchain_llms.get(target.name)
+    if llm is None:
+        _load_langchain()
+        llm = _langchain_llms[target.name] = _build_langchain_llm(target)
+    return llm
+
+
+def _get_langchain_async_llm(target):
+    # The async HTTP client inside ChatOpenAI binds to the loop that first uses
+    # it, so keep one instance per event loop (restart-async creates a new one).
+    llms = _langchain_async_llms.setdefault(asyncio.get_running_loop(), {})
+    llm = llms.get(target.name)
+    if llm is None:
+        _load_langchain()
+        llm = llms[target.name] = _build_langchain_llm(target)
+    return llm
 
 
 def _ensure_langchain_runtime():
-    global _langchain_tools, _langchain_tool_map
+    global _langchain_tools, _langchain_tool_map, _langchain_async_tool_map
     if _langchain_tools and _langchain_tool_map:
         return
     _langchain_tools, _langchain_tool_map = _create_langchain_tools()
+    _langchain_async_tool_map = _create_langchain_async_tools() if _langchain_tools else {}
 
 
 def _to_langchain_messages(conversation):
@@ -1145,20 +3103,11 @@ def _extract_tool_calls(ai_message: Any):
     return additional_kwargs.get("tool_calls") or []
 
 
-def _call_langchain_with_tools(conversation):
-    if not LANGCHAIN_AVAILABLE:
-        raise RuntimeError("LangChain is not available in this environment")
-
-    _ensure_langchain_runtime()
-    if not _langchain_tools:
-        raise RuntimeError("LangChain tools are not initialized")
-
-    llm = _get_langchain_llm().bind_tools(_langchain_tools)
-    lc_messages = _to_langchain_messages(conversation)
+def _build_tool_policy_message():
     now_utc = datetime.now(timezone.utc)
     now_frankfurt = datetime.now(ZoneInfo(FRANKFURT_TZ))
 
-    tool_policy = SystemMessage(
+    return SystemMessage(
         content=(
             f"Current UTC date: {now_utc.strftime('%Y-%m-%d')}. "
             f"Current Frankfurt date: {now_frankfurt.strftime('%Y-%m-%d')}. "
@@ -1174,74 +3123,226 @@ def _call_langchain_with_tools(conversation):
             "Do not mention tool usage unless user explicitly asks."
         )
     )
-    lc_messages.insert(0, tool_policy)
+
+
+def _parse_tool_call(call):
+    tool_name = call.get("name")
+    call_id = call.get("id") or f"tool_call_{int(time.time() * 1000)}"
+    args = call.get("args", {})
+    if isinstance(args, str):
+        try:
+            args = _json_loads(args)
+        except Exception:
+            args = {"query": args}
+    return tool_name, call_id, args
+
+
+def _skip_repeated_search(tool_name, args, seen_search_queries):
+    """Return a canned tool result if this search repeats one from the same request."""
+    if tool_name != "search_web_context":
+        return None
+
+    raw_query = str((args or {}).get("query") or "").strip().lower()
+    normalized_query = re.sub(r"\s+", " ", raw_query)
+    if normalized_query in seen_search_queries:
+        logger.info(
+            "[langchain-tool] skipped repeated search",
+            extra=_log_fields("langchain-tool", query=normalized_query[:120]),
+        )
+        return _json_dumps({
+            "query": raw_query,
+            "results": [],
+            "note": "Skipped repeated search query in same request",
+        })
+    seen_search_queries.add(normalized_query)
+    return None
+
+
+def _ai_message_text(ai_message):
+    content = ai_message.content or ""
+    return _extract_content(content if isinstance(content, str) else str(content))
+
+
+def _call_langchain_with_tools(conversation, request_meta=None):
+    # Tool rounds include tool time, so they don't feed the latency EWMA.
+    if request_meta is not None:
+        # A previous attempt's completed loop says nothing about this one.
+        request_meta.pop("tool_results", None)
+    target = upstream_pool.choose()
+    tool_log = []
+    with upstream_pool.attempt(target, timed=False):
+        content = _run_langchain_tool_loop(conversation, target, tool_log, request_meta)
+    _note_upstream_target(request_meta, target)
+    if request_meta is not None:
+        # Only a completed loop is recorded, so a failed turn is never cacheable.
+        request_meta["tool_results"] = tool_log
+    return content
+
+
+def _log_tool_result(tool_log, tool_name, content):
+    # (name, ok) per call; _tool_reply_cacheable reads it once the turn is done.
+    tool_log.append((tool_name, content != "{}" and '"error"' not in content))
+
+
+def _run_langchain_tool_loop(conversation, target, tool_log, request_meta=None):
+    if not _load_langchain():
+        raise RuntimeError("LangChain is not available in this environment")
+
+    _ensure_langchain_runtime()
+    if not _langchain_tools:
+        raise RuntimeError("LangChain tools are not initialized")
+
+    llm = _get_langchain_llm(target).bind_tools(_langchain_tools)
+    lc_messages = _to_langchain_messages(conversation)
+    lc_messages.insert(0, _build_tool_policy_message())
     seen_search_queries = set()
 
     for _ in range(max(1, LANGCHAIN_MAX_TOOL_ROUNDS)):
-        ai_message = llm.invoke(lc_messages)
+        with _stage_timer("langchain_round"):
+            ai_message = llm.invoke(lc_messages)
+        _record_upstream_usage(request_meta, _langchain_usage(ai_message), "langchain-tools")
         lc_messages.append(ai_message)
 
         tool_calls = _extract_tool_calls(ai_message)
         if not tool_calls:
-            content = ai_message.content or ""
-            return _extract_content(content if isinstance(content, str) else str(content))
+            return _ai_message_text(ai_message)
 
+        tools_started = time.perf_counter()
         for call in tool_calls:
-            tool_name = call.get("name")
-            call_id = call.get("id") or f"tool_call_{int(time.time() * 1000)}"
-            logger.info(f"[langchain-tool] invoking name={tool_name} call_id={call_id}")
+            tool_name, call_id, args = _parse_tool_call(call)
+            logger.info("[langchain-tool] invoking", extra=_log_fields("langchain-tool", name=tool_name, call_id=call_id))
             tool_obj = _langchain_tool_map.get(tool_name)
             if not tool_obj:
                 logger.warning(f"[langchain-tool] unknown tool name={tool_name}")
                 lc_messages.append(ToolMessage(content="{}", tool_call_id=call_id))
+                _log_tool_result(tool_log, tool_name, "{}")
                 continue
 
-            args = call.get("args", {})
-            if isinstance(args, str):
-                try:
-                    args = json.loads(args)
-                except Exception:
-                    args = {"query": args}
-
-            if tool_name == "search_web_context":
-                raw_query = str((args or {}).get("query") or "").strip().lower()
-                normalized_query = re.sub(r"\s+", " ", raw_query)
-                if normalized_query in seen_search_queries:
-                    logger.info(
-                        f"[langchain-tool] skipped repeated search query='{normalized_query[:120]}'"
-                    )
-                    tool_result = json.dumps({
-                        "query": raw_query,
-                        "results": [],
-                        "note": "Skipped repeated search query in same request",
-                    })
-                    lc_messages.append(ToolMessage(content=str(tool_result), tool_call_id=call_id))
-                    continue
-                seen_search_queries.add(normalized_query)
+            skipped_result = _skip_repeated_search(tool_name, args, seen_search_queries)
+            if skipped_result is not None:
+                lc_messages.append(ToolMessage(content=skipped_result, tool_call_id=call_id))
+                _log_tool_result(tool_log, tool_name, skipped_result)
+                continue
 
             try:
-                tool_result = tool_obj.invoke(args)
-                logger.info(f"[langchain-tool] success name={tool_name} call_id={call_id}")
+                with _trace_span(f"tool.{tool_name}"):
+                    tool_result = tool_obj.invoke(args)
+                logger.info("[langchain-tool] success", extra=_log_fields("langchain-tool", name=tool_name, call_id=call_id))
             except Exception as e:
                 logger.error(f"[langchain-tool] error name={tool_name} call_id={call_id}: {str(e)}")
-                tool_result = json.dumps({"error": str(e), "tool": tool_name})
+                tool_result = _json_dumps({"error": str(e), "tool": tool_name})
 
             lc_messages.append(ToolMessage(content=str(tool_result), tool_call_id=call_id))
+            _log_tool_result(tool_log, tool_name, str(tool_result))
+        _observe_stage("langchain_tools", tools_started)
+
+    with _stage_timer("langchain_round"):
+        ai_message = llm.invoke(lc_messages)
+    _record_upstream_usage(request_meta, _langchain_usage(ai_message), "langchain-tools")
+    return _ai_message_text(ai_message)
+
+
+async def _invoke_tool_async(tool_name, call_id, args):
+    impl = _langchain_async_tool_map.get(tool_name)
+    try:
+        with _trace_span(f"tool.{tool_name}"):
+            if impl is not None:
+                tool_result = await impl(**(args or {}))
+            else:
+                tool_result = await _langchain_tool_map[tool_name].ainvoke(args)
+        logger.info("[langchain-tool] success", extra=_log_fields("langchain-tool", name=tool_name, call_id=call_id))
+    except Exception as e:
+        logger.error(f"[langchain-tool] error name={tool_name} call_id={call_id}: {str(e)}")
+        tool_result = _json_dumps({"error": str(e), "tool": tool_name})
+    return str(tool_result)
+
+
+async def _completed_tool_result(content):
+    return content
+
+
+async def _call_langchain_with_tools_async(conversation, request_meta=None):
+    """Native async tool loop: ainvoke for model rounds, tool calls gathered
+    concurrently on the event loop instead of pinning an executor thread."""
+    if request_meta is not None:
+        # A previous attempt's completed loop says nothing about this one.
+        request_meta.pop("tool_results", None)
+    target = upstream_pool.choose()
+    tool_log = []
+    with upstream_pool.attempt(target, timed=False):
+        content = await _run_langchain_tool_loop_async(conversation, target, tool_log, request_meta)
+    _note_upstream_target(request_meta, target)
+    if request_meta is not None:
+        # Only a completed loop is recorded, so a failed turn is never cacheable.
+        request_meta["tool_results"] = tool_log
+    return content
+
+
+async def _run_langchain_tool_loop_async(conversation, target, tool_log, request_meta=None):
+    if not _load_langchain():
+        raise RuntimeError("LangChain is not available in this environment")
+
+    _ensure_langchain_runtime()
+    if not _langchain_tools:
+        raise RuntimeError("LangChain tools are not initialized")
+
+    llm = _get_langchain_async_llm(target).bind_tools(_langchain_tools)
+    lc_messages = _to_langchain_messages(conversation)
+    lc_messages.insert(0, _build_tool_policy_message())
+    seen_search_queries = set()
+
+    for _ in range(max(1, LANGCHAIN_MAX_TOOL_ROUNDS)):
+        with _stage_timer("langchain_round"):
+            ai_message = await llm.ainvoke(lc_messages)
+        _record_upstream_usage(request_meta, _langchain_usage(ai_message), "langchain-tools")
+        lc_messages.append(ai_message)
+
+        tool_calls = _extract_tool_calls(ai_message)
+        if not tool_calls:
+            return _ai_message_text(ai_message)
 
-    fallback = llm.invoke(lc_messages)
-    fallback_content = fallback.content or ""
-    return _extract_content(fallback_content if isinstance(fallback_content, str) else str(fallback_content))
+        call_ids = []
+        call_names = []
+        jobs = []
+        for call in tool_calls:
+            tool_name, call_id, args = _parse_tool_call(call)
+            logger.info("[langchain-tool] invoking", extra=_log_fields("langchain-tool", name=tool_name, call_id=call_id))
+            call_ids.append(call_id)
+            call_names.append(tool_name)
+            if tool_name not in _langchain_tool_map:
+                logger.warning(f"[langchain-tool] unknown tool name={tool_name}")
+                jobs.append(_completed_tool_result("{}"))
+                continue
+
+            skipped_result = _skip_repeated_search(tool_name, args, seen_search_queries)
+            if skipped_result is not None:
+                jobs.append(_completed_tool_result(skipped_result))
+                continue
+
+            jobs.append(_invoke_tool_async(tool_name, call_id, args))
+
+        # gather preserves order, so ToolMessages line up with the model's calls.
+        with _stage_timer("langchain_tools"):
+            tool_results = await asyncio.gather(*jobs)
+        for call_id, tool_name, tool_result in zip(call_ids, call_names, tool_results):
+            lc_messages.append(ToolMessage(content=tool_result, tool_call_id=call_id))
+            _log_tool_result(tool_log, tool_name, tool_result)
+
+    with _stage_timer("langchain_round"):
+        ai_message = await llm.ainvoke(lc_messages)
+    _record_upstream_usage(request_meta, _langchain_usage(ai_message), "langchain-tools")
+    return _ai_message_text(ai_message)
 
 
-def _call_model_with_optional_tools(conversation):
+def _call_model_with_optional_tools(conversation, request_meta=None):
     if ENABLE_LANGCHAIN_TOOLS:
-        if not LANGCHAIN_AVAILABLE:
+        if not _load_langchain():
             logger.warning("ENABLE_LANGCHAIN_TOOLS=true but LangChain is unavailable. Falling back to direct proxy.")
         else:
-            logger.info("[routing] using langchain-tools path")
-            return _call_langchain_with_tools(conversation)
-    logger.info("[routing] using direct-proxy path")
-    return _call_proxy(conversation)
+            logger.info("[routing] using langchain-tools path", extra=_log_fields("routing"))
+            return _call_langchain_with_tools(conversation, request_meta)
+    logger.info("[routing] using direct-proxy path", extra=_log_fields("routing"))
+    return _call_proxy(conversation, request_meta)
 
 
 class AsyncRequestProcessor:
@@ -1249,6 +3350,7 @@ class AsyncRequestProcessor:
         self.loop = None
         self.running = False
         self.semaphore = None
+        self.http_session = None
 
     async def initialize(self):
         self.loop = asyncio.get_event_loop()
@@ -1256,43 +3358,33 @@ class AsyncRequestProcessor:
         self.running = True
         logger.info("Async request processor initialized")
 
-    async def process_request_async(self, messages, mode, roast_level, future_result):
+    async def process_request_async(self, messages, mode, roast_level, future_result, request_meta=None):
         try:
             async with self.semaphore:
-                cache_key = get_cache_key(messages, mode, roast_level)
-                if ENABLE_LANGCHAIN_TOOLS:
-                    should_bypass_cache = True
-                else:
-                    is_time_sensitive = _is_time_sensitive_query(messages)
-                    should_use_web = _should_enrich_with_web(messages)
-                    should_bypass_cache = is_time_sensitive or should_use_web
-                if not should_bypass_cache and cache_key in response_cache:
-                    cached_response, timestamp = response_cache[cache_key]
-                    if is_cache_valid(timestamp):
-                        logger.info("Returning cached response (async)")
+                cache_key, should_bypass_cache, cached_response = _lookup_cached_response(messages, mode, roast_level)
+                if cached_response is not None:
+                    logger.info("Returning cached response (async)", extra=_log_fields("cache"))
+                    future_result.put(('success', cached_response))
+                    return
+
+                conversation = _build_conversation(messages, mode, roast_level, request_meta)
+                context_key, context_ttl = None, 0.0
+                if should_bypass_cache:
+                    context_key, context_ttl, cached_response = _lookup_context_reply(
+                        messages, mode, roast_level, conversation
+                    )
+                    if cached_response is not None:
+                        logger.info("Returning context-cached response (async)", extra=_log_fields("cache"))
                         future_result.put(('success', cached_response))
                         return
 
-                system_prompt = get_system_prompt(mode, roast_level)
-                conversation = [{"role": "system", "content": system_prompt}] + messages
-                conversation.insert(1, _get_response_style_guard_message())
-                if not ENABLE_LANGCHAIN_TOOLS:
-                    realtime_context = _get_realtime_context_message(messages)
-                    if realtime_context:
-                        conversation.insert(2, realtime_context)
-                    web_context = _get_web_context_message(messages)
-                    if web_context:
-                        conversation.insert(3 if realtime_context else 2, web_context)
-
-                ai_message = await self.call_api_async(conversation)
+                ai_message = await self.call_api_async(conversation, request_meta)
 
                 if not ai_message or not isinstance(ai_message, str):
                     future_result.put(('error', 'Invalid response from AI API'))
                     return
 
-                if not should_bypass_cache:
-                    response_cache[cache_key] = (ai_message, time.time())
-                    await self.cleanup_cache()
+                _cache_reply(ai_message, cache_key, should_bypass_cache, request_meta, context_key, context_ttl)
                 future_result.put(('success', ai_message))
 
         except asyncio.TimeoutError:
@@ -1308,55 +3400,81 @@ class AsyncRequestProcessor:
             except:
                 pass
 
-    async def call_api_async(self, conversation):
-        try:
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                executor,
-                self._blocking_api_call,
-                conversation
+    async def get_http_session(self):
+        if self.http_session is None or self.http_session.closed:
+            try:
+                import aiohttp
+            except ImportError:
+                return None
+            self.http_session = aiohttp.ClientSession(
+                headers={"User-Agent": "convince-ai-backend/1.0"}
             )
-            return response
+        return self.http_session
+
+    async def call_api_async(self, conversation, request_meta=None):
+        try:
+            if ENABLE_LANGCHAIN_TOOLS:
+                # First use imports LangChain; keep that off the event loop.
+                if await _run_in_executor(executor, _load_langchain):
+                    return await self._native_async_tool_call(conversation, request_meta)
+
+            return await self._blocking_api_call(conversation, request_meta)
         except Exception as e:
             logger.error(f"Async API error: {str(e)}")
-            return "yo my brain just async-glitched... give me a sec to reboot 🔄💀"
+            return _fallback_reply(request_meta, "yo my brain just async-glitched... give me a sec to reboot 🔄💀")
+
+    async def _blocking_api_call(self, conversation, request_meta=None):
+        return await self._call_with_retries(
+            "blocking API call (async path)",
+            lambda: _run_in_executor(executor, _call_model_with_optional_tools, conversation, request_meta),
+            request_meta,
+        )
 
-    def _blocking_api_call(self, conversation):
+    async def _native_async_tool_call(self, conversation, request_meta=None):
+        logger.info("[routing] using langchain-tools path (native async)", extra=_log_fields("routing"))
+        return await self._call_with_retries(
+            "native async tool-calling API call",
+            lambda: _call_langchain_with_tools_async(conversation, request_meta),
+            request_meta,
+        )
+
+    async def _call_with_retries(self, description, call, request_meta=None):
+        # The backoff sleeps on the event loop, so a retrying request doesn't
+        # hold one of the chat executor's threads while it waits.
+        delay = None
         for attempt in range(OPENROUTER_RETRY_ATTEMPTS):
             try:
-                if attempt > 0:
-                    logger.info(f"Retrying API call (attempt {attempt + 1}/{OPENROUTER_RETRY_ATTEMPTS})")
-                    time.sleep(OPENROUTER_RETRY_DELAY)
-
-                logger.info(f"Making blocking API call (async path, attempt {attempt + 1})")
+                logger.info("Making %s (attempt %d)", description, attempt + 1, extra=_log_fields("upstream"))
                 start_time = time.time()
 
-                content = _call_model_with_optional_tools(conversation)
+                with _stage_timer("upstream"), upstream_breaker.guard():
+                    content = await call()
 
                 processing_time = time.time() - start_time
-                logger.info(f"API call completed in {processing_time:.2f}s (attempt {attempt + 1})")
+                logger.info(
+                    "API call completed in %.2fs (attempt %d)", processing_time, attempt + 1, extra=_log_fields("upstream")
+                )
 
                 if content:
                     return content
-                else:
-                    if attempt == OPENROUTER_RETRY_ATTEMPTS - 1:
-                        return "yo my async brain just went blank... try asking me something else? 🤔💫"
-                    continue
+                if attempt == OPENROUTER_RETRY_ATTEMPTS - 1:
+                    return _fallback_reply(
+                        request_meta, "yo my async brain just went blank... try asking me something else? 🤔💫"
+                    )
 
             except Exception as e:
-                logger.error(f"Blocking API call error on attempt {attempt + 1}: {str(e)}", exc_info=True)
-                if attempt == OPENROUTER_RETRY_ATTEMPTS - 1:
+                logger.error(f"{description} error on attempt {attempt + 1}: {str(e)}", exc_info=True)
+                delay = _retry_delay(e, delay) if attempt < OPENROUTER_RETRY_ATTEMPTS - 1 else None
+                if delay is None:
                     raise
-                continue
+                logger.info(
+                    "Retrying API call in %.2fs (attempt %d/%d)", delay, attempt + 2, OPENROUTER_RETRY_ATTEMPTS,
+                    extra=_log_fields("upstream"),
+                )
+                await asyncio.sleep(delay)
 
         raise Exception("All retry attempts failed")
 
-    async def cleanup_cache(self):
-        if len(response_cache) > 100:
-            old_keys = [k for k, (_, ts) in response_cache.items() if not is_cache_valid(ts)]
-            for key in old_keys[:50]:
-                response_cache.pop(key, None)
-
     async def run_processor(self):
         await self.initialize()
 
@@ -1364,15 +3482,19 @@ class AsyncRequestProcessor:
             try:
                 if request_queue:
                     request_data = request_queue.popleft()
-                    messages, mode, roast_level, future_result = request_data
+                    messages, mode, roast_level, future_result, request_meta, enqueued_at, context = request_data
+                    context.run(_observe_stage, "queue_wait", enqueued_at)
                     asyncio.create_task(
-                        self.process_request_async(messages, mode, roast_level, future_result)
+                        self.process_request_async(messages, mode, roast_level, future_result, request_meta),
+                        context=context,
                     )
                 await asyncio.sleep(0.01)
             except Exception as e:
                 logger.error(f"Async processor error: {str(e)}")
                 await asyncio.sleep(0.1)
 
+        if self.http_session is not None and not self.http_session.closed:
+            await self.http_session.close()
         logger.info("Async processor stopped")
 
     def stop(self):
@@ -1397,13 +3519,75 @@ def run_async_loop():
 def start_async_thread():
     global async_thread
     if async_thread is None or not async_thread.is_alive():
-        async_thread = Thread(target=run_async_loop, daemon=True)
+        # Looked up at call time: with preload_app the module-level names were
+        # bound in the master, before gevent patched the worker, and an
+        # un-patched thread can't share gevent primitives with the worker's hub.
+        async_thread = threading.Thread(target=run_async_loop, daemon=True, name="async-loop")
         async_thread.start()
         logger.info("Async thread started")
 
 
-# Ensure async processor is started when running under Gunicorn using app:app.
-start_async_thread()
+# Background state is per process. With preload_app the module is imported
+# in the gunicorn master, and threads don't survive fork, so nothing is started
+# at import time: gunicorn.conf.py calls init_worker() in each worker, and the
+# before_request hook below covers any other server.
+WORKER_RSS_CHECK_SECONDS = float(os.getenv("WORKER_RSS_CHECK_SECONDS", "10"))
+_worker_pid = None
+_worker_init_lock = threading.Lock()
+
+
+def init_worker():
+    """Create this process's executors, event-loop thread and HTTP session.
+
+    Idempotent per pid; safe to call from a gunicorn hook and lazily.
+    """
+    global _worker_pid, executor, tool_executor, upstream_executor
+    if _worker_pid == os.getpid():
+        return
+    with _worker_init_lock:
+        if _worker_pid == os.getpid():
+            return
+        # Anything inherited across fork (pool threads, the aiohttp session's
+        # loop) only existed in the parent; start from fresh objects.
+        executor, tool_executor, upstream_executor = _create_executors()
+        async_processor.http_session = None
+        shutdown_event.clear()
+        start_async_thread()
+        upstream_pool.start_health_checks()
+        start_stage_metrics_publisher()
+        start_idempotency_refresher()
+        _worker_pid = os.getpid()
+        logger.info("Worker background state initialized", extra=_log_fields("lifecycle", pid=_worker_pid))
+
+
+def start_rss_watchdog(limit_mb, on_limit):
+    """Call on_limit() once this process's RSS passes limit_mb.
+
+    on_limit should recycle gracefully (gunicorn: worker.alive = False, the
+    same path max_requests uses), so in-flight requests finish first.
+    """
+    if limit_mb <= 0:
+        return
+
+    def watch():
+        while not shutdown_event.is_set():
+            time.sleep(WORKER_RSS_CHECK_SECONDS)
+            rss_kb, _ = _read_rss_kb()
+            if rss_kb > limit_mb * 1024:
+                logger.warning(
+                    "Worker RSS over limit; recycling",
+                    extra=_log_fields("lifecycle", pid=os.getpid(), rss_mb=rss_kb // 1024, limit_mb=limit_mb),
+                )
+                on_limit()
+                return
+
+    threading.Thread(target=watch, daemon=True, name="rss-watchdog").start()
+
+
+@app.before_request
+def ensure_worker_initialized():
+    if _worker_pid != os.getpid():
+        init_worker()
 
 
 def timeout_handler(func):
@@ -1417,46 +3601,213 @@ def timeout_handler(func):
     return wrapper
 
 
+def _text_digest(text):
+    # Stable across processes, unlike hash(), so every worker and a shared
+    # store derive the same cache key for the same input.
+    return hashlib.sha1(text.encode("utf-8", "replace")).hexdigest()
+
+
 def get_cache_key(messages, mode, roast_level):
-    message_hash = hash(str(messages[-3:]))
+    message_hash = _text_digest(str(messages[-3:]))
     return f"{mode}_{roast_level}_{message_hash}"
 
 
-def is_cache_valid(timestamp):
-    return time.time() - timestamp < CACHE_DURATION
+def is_cache_valid(timestamp):
+    return time.time() - timestamp < CACHE_DURATION
+
+
+def _lookup_cached_response(messages, mode, roast_level):
+    """Return (cache_key, should_bypass_cache, cached_response or None).
+
+    In tools mode should_bypass_cache is always True: whether a reply can be
+    stored is only known once it is done (see _cache_reply). The lookup still
+    runs, so replies that qualified are served.
+    """
+    if ENABLE_LANGCHAIN_TOOLS:
+        should_bypass_cache = True
+        bucket = "tools"
+    else:
+        with _stage_timer("intent"):
+            is_time_sensitive = _is_time_sensitive_query(messages)
+            should_use_web = _should_enrich_with_web(messages)
+        should_bypass_cache = is_time_sensitive or should_use_web
+        bucket = "default"
+    cache_key = get_cache_key(messages, mode, roast_level)
+    if should_bypass_cache and bucket == "default":
+        return cache_key, should_bypass_cache, None
+
+    cached = response_cache.get(cache_key)
+    hit = cached is not None and is_cache_valid(cached[1])
+    with _response_cache_stats_lock:
+        _response_cache_stats[bucket]["hits" if hit else "misses"] += 1
+    return cache_key, should_bypass_cache, cached[0] if hit else None
+
+
+def _store_cached_response(cache_key, ai_message):
+    response_cache[cache_key] = (ai_message, time.time())
+    if len(response_cache) > 100:
+        old_keys = [k for k, (_, ts) in response_cache.items() if not is_cache_valid(ts)]
+        for key in old_keys[:50]:
+            response_cache.pop(key, None)
+
+
+def _context_fresh_seconds(messages, conversation):
+    """(context digest, seconds its REALTIME/WEB context stays fresh), or (None, 0)."""
+    contexts = [
+        msg["content"] for msg in conversation
+        if msg.get("role") == "system" and msg["content"].startswith(("REALTIME_CONTEXT", "WEB_CONTEXT"))
+    ]
+    if not contexts:
+        return None, 0.0
+
+    now_ts = time.time()
+    fresh = CACHE_DURATION
+    for content in contexts:
+        if content.startswith("REALTIME_CONTEXT"):
+            # The context quotes the time fetched into _live_time_cache; the
+            # local fallback isn't cached, so its digest never repeats anyway.
+            fresh = min(fresh, LIVE_TIME_CACHE_SECONDS - (now_ts - _live_time_cache.get("timestamp", 0.0)))
+        elif content.startswith("WEB_CONTEXT: No external web results"):
+            # A failed search is worth retrying, not caching.
+            return None, 0.0
+        else:
+            query = _get_latest_user_message(messages)
+            entry = _web_context_cache.get(f"default:{query.strip().lower()}") or {}
+            fresh = min(fresh, WEB_CONTEXT_CACHE_SECONDS - (now_ts - entry.get("timestamp", 0.0)))
+    return _text_digest("\n".join(contexts)), fresh
+
+
+def _lookup_context_reply(messages, mode, roast_level, conversation):
+    """Second cache tier for time- and web-grounded replies.
+
+    Returns (cache_key, ttl, cached_response or None); cache_key is None when
+    the conversation carries no cacheable context.
+    """
+    digest, fresh = _context_fresh_seconds(messages, conversation)
+    if digest is None or fresh < 1:
+        return None, 0.0, None
+    cache_key = f"{get_cache_key(messages, mode, roast_level)}_{digest}"
+    cached = context_reply_cache.get(cache_key)
+    hit = cached is not None and cached[1] > time.time()
+    with _context_cache_stats_lock:
+        _context_cache_stats["hits" if hit else "misses"] += 1
+    return cache_key, fresh, cached[0] if hit else None
+
+
+def _store_context_reply(cache_key, ai_message, ttl):
+    now_ts = time.time()
+    context_reply_cache[cache_key] = (ai_message, now_ts + ttl)
+    with _context_cache_stats_lock:
+        _context_cache_stats["stores"] += 1
+    if len(context_reply_cache) > 100:
+        old_keys = [k for k, (_, expires_at) in context_reply_cache.items() if expires_at <= now_ts]
+        for key in old_keys[:50]:
+            context_reply_cache.pop(key, None)
+
+
+# How long each tool's result stays true. A tools-mode reply goes into
+# response_cache only if every tool it called succeeded and stays fresh for
+# CACHE_DURATION; the clock tool never does.
+TOOL_RESULT_FRESH_SECONDS = {
+    "get_frankfurt_datetime": LIVE_TIME_CACHE_SECONDS,
+    "search_web_context": WEB_CONTEXT_CACHE_SECONDS,
+    "fetch_webpage": WEB_CONTEXT_CACHE_SECONDS,
+    "get_npm_package_info": 3600,
+    "get_python_release_info": 86400,
+    "get_music_album_releases": 3600,
+}
+
+
+def _tool_reply_cacheable(request_meta):
+    tool_results = (request_meta or {}).get("tool_results")
+    if tool_results is None:
+        # The tool loop never ran (e.g. LangChain unavailable).
+        return False
+    return all(ok and TOOL_RESULT_FRESH_SECONDS.get(name, 0) >= CACHE_DURATION for name, ok in tool_results)
+
+
+def _cache_reply(ai_message, cache_key, should_bypass_cache, request_meta, context_key=None, context_ttl=0.0):
+    """Store a freshly generated reply in whichever cache tier it qualifies for."""
+    if (request_meta or {}).get("upstream_failed"):
+        return
+    if not should_bypass_cache:
+        _store_cached_response(cache_key, ai_message)
+    elif context_key:
+        _store_context_reply(context_key, ai_message, context_ttl)
+    elif ENABLE_LANGCHAIN_TOOLS:
+        cacheable = _tool_reply_cacheable(request_meta)
+        with _response_cache_stats_lock:
+            _response_cache_stats["tools"]["stores" if cacheable else "uncacheable"] += 1
+        if cacheable:
+            _store_cached_response(cache_key, ai_message)
+
+
+def _response_cache_snapshot():
+    with _response_cache_stats_lock:
+        stats = {bucket: dict(counts) for bucket, counts in _response_cache_stats.items()}
+    for counts in stats.values():
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / lookups, 3) if lookups else 0.0
+    stats["entries"] = len(response_cache)
+    return stats
+
+
+def _context_cache_snapshot():
+    with _context_cache_stats_lock:
+        stats = dict(_context_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    stats["entries"] = len(context_reply_cache)
+    return stats
+
+
+def _fallback_reply(request_meta, text):
+    """Return an in-character stand-in for a failed upstream call, flagging the request.
+
+    Flagged replies reach the user but are never cached or saved to a session.
+    """
+    if request_meta is not None:
+        request_meta["upstream_failed"] = True
+    return text
 
 
 @timeout_handler
-def call_api(conversation):
-    """Make API call with error handling and retries."""
+def call_api(conversation, request_meta=None):
+    """Make API call with error handling, classified retries and the circuit breaker."""
+    delay = None
     for attempt in range(OPENROUTER_RETRY_ATTEMPTS):
         try:
-            if attempt > 0:
-                logger.info(f"Retrying API call (attempt {attempt + 1}/{OPENROUTER_RETRY_ATTEMPTS})")
-                time.sleep(OPENROUTER_RETRY_DELAY)
-
-            logger.info(f"Making API call (attempt {attempt + 1})...")
+            logger.info("Making API call (attempt %d)...", attempt + 1, extra=_log_fields("upstream"))
             start_time = time.time()
 
-            content = _call_model_with_optional_tools(conversation)
+            with _stage_timer("upstream"), upstream_breaker.guard():
+                content = _call_model_with_optional_tools(conversation, request_meta)
 
             processing_time = time.time() - start_time
-            logger.info(f"API call completed in {processing_time:.2f}s (attempt {attempt + 1})")
+            logger.info(
+                "API call completed in %.2fs (attempt %d)", processing_time, attempt + 1, extra=_log_fields("upstream")
+            )
 
             if content:
                 return content
-            else:
-                if attempt == OPENROUTER_RETRY_ATTEMPTS - 1:
-                    return "yo my brain just went blank... try asking me something else? 🤔"
-                continue
+            if attempt == OPENROUTER_RETRY_ATTEMPTS - 1:
+                return _fallback_reply(request_meta, "yo my brain just went blank... try asking me something else? 🤔")
 
         except Exception as e:
             logger.error(f"API error on attempt {attempt + 1}: {str(e)}", exc_info=True)
-            if attempt == OPENROUTER_RETRY_ATTEMPTS - 1:
-                return "yo my brain just glitched for a sec... what were we talking about again? 💀"
-            continue
+            delay = _retry_delay(e, delay) if attempt < OPENROUTER_RETRY_ATTEMPTS - 1 else None
+            if delay is None:
+                return _fallback_reply(
+                    request_meta, "yo my brain just glitched for a sec... what were we talking about again? 💀"
+                )
+            logger.info(
+                "Retrying API call in %.2fs (attempt %d/%d)", delay, attempt + 2, OPENROUTER_RETRY_ATTEMPTS,
+                extra=_log_fields("upstream"),
+            )
+            # Runs in the request's greenlet, where gevent makes this sleep cooperative.
+            time.sleep(delay)
 
-    return "yo something went really wrong with my brain... maybe try again? 😵"
+    return _fallback_reply(request_meta, "yo something went really wrong with my brain... maybe try again? 😵")
 
 
 def get_system_prompt(mode, roast_level):
@@ -1588,41 +3939,172 @@ If the user says:
 """
 
 
-def process_chat_request(messages, mode, roast_level):
-    try:
-        if ENABLE_LANGCHAIN_TOOLS:
-            should_bypass_cache = True
-        else:
-            is_time_sensitive = _is_time_sensitive_query(messages)
-            should_use_web = _should_enrich_with_web(messages)
-            should_bypass_cache = is_time_sensitive or should_use_web
-        cache_key = get_cache_key(messages, mode, roast_level)
-        if not should_bypass_cache and cache_key in response_cache:
-            cached_response, timestamp = response_cache[cache_key]
-            if is_cache_valid(timestamp):
-                logger.info("Returning cached response (sync)")
-                return cached_response
+def _estimate_tokens(text):
+    # ~4 characters per token for English chat text; close enough for
+    # budgeting without paying for a tokenizer import on every worker.
+    return len(text or "") // 4 + 1
+
+
+def _estimate_message_tokens(message):
+    return _estimate_tokens(message.get("content")) + 4
+
+
+def _estimate_conversation_tokens(conversation):
+    return sum(_estimate_message_tokens(msg) for msg in conversation)
+
+
+def _compact_history(messages):
+    """Split history into (kept, dropped): the newest turns that fit the budget, and the rest."""
+    used = 0
+    kept_count = 0
+    for msg in reversed(messages):
+        cost = _estimate_message_tokens(msg)
+        if kept_count and used + cost > CONVERSATION_TOKEN_BUDGET:
+            break
+        used += cost
+        kept_count += 1
+
+    split = len(messages) - kept_count
+    return messages[split:], messages[:split]
+
+
+def _prefix_digests(messages):
+    """Digest of every prefix of messages; digests[i] identifies messages[:i + 1]."""
+    running = hashlib.sha1()
+    digests = []
+    for msg in messages:
+        running.update(f"{msg.get('role')}\x1f{msg.get('content') or ''}\x1e".encode("utf-8"))
+        digests.append(running.hexdigest())
+    return digests
+
+
+def _summarize_turns(previous_summary, turns):
+    lines = [previous_summary] if previous_summary else []
+    for msg in turns:
+        speaker = "user" if msg.get("role") == "user" else "you"
+        text = " ".join((msg.get("content") or "").split())
+        if len(text) > 160:
+            text = text[:157] + "..."
+        lines.append(f"- {speaker}: {text}")
+
+    summary = "\n".join(lines)
+    max_chars = CONVERSATION_SUMMARY_TOKENS * 4
+    if len(summary) > max_chars:
+        # Keep the most recent points; cut at a line boundary.
+        summary = summary[-max_chars:]
+        summary = summary[summary.find("\n") + 1:] if "\n" in summary else summary
+    return summary
+
+
+def _summary_boundary_keys(messages, conversation_id=None):
+    """Cache key per summary boundary; keys[i] stands for the chat up to messages[i].
+
+    With a conversation id a key is that id plus the boundary message and the
+    one before it, so it still matches after MAX_HISTORY_MESSAGES has slid the
+    window past the chat's first turns, and the cached summary keeps those
+    turns. Without an id it is the digest of the whole prefix, which can never
+    match another chat.
+    """
+    if conversation_id is None:
+        return _prefix_digests(messages)
+    keys = []
+    previous = ""
+    for msg in messages:
+        current = f"{msg.get('role')}\x1f{msg.get('content') or ''}\x1e"
+        keys.append(f"{conversation_id}:{_text_digest(previous + current)}")
+        previous = current
+    return keys
+
+
+def _get_rolling_summary(dropped, conversation_id=None):
+    """Summary of the dropped prefix, extending the summary cached at the latest earlier boundary."""
+    keys = _summary_boundary_keys(dropped, conversation_id)
+    now_ts = time.time()
+
+    base_summary, start = "", 0
+    with _summary_cache_lock:
+        for idx in range(len(keys) - 1, -1, -1):
+            entry = _summary_cache.get(keys[idx])
+            if entry and now_ts - entry[1] < SUMMARY_CACHE_DURATION:
+                _summary_cache.move_to_end(keys[idx])
+                base_summary, start = entry[0], idx + 1
+                break
+
+    if start == len(keys):
+        with _prompt_token_stats_lock:
+            _prompt_token_stats["summary_cache_hits"] += 1
+        return base_summary
+
+    with _prompt_token_stats_lock:
+        _prompt_token_stats["summary_cache_misses"] += 1
+
+    summary = _summarize_turns(base_summary, dropped[start:])
+    with _summary_cache_lock:
+        _summary_cache[keys[-1]] = (summary, now_ts)
+        _summary_cache.move_to_end(keys[-1])
+        while len(_summary_cache) > SUMMARY_CACHE_MAX_ENTRIES:
+            _summary_cache.popitem(last=False)
+
+    return summary
+
+
+def _build_conversation(messages, mode, roast_level, request_meta=None):
+    """Persona prompt, guards, optional summary/context messages, then the budgeted history."""
+    system_prompt = get_system_prompt(mode, roast_level)
+    kept, dropped = _compact_history(messages)
+
+    conversation = [{"role": "system", "content": system_prompt}, _get_response_style_guard_message()]
+    if dropped:
+        conversation.append({
+            "role": "system",
+            "content": (
+                "CONVERSATION_SUMMARY: Earlier turns of this chat, condensed. "
+                "Treat them as things that were actually said.\n"
+                + _get_rolling_summary(dropped, (request_meta or {}).get("conversation_id"))
+            ),
+        })
+
+    if not ENABLE_LANGCHAIN_TOOLS:
+        realtime_context = _get_realtime_context_message(messages)
+        if realtime_context:
+            conversation.append(realtime_context)
+        web_context = _get_web_context_message(messages)
+        if web_context:
+            conversation.append(web_context)
+
+    conversation.extend(kept)
 
-        system_prompt = get_system_prompt(mode, roast_level)
-        conversation = [{"role": "system", "content": system_prompt}] + messages
-        conversation.insert(1, _get_response_style_guard_message())
-        if not ENABLE_LANGCHAIN_TOOLS:
-            realtime_context = _get_realtime_context_message(messages)
-            if realtime_context:
-                conversation.insert(2, realtime_context)
-            web_context = _get_web_context_message(messages)
-            if web_context:
-                conversation.insert(3 if realtime_context else 2, web_context)
+    prompt_tokens_estimate = _estimate_conversation_tokens(conversation)
+    with _prompt_token_stats_lock:
+        _prompt_token_stats["requests"] += 1
+        _prompt_token_stats["total_estimate"] += prompt_tokens_estimate
+        _prompt_token_stats["max_estimate"] = max(_prompt_token_stats["max_estimate"], prompt_tokens_estimate)
+        if dropped:
+            _prompt_token_stats["compacted_requests"] += 1
 
-        ai_message = call_api(conversation)
+    if request_meta is not None:
+        request_meta["prompt_tokens_estimate"] = prompt_tokens_estimate
+        request_meta["history_messages_summarized"] = len(dropped)
+    return conversation
 
-        if not should_bypass_cache:
-            response_cache[cache_key] = (ai_message, time.time())
 
-        if not should_bypass_cache and len(response_cache) > 100:
-            old_keys = [k for k, (_, ts) in response_cache.items() if not is_cache_valid(ts)]
-            for key in old_keys[:50]:
-                response_cache.pop(key, None)
+def process_chat_request(messages, mode, roast_level, request_meta=None):
+    try:
+        cache_key, should_bypass_cache, cached_response = _lookup_cached_response(messages, mode, roast_level)
+        if cached_response is not None:
+            logger.info("Returning cached response (sync)", extra=_log_fields("cache"))
+            return cached_response
+
+        conversation = _build_conversation(messages, mode, roast_level, request_meta)
+        context_key, context_ttl = None, 0.0
+        if should_bypass_cache:
+            context_key, context_ttl, cached_response = _lookup_context_reply(messages, mode, roast_level, conversation)
+            if cached_response is not None:
+                logger.info("Returning context-cached response (sync)", extra=_log_fields("cache"))
+                return cached_response
+
+        ai_message = call_api(conversation, request_meta)
+        _cache_reply(ai_message, cache_key, should_bypass_cache, request_meta, context_key, context_ttl)
 
         return ai_message
 
@@ -1631,11 +4113,14 @@ def process_chat_request(messages, mode, roast_level):
         raise
 
 
-def process_chat_request_hybrid(messages, mode, roast_level):
+def process_chat_request_hybrid(messages, mode, roast_level, request_meta=None):
     try:
         if async_thread and async_thread.is_alive() and async_processor.running:
             result_queue = queue.Queue()
-            request_data = (messages, mode, roast_level, result_queue)
+            request_data = (
+                messages, mode, roast_level, result_queue, request_meta, time.perf_counter(),
+                contextvars.copy_context(),
+            )
             request_queue.append(request_data)
 
             try:
@@ -1644,7 +4129,7 @@ def process_chat_request_hybrid(messages, mode, roast_level):
                 if isinstance(result, tuple) and len(result) == 2:
                     status, message = result
                     if status == 'success':
-                        logger.info("Request processed via async path")
+                        logger.info("Request processed via async path", extra=_log_fields("chat"))
                         return message
                     else:
                         logger.error(f"Async processing returned error: {message}")
@@ -1659,21 +4144,297 @@ def process_chat_request_hybrid(messages, mode, roast_level):
         else:
             logger.info("Async processing unavailable, using sync")
 
-        logger.info("Using synchronous processing")
-        return process_chat_request(messages, mode, roast_level)
+        logger.info("Using synchronous processing", extra=_log_fields("chat"))
+        return process_chat_request(messages, mode, roast_level, request_meta)
 
     except Exception as e:
         logger.error(f"Hybrid processing error: {str(e)}", exc_info=True)
-        return "whoa my brain just had a full system crash... classic monday vibes 💀"
+        return _fallback_reply(request_meta, "whoa my brain just had a full system crash... classic monday vibes 💀")
+
+
+def _resolve_session_messages(conversation_id, data):
+    """Messages for a session request: a full upload (re)seeds the session,
+    otherwise the stored history plus the single new user message."""
+    if data.get('messages'):
+        return data['messages'], None
+
+    new_message = data.get('message')
+    if isinstance(new_message, dict):
+        new_message = new_message.get('content')
+    if not isinstance(new_message, str) or not new_message.strip():
+        return [], None
+
+    try:
+        session = session_store.get(conversation_id)
+    except Exception as e:
+        logger.warning(f"Session store read failed: {str(e)}")
+        session = None
+    if session is None:
+        return [], 'session_expired'
+    return session.get('messages', []) + [{'role': 'user', 'content': new_message}], None
+
+
+def _save_session_messages(conversation_id, messages, ai_message):
+    history = list(messages) + [{'role': 'assistant', 'content': ai_message}]
+    try:
+        session_store.set(
+            conversation_id,
+            {'messages': history[-MAX_HISTORY_MESSAGES:]},
+            SESSION_TTL_SECONDS,
+        )
+    except Exception as e:
+        logger.warning(f"Session store write failed: {str(e)}")
+
+
+# Traffic capture. With CAPTURE_FILE set, CAPTURE_SAMPLE_RATE of /api/chat
+# requests are appended as JSON lines describing their shape only: message
+# roles and lengths, mode, roast level, detected intents and the outcome.
+# Message text is never written; repeats stay recognisable through salted
+# digests of the cache-key input and the conversation id. replay_traffic.py
+# turns a capture back into load.
+CAPTURE_FILE = os.getenv("CAPTURE_FILE", "")
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", "1.0"))
+# Read at import, so preloaded gunicorn workers all use the same salt.
+CAPTURE_SALT = (os.getenv("CAPTURE_SALT") or os.urandom(16).hex()).encode("utf-8")
+capture_sink = _configure_jsonl_sink(CAPTURE_FILE, "convince.capture")
+
+
+def _capture_digest(value):
+    return hmac.new(CAPTURE_SALT, value.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+
+def _capture_shape(messages, mode, roast_level, use_async, conversation_id):
+    """Anonymized shape of one chat request; no message text leaves this function."""
+    return {
+        "ts": round(time.time(), 3),
+        "started": time.perf_counter(),
+        "mode": mode,
+        "roast_level": roast_level,
+        "use_async": bool(use_async),
+        "conversation": _capture_digest(conversation_id) if conversation_id is not None else None,
+        "messages": [[msg.get("role"), len(str(msg.get("content") or ""))] for msg in messages],
+        "cache_digest": _capture_digest(str(messages[-3:])),
+        "time_sensitive": _is_time_sensitive_query(messages),
+        "web": bool(_should_enrich_with_web(messages)),
+        "tools": ENABLE_LANGCHAIN_TOOLS and LANGCHAIN_AVAILABLE,
+    }
+
+
+# Idempotency-Key on /api/chat ("k" on WebSocket chat frames). The first
+# request with a key claims it in idempotency_store (shared across workers
+# with SHARED_STORE_URI=sqlite/redis) and its 200 response is kept for
+# IDEMPOTENCY_TTL_SECONDS. A duplicate on either transport waits up to
+# IDEMPOTENCY_WAIT_SECONDS for an in-flight original and then gets the stored
+# reply, marked Idempotent-Replayed. Errors and fallback replies (the
+# upstream failed) release the key so a retry runs again. A worker refreshes
+# its claims every IDEMPOTENCY_PENDING_SECONDS / 3 while they run, however long
+# retries, hedges and tool rounds take; a claim whose worker died expires
+# after IDEMPOTENCY_PENDING_SECONDS. Reusing a key for a different message is
+# a 422.
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+IDEMPOTENCY_PENDING_SECONDS = int(os.getenv("IDEMPOTENCY_PENDING_SECONDS", "120"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "90"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "5000"))
+idempotency_store = create_shared_store("idempotency", IDEMPOTENCY_MAX_ENTRIES)
+# Keys this worker is computing; duplicates landing here wait on the event
+# instead of polling the store.
+_idempotency_in_flight = {}
+# key -> fingerprint of the claims this worker holds, refreshed in the store
+# until released. The lock keeps a refresh from landing after the release.
+_idempotency_claims = {}
+_idempotency_claims_lock = threading.Lock()
+_idempotency_stats = {"claimed": 0, "replayed": 0, "attached": 0, "mismatched": 0, "timed_out": 0}
+_idempotency_stats_lock = threading.Lock()
+
+
+def _count_idempotency(key):
+    with _idempotency_stats_lock:
+        _idempotency_stats[key] += 1
+
+
+def _idempotency_digest(raw_key):
+    raw_key = (raw_key or "").strip()
+    return hashlib.sha256(raw_key.encode("utf-8", "replace")).hexdigest() if raw_key else None
+
+
+def _idempotency_fingerprint(conversation_id, mode, roast_level, latest):
+    """Digest of what the request asks for, independent of how it was sent.
+
+    The HTTP delta, its full-history re-upload and the WebSocket frame for
+    one user message all match, so a client can retry any of them on the
+    other transport with the same key.
+    """
+    if isinstance(latest, dict):
+        latest = latest.get("content")
+    identity = [conversation_id, mode, roast_level, str(latest or "")]
+    return hashlib.sha256(_json_dumps(identity).encode("utf-8")).hexdigest()[:32]
+
+
+def _await_idempotency_key(key, fingerprint):
+    """Claim key, or wait for the request holding it.
+
+    Returns ("claimed", None), ("done", entry), ("mismatched", None), or
+    ("in_progress", None) once IDEMPOTENCY_WAIT_SECONDS have passed. A
+    claimed key must be handed back with _release_idempotency_key.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    waited = False
+    while True:
+        if idempotency_store.add(key, {"state": "pending", "fp": fingerprint}, IDEMPOTENCY_PENDING_SECONDS):
+            _count_idempotency("claimed")
+            _idempotency_in_flight[key] = threading.Event()
+            with _idempotency_claims_lock:
+                _idempotency_claims[key] = fingerprint
+            return "claimed", None
+
+        entry = idempotency_store.get(key)
+        if entry is None:
+            # Released or expired between add() and get(); try to claim it.
+            continue
+        if entry.get("fp") != fingerprint:
+            _count_idempotency("mismatched")
+            return "mismatched", None
+        if entry.get("state") == "done":
+            _count_idempotency("attached" if waited else "replayed")
+            return "done", entry
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            _count_idempotency("timed_out")
+            return "in_progress", None
+        waited = True
+        local = _idempotency_in_flight.get(key)
+        if local is not None:
+            local.wait(remaining)
+        else:
+            # The original runs in another worker; poll the shared store.
+            time.sleep(min(0.25, remaining))
+
+
+def _release_idempotency_key(key, fingerprint, body=None):
+    """Store the successful reply's JSON body under key, or free the key for a retry."""
+    with _idempotency_claims_lock:
+        _idempotency_claims.pop(key, None)
+    stored = False
+    try:
+        if body is not None:
+            idempotency_store.set(key, {
+                "state": "done",
+                "fp": fingerprint,
+                "status": 200,
+                "body": body,
+            }, IDEMPOTENCY_TTL_SECONDS)
+            stored = True
+    finally:
+        if not stored:
+            idempotency_store.delete(key)
+        done = _idempotency_in_flight.pop(key, None)
+        if done is not None:
+            done.set()
+
+
+def start_idempotency_refresher():
+    """Keep this worker's claims from expiring while their requests run."""
+    interval = max(1.0, IDEMPOTENCY_PENDING_SECONDS / 3)
+
+    def refresh():
+        while not shutdown_event.is_set():
+            time.sleep(interval)
+            with _idempotency_claims_lock:
+                claims = list(_idempotency_claims.items())
+            for key, fingerprint in claims:
+                try:
+                    with _idempotency_claims_lock:
+                        if key in _idempotency_claims:
+                            idempotency_store.set(
+                                key, {"state": "pending", "fp": fingerprint}, IDEMPOTENCY_PENDING_SECONDS
+                            )
+                except Exception as e:
+                    logger.warning(f"Idempotency claim refresh failed: {str(e)}")
+
+    threading.Thread(target=refresh, daemon=True, name="idempotency-refresh").start()
+
+
+def _run_idempotent(view, key, fingerprint, args, kwargs):
+    body = None
+    try:
+        response = app.make_response(view(*args, **kwargs))
+        # A fallback reply is a 200 too, but a retry should reach the upstream again.
+        if response.status_code == 200 and not g.get('upstream_failed'):
+            body = response.get_data(as_text=True)
+        return response
+    finally:
+        _release_idempotency_key(key, fingerprint, body)
+
+
+def _replay_idempotent(entry):
+    response = app.response_class(entry["body"], status=entry["status"], mimetype="application/json")
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _http_idempotency_fingerprint():
+    data = request.get_json(silent=True) or {}
+    conversation_id = data.get('conversationId')
+    latest = data.get('message')
+    if latest is None:
+        messages = data.get('messages') or [None]
+        latest = messages[-1] if isinstance(messages, list) else None
+    return _idempotency_fingerprint(
+        str(conversation_id)[:128] if conversation_id is not None else None,
+        data.get('mode', 'convince-ai'),
+        data.get('roastLevel', 5),
+        latest,
+    )
+
+
+def idempotent(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        key = _idempotency_digest(request.headers.get("Idempotency-Key"))
+        if key is None:
+            return func(*args, **kwargs)
+        fingerprint = _http_idempotency_fingerprint()
+
+        outcome, entry = _await_idempotency_key(key, fingerprint)
+        if outcome == "claimed":
+            return _run_idempotent(func, key, fingerprint, args, kwargs)
+        if outcome == "done":
+            return _replay_idempotent(entry)
+        if outcome == "mismatched":
+            return jsonify({
+                'error': 'Idempotency-Key was already used for a different request',
+                'code': 'idempotency_key_reused',
+                'success': False
+            }), 422
+        response = jsonify({
+            'error': 'A request with this Idempotency-Key is still being processed',
+            'code': 'idempotency_in_progress',
+            'success': False
+        })
+        response.headers["Retry-After"] = "5"
+        return response, 409
+    return wrapper
+
+
+def _idempotency_snapshot():
+    with _idempotency_stats_lock:
+        stats = dict(_idempotency_stats)
+    stats["in_flight"] = len(_idempotency_in_flight)
+    stats["stored"] = idempotency_store.size()
+    return stats
 
 
 @app.route('/api/chat', methods=['POST'])
-@limiter.limit("10 per minute")
+@limiter.shared_limit(CHAT_RATE_LIMIT, scope=CHAT_RATE_LIMIT_SCOPE)
+@idempotent
 def chat():
     request_start = time.time()
+    request_started = time.perf_counter()
+    g.trace = _start_trace("POST /api/chat", request.headers.get("traceparent"))
     request_size = len(request.get_data(cache=True) or b"")
     logger.info(
-        f"[{time.strftime('%H:%M:%S')}] REQUEST RECEIVED from {request.remote_addr} - {request_size} bytes"
+        "REQUEST RECEIVED", extra=_log_fields("chat", remote=request.remote_addr, bytes=request_size)
     )
 
     try:
@@ -1683,45 +4444,70 @@ def chat():
         mode = data.get('mode', 'convince-ai')
         roast_level = data.get('roastLevel', 5)
         use_async = data.get('useAsync', True)
+        conversation_id = data.get('conversationId')
+
+        if conversation_id is not None:
+            conversation_id = str(conversation_id)[:128]
+            messages, session_error = _resolve_session_messages(conversation_id, data)
+            if session_error == 'session_expired':
+                # Client resends the full history with the same conversationId.
+                return jsonify({
+                    'error': 'Conversation session not found; resend full history',
+                    'code': 'session_expired',
+                    'success': False
+                }), 409
 
         if not messages:
             return jsonify({'error': 'No messages provided', 'success': False}), 400
 
-        if len(messages) > 20:
-            messages = messages[-20:]
+        # Hard cap only; the token budget in _build_conversation does the real trimming.
+        if len(messages) > MAX_HISTORY_MESSAGES:
+            messages = messages[-MAX_HISTORY_MESSAGES:]
+        # conversation_id keys the rolling summary (see _summary_boundary_keys).
+        request_meta = {'conversation_id': conversation_id}
+        if capture_sink is not None and random.random() < CAPTURE_SAMPLE_RATE:
+            g.capture = _capture_shape(messages, mode, roast_level, use_async, conversation_id)
 
         after_parse = time.time()
+        _observe_stage("parse", request_started)
         logger.info(
-            f"[{time.strftime('%H:%M:%S')}] PARSED in {(after_parse - request_start) * 1000:.0f}ms "
-            f"- Mode: {mode}, Roast Level: {roast_level}, Async: {use_async}"
-        )
-        logger.info(
-            f"[{time.strftime('%H:%M:%S')}] TOOLING CONFIG "
-            f"ENABLE_LANGCHAIN_TOOLS={ENABLE_LANGCHAIN_TOOLS} LANGCHAIN_AVAILABLE={LANGCHAIN_AVAILABLE}"
+            "PARSED",
+            extra=_log_fields(
+                "chat",
+                parse_ms=int((after_parse - request_start) * 1000),
+                mode=mode,
+                roast_level=roast_level,
+                use_async=use_async,
+                tools=ENABLE_LANGCHAIN_TOOLS and LANGCHAIN_AVAILABLE,
+            ),
         )
 
         try:
             if use_async and async_thread and async_thread.is_alive():
-                logger.info(f"[{time.strftime('%H:%M:%S')}] Using HYBRID async path")
                 processing_method = "hybrid"
                 after_submit = time.time()
                 logger.info(
-                    f"[{time.strftime('%H:%M:%S')}] DISPATCHED inline in {(after_submit - after_parse) * 1000:.0f}ms"
+                    "DISPATCHED",
+                    extra=_log_fields("chat", path=processing_method, dispatch_ms=int((after_submit - after_parse) * 1000)),
                 )
-                ai_message = process_chat_request_hybrid(messages, mode, roast_level)
+                ai_message = process_chat_request_hybrid(messages, mode, roast_level, request_meta)
             else:
-                logger.info(f"[{time.strftime('%H:%M:%S')}] Using SYNC path (async thread unavailable)")
                 processing_method = "sync"
                 after_submit = time.time()
                 logger.info(
-                    f"[{time.strftime('%H:%M:%S')}] DISPATCHED inline in {(after_submit - after_parse) * 1000:.0f}ms"
+                    "DISPATCHED (async thread unavailable)",
+                    extra=_log_fields("chat", path=processing_method, dispatch_ms=int((after_submit - after_parse) * 1000)),
                 )
-                ai_message = process_chat_request(messages, mode, roast_level)
+                ai_message = process_chat_request(messages, mode, roast_level, request_meta)
 
             after_result = time.time()
             logger.info(
-                f"[{time.strftime('%H:%M:%S')}] GOT RESULT in {(after_result - after_submit) * 1000:.0f}ms "
-                f"| total so far {(after_result - request_start) * 1000:.0f}ms"
+                "GOT RESULT",
+                extra=_log_fields(
+                    "chat",
+                    result_ms=int((after_result - after_submit) * 1000),
+                    total_ms=int((after_result - request_start) * 1000),
+                ),
             )
 
             if not ai_message or not isinstance(ai_message, str):
@@ -1739,18 +4525,46 @@ def chat():
                 'processing_method': processing_method
             }), 500
 
+        # Fallback replies never become assistant turns the model would see again.
+        if conversation_id is not None and not request_meta.get('upstream_failed'):
+            _save_session_messages(conversation_id, messages, ai_message)
+
         processing_time = time.time() - request_start
+        usage = _usage_response(request_meta)
+        _account_request_usage(request_meta, mode, roast_level, processing_method, processing_time)
         logger.info(
-            f"[{time.strftime('%H:%M:%S')}] REQUEST FULLY PROCESSED in {processing_time:.2f}s via {processing_method}"
+            "REQUEST FULLY PROCESSED",
+            extra=_log_fields(
+                "chat",
+                seconds=round(processing_time, 3),
+                path=processing_method,
+                prompt_tokens=usage and usage["prompt_tokens"],
+                completion_tokens=usage and usage["completion_tokens"],
+                cached_tokens=usage and usage["cached_tokens"],
+            ),
         )
 
-        return jsonify({
-            'message': ai_message,
-            'success': True,
-            'processing_time': round(processing_time, 2),
-            'processing_method': processing_method,
-            'queue_size': len(request_queue) if use_async else 0
-        })
+        g.upstream_failed = bool(request_meta.get('upstream_failed'))
+        g.trace_attrs = {"path": processing_method, "mode": mode}
+        if usage:
+            g.trace_attrs["prompt_tokens"] = usage["prompt_tokens"]
+            g.trace_attrs["completion_tokens"] = usage["completion_tokens"]
+        with _stage_timer("serialize"):
+            response = jsonify({
+                'message': ai_message,
+                'success': True,
+                'processing_time': round(processing_time, 2),
+                'processing_method': processing_method,
+                'queue_size': len(request_queue) if use_async else 0,
+                'prompt_tokens_estimate': request_meta.get('prompt_tokens_estimate'),
+                'history_messages_summarized': request_meta.get('history_messages_summarized', 0),
+                'upstream_target': request_meta.get('upstream_target'),
+                'usage': usage,
+                'upstream_failed': bool(request_meta.get('upstream_failed')),
+                'conversation_id': conversation_id
+            })
+        _observe_stage("total", request_started)
+        return response
 
     except Exception as e:
         processing_time = time.time() - request_start
@@ -1761,6 +4575,327 @@ def chat():
         }), 500
 
 
+@app.after_request
+def finish_request_trace(response):
+    trace = g.pop('trace', None)
+    if trace is not None:
+        response.headers['X-Trace-Id'] = trace['trace_id']
+        _finish_trace(trace, status=response.status_code, **g.pop('trace_attrs', {}))
+    return response
+
+
+# Registered after finish_request_trace, so it runs first and still sees trace_attrs.
+@app.after_request
+def write_request_capture(response):
+    shape = g.pop('capture', None)
+    if shape is not None:
+        shape["latency_ms"] = round((time.perf_counter() - shape.pop("started")) * 1000, 1)
+        shape["status"] = response.status_code
+        shape["path"] = g.get('trace_attrs', {}).get("path")
+        capture_sink.info(shape)
+    return response
+
+
+# WebSocket chat channel: one connection per chat, compact JSON frames.
+#   client -> server  {"t": "chat", "id": req_id, "m": text, "h": [history]?, "mode": ..., "r": roast, "k": key?}
+#                     {"t": "ping"}
+#   server -> client  {"t": "d", "id": req_id, "c": chunk}          streamed delta
+#                     {"t": "done", "id": req_id, "m": final, "ms": ..., "pm": method, "ut": target, "u": usage}
+#                                                                 ("rp": true when replayed for an idempotency key)
+#                     {"t": "err", "id": req_id, "e": error, "code": ...}
+#                     {"t": "hb", "ts": ...} / {"t": "pong"}
+# Chat frames are handled on the receive loop, one at a time; a heartbeat
+# thread per connection sends "hb" whenever nothing else went out for
+# WS_HEARTBEAT_SECONDS, including while a slow reply is being produced.
+WS_HEARTBEAT_SECONDS = int(os.getenv("WS_HEARTBEAT_SECONDS", "20"))
+_websocket_stats = {
+    "connections_open": 0,
+    "connections_total": 0,
+    "frames_in": 0,
+    "frames_out": 0,
+    "replies": 0,
+    "reply_ms_total": 0.0,
+    "reply_ms_max": 0.0,
+}
+_websocket_stats_lock = threading.Lock()
+
+
+class _WsConnection:
+    """A socket shared by the receive loop and its heartbeat thread; sends are serialized."""
+
+    def __init__(self, ws):
+        self._ws = ws
+        # Created per connection, so gevent workers get a patched lock.
+        self._send_lock = threading.Lock()
+        self.last_sent = time.monotonic()
+
+    def send(self, data):
+        with self._send_lock:
+            self._ws.send(data)
+            self.last_sent = time.monotonic()
+
+    def receive(self, timeout=None):
+        return self._ws.receive(timeout=timeout)
+
+
+def _start_ws_heartbeat(conn, closed):
+    def beat():
+        while not closed.wait(max(0.0, conn.last_sent + WS_HEARTBEAT_SECONDS - time.monotonic())):
+            if time.monotonic() - conn.last_sent < WS_HEARTBEAT_SECONDS:
+                continue
+            try:
+                _ws_send(conn, {"t": "hb", "ts": int(time.time())})
+            except Exception:
+                # The receive loop sees the closed socket and cleans up.
+                return
+
+    threading.Thread(target=beat, daemon=True, name="ws-heartbeat").start()
+
+
+def _ws_send(ws, frame):
+    ws.send(_json_dumps(frame))
+    with _websocket_stats_lock:
+        _websocket_stats["frames_out"] += 1
+
+
+def _stream_chat_reply(messages, mode, roast_level, on_delta, request_meta=None):
+    """Produce a reply, streaming deltas through on_delta where the path allows.
+
+    Returns (ai_message, processing_method). Tool routing can't stream, so it
+    goes through the hybrid path and only the final message is sent.
+    """
+    if ENABLE_LANGCHAIN_TOOLS and _load_langchain():
+        return process_chat_request_hybrid(messages, mode, roast_level, request_meta), "hybrid"
+
+    cache_key, should_bypass_cache, cached_response = _lookup_cached_response(messages, mode, roast_level)
+    if cached_response is not None:
+        return cached_response, "cache"
+
+    conversation = _build_conversation(messages, mode, roast_level, request_meta)
+    context_key, context_ttl = None, 0.0
+    if should_bypass_cache:
+        context_key, context_ttl, cached_response = _lookup_context_reply(messages, mode, roast_level, conversation)
+        if cached_response is not None:
+            return cached_response, "cache"
+
+    chunks = []
+    client_error = None
+    try:
+        with upstream_breaker.guard():
+            for delta in _stream_proxy(conversation, request_meta):
+                chunks.append(delta)
+                try:
+                    on_delta(delta)
+                except Exception as e:
+                    # A client that hung up is not an upstream failure; keep it out of the breaker.
+                    client_error = e
+                    break
+    except Exception as e:
+        if chunks:
+            raise
+        logger.warning(f"[ws] streaming unavailable, using blocking call: {str(e)}")
+    if client_error is not None:
+        raise client_error
+
+    ai_message = _extract_content("".join(chunks)) if chunks else ""
+    processing_method = "stream"
+    if not ai_message:
+        ai_message = call_api(conversation, request_meta)
+        processing_method = "sync"
+
+    _cache_reply(ai_message, cache_key, should_bypass_cache, request_meta, context_key, context_ttl)
+    return ai_message, processing_method
+
+
+def _handle_ws_chat_frame(ws, conversation_id, frame):
+    trace = _start_trace("ws chat")
+    try:
+        _handle_ws_chat_frame_traced(ws, conversation_id, frame)
+    finally:
+        _finish_trace(trace)
+
+
+def _handle_ws_chat_frame_traced(ws, conversation_id, frame):
+    started_at = time.perf_counter()
+    request_id = frame.get("id")
+    mode = frame.get("mode", "convince-ai")
+    roast_level = frame.get("r", 5)
+
+    key = _idempotency_digest(frame.get("k"))
+    if key is None:
+        _reply_ws_chat_frame(ws, conversation_id, frame, mode, roast_level)
+        return
+
+    latest = frame.get("m")
+    if latest is None:
+        history = frame.get("h") or [None]
+        latest = history[-1] if isinstance(history, list) else None
+    fingerprint = _idempotency_fingerprint(conversation_id, mode, roast_level, latest)
+    outcome, entry = _await_idempotency_key(key, fingerprint)
+    if outcome == "claimed":
+        body = None
+        try:
+            reply = _reply_ws_chat_frame(ws, conversation_id, frame, mode, roast_level)
+            if reply is not None and not reply['upstream_failed']:
+                body = _json_dumps(reply)
+        finally:
+            _release_idempotency_key(key, fingerprint, body)
+    elif outcome == "done":
+        # The same message already ran here or over HTTP; send its reply again.
+        reply = _json_loads(entry["body"])
+        _ws_send(ws, {
+            "t": "done",
+            "id": request_id,
+            "m": reply.get("message"),
+            "ms": round((time.perf_counter() - started_at) * 1000),
+            "pm": reply.get("processing_method"),
+            "rp": True,
+        })
+    elif outcome == "mismatched":
+        _ws_send(ws, {
+            "t": "err", "id": request_id, "e": "Idempotency key was already used for a different message",
+            "code": "idempotency_key_reused",
+        })
+    else:
+        _ws_send(ws, {
+            "t": "err", "id": request_id, "e": "This message is still being processed",
+            "code": "idempotency_in_progress",
+        })
+
+
+def _reply_ws_chat_frame(ws, conversation_id, frame, mode, roast_level):
+    """Answer one chat frame; returns the reply as /api/chat would have, or None on error."""
+    started_at = time.perf_counter()
+    request_id = frame.get("id")
+
+    messages, session_error = _resolve_session_messages(
+        conversation_id, {"messages": frame.get("h"), "message": frame.get("m")}
+    )
+    if session_error:
+        _ws_send(ws, {"t": "err", "id": request_id, "e": "Session not found; resend history", "code": session_error})
+        return None
+    if not messages:
+        _ws_send(ws, {"t": "err", "id": request_id, "e": "No message provided"})
+        return None
+
+    messages = messages[-MAX_HISTORY_MESSAGES:]
+    request_meta = {"conversation_id": conversation_id}
+    try:
+        ai_message, processing_method = _stream_chat_reply(
+            messages,
+            mode,
+            roast_level,
+            lambda chunk: _ws_send(ws, {"t": "d", "id": request_id, "c": chunk}),
+            request_meta,
+        )
+    except Exception as e:
+        logger.error(f"[ws] chat frame failed: {str(e)}")
+        _ws_send(ws, {"t": "err", "id": request_id, "e": "Request processing failed"})
+        return None
+
+    if not request_meta.get("upstream_failed"):
+        _save_session_messages(conversation_id, messages, ai_message)
+    elapsed_ms = (time.perf_counter() - started_at) * 1000
+    _account_request_usage(request_meta, mode, roast_level, processing_method, elapsed_ms / 1000)
+    _ws_send(ws, {
+        "t": "done",
+        "id": request_id,
+        "m": ai_message,
+        "ms": round(elapsed_ms),
+        "pm": processing_method,
+        "ut": request_meta.get("upstream_target"),
+        "u": _usage_response(request_meta),
+    })
+
+    with _websocket_stats_lock:
+        _websocket_stats["replies"] += 1
+        _websocket_stats["reply_ms_total"] += elapsed_ms
+        _websocket_stats["reply_ms_max"] = max(_websocket_stats["reply_ms_max"], elapsed_ms)
+
+    return {
+        'message': ai_message,
+        'success': True,
+        'processing_time': round(elapsed_ms / 1000, 2),
+        'processing_method': processing_method,
+        'upstream_target': request_meta.get('upstream_target'),
+        'usage': _usage_response(request_meta),
+        'upstream_failed': bool(request_meta.get('upstream_failed')),
+        'conversation_id': conversation_id,
+    }
+
+
+def _take_chat_rate_limit():
+    """Spend one request of the caller's CHAT_RATE_LIMIT; False once it is used up.
+
+    Hits the same bucket as the shared limit on /api/chat (key, then scope).
+    """
+    if not limiter.enabled:
+        return True
+    return limiter.limiter.hit(parse_rate_limit(CHAT_RATE_LIMIT), get_remote_address(), CHAT_RATE_LIMIT_SCOPE)
+
+
+def chat_socket(ws):
+    conversation_id = (request.args.get("c") or "").strip()[:128]
+    if not conversation_id:
+        _ws_send(ws, {"t": "err", "e": "Missing conversation id (?c=)"})
+        return
+
+    with _websocket_stats_lock:
+        _websocket_stats["connections_open"] += 1
+        _websocket_stats["connections_total"] += 1
+
+    ws = _WsConnection(ws)
+    closed = threading.Event()
+    _start_ws_heartbeat(ws, closed)
+    try:
+        while True:
+            raw = ws.receive()
+
+            with _websocket_stats_lock:
+                _websocket_stats["frames_in"] += 1
+            try:
+                frame = _json_loads(raw)
+            except (TypeError, ValueError):
+                _ws_send(ws, {"t": "err", "e": "Invalid frame"})
+                continue
+
+            frame_type = frame.get("t")
+            if frame_type == "ping":
+                _ws_send(ws, {"t": "pong"})
+            elif frame_type == "chat":
+                if not _take_chat_rate_limit():
+                    _ws_send(ws, {"t": "err", "id": frame.get("id"), "e": "Rate limit exceeded", "code": "rate_limited"})
+                    continue
+                _handle_ws_chat_frame(ws, conversation_id, frame)
+            else:
+                _ws_send(ws, {"t": "err", "e": f"Unknown frame type: {frame_type}"})
+    except Exception as e:
+        # ConnectionClosed and friends end up here; nothing to report back.
+        logger.info(f"[ws] connection closed conversation={conversation_id[:32]}: {type(e).__name__}")
+    finally:
+        closed.set()
+        with _websocket_stats_lock:
+            _websocket_stats["connections_open"] -= 1
+
+
+if Sock is not None:
+    sock = Sock(app)
+    sock.route('/api/ws')(chat_socket)
+else:
+    sock = None
+    logger.info("flask-sock not installed; WebSocket chat channel (/api/ws) disabled")
+
+
+def _websocket_snapshot():
+    with _websocket_stats_lock:
+        stats = dict(_websocket_stats)
+    stats["enabled"] = sock is not None
+    stats["avg_reply_ms"] = round(stats["reply_ms_total"] / stats["replies"], 1) if stats["replies"] else 0
+    stats["reply_ms_max"] = round(stats["reply_ms_max"], 1)
+    stats.pop("reply_ms_total")
+    return stats
+
+
 @app.route('/api/health', methods=['GET'])
 def health():
     try:
@@ -1789,11 +4924,14 @@ def health():
             'tooling': {
                 'enable_langchain_tools': ENABLE_LANGCHAIN_TOOLS,
                 'langchain_available': LANGCHAIN_AVAILABLE,
+                'langchain_loaded': _langchain_loaded,
                 'routing_mode': 'langchain-tools' if (ENABLE_LANGCHAIN_TOOLS and LANGCHAIN_AVAILABLE) else 'direct-proxy'
             },
             'thread_pool': thread_pool_status,
             'async_processing': async_status,
             'cache': cache_status,
+            'upstream_breaker': upstream_breaker.snapshot(),
+            'json_backend': JSON_BACKEND,
             'version': '3.0.0-async-threading'
         })
     except Exception as e:
@@ -1801,22 +4939,143 @@ def health():
         return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
 
 
+def _prompt_token_snapshot():
+    with _prompt_token_stats_lock:
+        stats = dict(_prompt_token_stats)
+    stats["avg_estimate"] = round(stats["total_estimate"] / stats["requests"], 1) if stats["requests"] else 0
+    stats["budget"] = CONVERSATION_TOKEN_BUDGET
+    stats["summary_cache_size"] = len(_summary_cache)
+    return stats
+
+
+def _account_request_usage(request_meta, mode, roast_level, processing_method, seconds):
+    """Fold a finished request's upstream usage into the per-route and latency tables.
+
+    Requests served without an upstream call (cache hits) have no usage and
+    are left out, so averages describe requests that paid for tokens.
+    """
+    usage = request_meta.get("usage")
+    if not usage:
+        return
+    mode_key = mode if mode in ("convince-ai", "convince-human") else "other"
+    roast_key = str(roast_level) if isinstance(roast_level, int) and 1 <= roast_level <= 10 else "other"
+    route_key = f"{mode_key}|{roast_key}|{processing_method}/{request_meta.get('route', 'direct-proxy')}"
+    prompt_tokens = usage["prompt_tokens"]
+    bucket = next((f"<={bound}" for bound in TOKEN_LATENCY_BUCKETS if prompt_tokens <= bound), f">{TOKEN_LATENCY_BUCKETS[-1]}")
+    latency_ms = seconds * 1000
+
+    with _token_usage_lock:
+        row = _token_usage_by_route.setdefault(route_key, {
+            "requests": 0,
+            "upstream_calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cached_tokens": 0,
+            "cost_usd": 0.0,
+            "latency_ms_total": 0.0,
+        })
+        row["requests"] += 1
+        for field in ("upstream_calls", "prompt_tokens", "completion_tokens", "cached_tokens", "cost_usd"):
+            row[field] += usage[field]
+        row["latency_ms_total"] += latency_ms
+
+        latency = _token_latency_by_prompt.setdefault(bucket, {
+            "requests": 0,
+            "completion_tokens": 0,
+            "latency_ms_total": 0.0,
+            "latency_ms_max": 0.0,
+        })
+        latency["requests"] += 1
+        latency["completion_tokens"] += usage["completion_tokens"]
+        latency["latency_ms_total"] += latency_ms
+        latency["latency_ms_max"] = max(latency["latency_ms_max"], latency_ms)
+
+
+def _token_usage_snapshot():
+    with _token_usage_lock:
+        stats = dict(_token_usage_stats)
+        by_route = {key: dict(row) for key, row in _token_usage_by_route.items()}
+        by_prompt = {key: dict(row) for key, row in _token_latency_by_prompt.items()}
+    stats["cost_usd"] = round(stats["cost_usd"], 6)
+    stats["cache_read_ratio"] = round(stats["cached_tokens"] / stats["prompt_tokens"], 3) if stats["prompt_tokens"] else 0.0
+
+    stats["by_route"] = {}
+    for key, row in sorted(by_route.items()):
+        mode, roast_level, path = key.split("|")
+        requests = row["requests"]
+        stats["by_route"][key] = {
+            "mode": mode,
+            "roast_level": roast_level,
+            "path": path,
+            "requests": requests,
+            "upstream_calls": row["upstream_calls"],
+            "prompt_tokens": row["prompt_tokens"],
+            "completion_tokens": row["completion_tokens"],
+            "cached_tokens": row["cached_tokens"],
+            "cost_usd": round(row["cost_usd"], 6),
+            "avg_prompt_tokens": round(row["prompt_tokens"] / requests, 1),
+            "avg_completion_tokens": round(row["completion_tokens"] / requests, 1),
+            "avg_latency_ms": round(row["latency_ms_total"] / requests, 1),
+        }
+
+    bucket_order = [f"<={bound}" for bound in TOKEN_LATENCY_BUCKETS] + [f">{TOKEN_LATENCY_BUCKETS[-1]}"]
+    stats["latency_by_prompt_tokens"] = {
+        bucket: {
+            "requests": by_prompt[bucket]["requests"],
+            "avg_completion_tokens": round(by_prompt[bucket]["completion_tokens"] / by_prompt[bucket]["requests"], 1),
+            "avg_latency_ms": round(by_prompt[bucket]["latency_ms_total"] / by_prompt[bucket]["requests"], 1),
+            "max_latency_ms": round(by_prompt[bucket]["latency_ms_max"], 1),
+        }
+        for bucket in bucket_order
+        if bucket in by_prompt
+    }
+    return stats
+
+
+def _usage_response(request_meta):
+    usage = request_meta.get("usage")
+    if not usage:
+        return None
+    return {**usage, "cost_usd": round(usage["cost_usd"], 6), "route": request_meta.get("route")}
+
+
 @app.route('/api/metrics', methods=['GET'])
 def metrics():
     try:
         return jsonify({
             'cache_size': len(response_cache),
+            'response_cache': _response_cache_snapshot(),
+            'context_cache': _context_cache_snapshot(),
+            'idempotency': _idempotency_snapshot(),
             'active_threads': executor._threads and len(executor._threads) or 0,
             'max_workers': executor._max_workers,
             'async_queue_size': len(request_queue),
             'async_thread_alive': async_thread.is_alive() if async_thread else False,
             'active_requests': len(active_requests),
+            'prompt_tokens': _prompt_token_snapshot(),
+            'token_usage': _token_usage_snapshot(),
+            'websocket': _websocket_snapshot(),
+            'compression': _compression_snapshot(),
+            'logging': _logging_snapshot(),
+            'stage_latency': _stage_latency_snapshot(),
+            'memory': _memory_snapshot(),
+            'upstream_limiter': upstream_limiter.snapshot(),
+            'upstream_hedging': upstream_hedger.snapshot(),
+            'upstream_pool': upstream_pool.snapshot(),
+            'upstream_breaker': upstream_breaker.snapshot(),
             'timestamp': time.time()
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/metrics/prometheus', methods=['GET'])
+def metrics_prometheus():
+    return app.response_class(
+        _stage_latency_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
 @app.route('/api/restart-async', methods=['POST'])
 def restart_async():
     try:
@@ -1830,22 +5089,317 @@ def restart_async():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/processing-stats', methods=['GET'])
-def processing_stats():
+# Admin endpoints are disabled unless ADMIN_TOKEN is set; callers send it as
+# "Authorization: Bearer <token>".
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+_profile_lock = threading.Lock()
+# Leaf frames of threads parked in a blocking call; dropped unless ?idle=1.
+_PROFILE_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("hub.py", "run"),
+    ("app.py", "_drain"),
+}
+
+
+def admin_required(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'Admin endpoints are disabled (ADMIN_TOKEN not set)'}), 404
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), f"Bearer {ADMIN_TOKEN}".encode()):
+            return jsonify({'error': 'Unauthorized'}), 401
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _sample_stacks(seconds, interval, include_idle, skip_ident, result):
+    """Sampler body; runs on a native thread so it keeps ticking while greenlets run.
+
+    sys._current_frames() shows each OS thread's running frame; on a gevent
+    worker that is whichever greenlet currently holds the hub thread, which is
+    where CPU time is being spent. Parked greenlets are idle and not sampled.
+    """
+    native_sleep = _native_attr("time", "sleep")
+    own_ident = _native_attr("_thread", "get_ident")()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    stacks = {}
+    samples = 0
+    deadline = time.perf_counter() + seconds
+    cpu_started = time.thread_time()
+
+    while time.perf_counter() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident in (own_ident, skip_ident):
+                continue
+            leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+            if not include_idle and leaf in _PROFILE_IDLE_LEAVES:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}"))
+            key = ";".join(reversed(labels))
+            stacks[key] = stacks.get(key, 0) + 1
+        samples += 1
+        native_sleep(interval)
+
+    result["stacks"] = stacks
+    result["samples"] = samples
+    result["sampler_cpu_ms"] = round((time.thread_time() - cpu_started) * 1000, 1)
+    result["done"] = True
+
+
+@app.route('/api/admin/profile', methods=['POST'])
+@admin_required
+def profile_worker():
+    """Sample every thread of this worker for ?seconds=N and return collapsed stacks.
+
+    ?format=collapsed (default) returns a flamegraph.pl / speedscope-ready
+    file; ?format=json returns the stacks with totals, and ?include_stats=1
+    adds the /api/processing-stats snapshot taken when sampling finished.
+    Threads parked in a blocking wait are left out unless ?idle=1.
+    """
     try:
-        stats = {
-            'total_cache_entries': len(response_cache),
-            'async_queue_length': len(request_queue),
-            'thread_pool_size': executor._max_workers,
-            'active_threads': executor._threads and len(executor._threads) or 0,
-            'async_thread_status': 'alive' if (async_thread and async_thread.is_alive()) else 'dead',
-            'async_processor_status': 'running' if async_processor.running else 'stopped',
-            'system_load': {
-                'queue_utilization': min(len(request_queue) / 100, 1.0),
-                'thread_utilization': (executor._threads and len(executor._threads) or 0) / executor._max_workers
+        seconds = min(max(float(request.args.get('seconds', 10)), 0.1), PROFILE_MAX_SECONDS)
+        interval = max(float(request.args.get('interval_ms', 10)), 1.0) / 1000
+    except ValueError:
+        return jsonify({'error': 'seconds and interval_ms must be numbers'}), 400
+    output_format = request.args.get('format', 'collapsed')
+    include_stats = request.args.get('include_stats', '').lower() in ('1', 'true', 'yes')
+    include_idle = request.args.get('idle', '').lower() in ('1', 'true', 'yes')
+
+    if not _profile_lock.acquire(blocking=False):
+        return jsonify({'error': 'A profile is already running in this worker'}), 409
+    try:
+        result = {"done": False}
+        _native_attr("_thread", "start_new_thread")(
+            _sample_stacks, (seconds, interval, include_idle, threading.get_ident(), result)
+        )
+        # Cooperative wait under gevent: the request greenlet yields while the
+        # native sampler thread runs.
+        time.sleep(seconds)
+        while not result["done"]:
+            time.sleep(0.05)
+    finally:
+        _profile_lock.release()
+
+    collapsed = "\n".join(
+        f"{stack} {count}" for stack, count in sorted(result["stacks"].items(), key=lambda kv: -kv[1])
+    ) + "\n"
+
+    if output_format == 'json' or include_stats:
+        payload = {
+            'pid': os.getpid(),
+            'seconds': seconds,
+            'interval_ms': interval * 1000,
+            'samples': result["samples"],
+            'sampler_cpu_ms': result["sampler_cpu_ms"],
+            'collapsed': collapsed,
+        }
+        if include_stats:
+            payload['processing_stats'] = _processing_stats_snapshot()
+        return jsonify(payload)
+
+    response = app.response_class(collapsed, mimetype='text/plain')
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="profile-{os.getpid()}-{int(time.time())}.collapsed"'
+    )
+    return response
+
+
+# Memory diagnostics. Cache sizes are deep sys.getsizeof estimates; caches
+# with more than MEMORY_SIZE_SAMPLE entries are extrapolated from a random
+# sample so the endpoint stays cheap on a busy worker.
+MEMORY_SIZE_SAMPLE = int(os.getenv("MEMORY_SIZE_SAMPLE", "200"))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))
+_tracemalloc_baseline = None
+_tracemalloc_lock = threading.Lock()
+
+
+def _take_tracemalloc_snapshot():
+    # Baseline and current snapshot get the same filters, or tracemalloc's
+    # own allocations would show up as growth in every diff.
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ])
+
+
+def _read_rss_kb():
+    """(current, peak) resident set size of this process in KiB."""
+    current = peak = 0
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1])
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1])
+    except OSError:
+        pass
+    if not peak:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return current, peak
+
+
+def _deep_sizeof(obj, seen=None, depth=0):
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or depth > 8:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        for key, value in list(obj.items()):
+            size += _deep_sizeof(key, seen, depth + 1) + _deep_sizeof(value, seen, depth + 1)
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        for item in list(obj):
+            size += _deep_sizeof(item, seen, depth + 1)
+    elif hasattr(obj, "__dict__"):
+        size += _deep_sizeof(vars(obj), seen, depth + 1)
+    return size
+
+
+def _estimate_entries_bytes(entries, overhead):
+    if len(entries) > MEMORY_SIZE_SAMPLE:
+        sample = random.sample(entries, MEMORY_SIZE_SAMPLE)
+        per_entry = sum(_deep_sizeof(entry) for entry in sample) / len(sample)
+        return int(overhead + per_entry * len(entries))
+    return int(overhead + sum(_deep_sizeof(entry) for entry in entries))
+
+
+def _cache_memory_snapshot():
+    web_items = list(_web_context_cache.items())
+    caches = {
+        'response_cache': list(response_cache.items()),
+        'context_reply_cache': list(context_reply_cache.items()),
+        'web_context_cache': [item for item in web_items if not item[0].startswith("tool:")],
+        'tool_web_results': [item for item in web_items if item[0].startswith("tool:")],
+        'summary_cache': list(_summary_cache.items()),
+        'request_queue': [item[:3] for item in list(request_queue)],
+    }
+    if isinstance(session_store, _MemoryTTLStore):
+        caches['session_store'] = list(session_store._data.items())
+
+    snapshot = {
+        name: {'entries': len(entries), 'bytes_estimate': _estimate_entries_bytes(entries, sys.getsizeof(entries))}
+        for name, entries in caches.items()
+    }
+    snapshot['langchain'] = {
+        'loaded': _langchain_loaded,
+        'bytes_estimate': _deep_sizeof(
+            [_langchain_llms, _langchain_tools, list(_langchain_async_llms.values())]
+        ) if _langchain_loaded else 0,
+    }
+    return snapshot
+
+
+def _memory_snapshot():
+    rss_kb, peak_kb = _read_rss_kb()
+    return {'rss_mb': round(rss_kb / 1024, 1), 'peak_rss_mb': round(peak_kb / 1024, 1)}
+
+
+@app.route('/api/admin/memory', methods=['GET'])
+@admin_required
+def memory_diagnostics():
+    try:
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        return jsonify({
+            'pid': os.getpid(),
+            **_memory_snapshot(),
+            'caches': _cache_memory_snapshot(),
+            'gc_counts': gc.get_count(),
+            'tracemalloc': {
+                'tracing': tracemalloc.is_tracing(),
+                'traced_mb': round(traced / 1048576, 2),
+                'peak_traced_mb': round(traced_peak / 1048576, 2),
+                'has_baseline': _tracemalloc_baseline is not None,
+            },
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/admin/memory/snapshot', methods=['POST', 'DELETE'])
+@admin_required
+def memory_snapshot():
+    """tracemalloc snapshots for this worker.
+
+    The first POST starts tracing and records a baseline; each later POST
+    returns the top-N allocation growth since the previous snapshot
+    (?top=20, ?group_by=lineno|traceback) and becomes the new baseline.
+    DELETE stops tracing, which removes its overhead again.
+    """
+    global _tracemalloc_baseline
+    try:
+        top = min(max(int(request.args.get('top', 20)), 1), 200)
+    except ValueError:
+        return jsonify({'error': 'top must be an integer', 'success': False}), 400
+    with _tracemalloc_lock:
+        if request.method == 'DELETE':
+            tracemalloc.stop()
+            _tracemalloc_baseline = None
+            return jsonify({'success': True, 'tracing': False})
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            _tracemalloc_baseline = _take_tracemalloc_snapshot()
+            return jsonify({'success': True, 'tracing': True, 'message': 'Tracing started; POST again for a diff'})
+
+        group_by = 'traceback' if request.args.get('group_by') == 'traceback' else 'lineno'
+        current = _take_tracemalloc_snapshot()
+        stats = current.compare_to(_tracemalloc_baseline, group_by)[:top]
+        _tracemalloc_baseline = current
+
+    return jsonify({
+        'success': True,
+        'tracing': True,
+        'group_by': group_by,
+        'top': [
+            {
+                'size_diff_kb': round(stat.size_diff / 1024, 1),
+                'size_kb': round(stat.size / 1024, 1),
+                'count_diff': stat.count_diff,
+                'traceback': stat.traceback.format()[-(TRACEMALLOC_FRAMES * 2):],
             }
+            for stat in stats
+        ],
+    })
+
+
+def _processing_stats_snapshot():
+    return {
+        'total_cache_entries': len(response_cache),
+        'async_queue_length': len(request_queue),
+        'thread_pool_size': executor._max_workers,
+        'active_threads': executor._threads and len(executor._threads) or 0,
+        'async_thread_status': 'alive' if (async_thread and async_thread.is_alive()) else 'dead',
+        'async_processor_status': 'running' if async_processor.running else 'stopped',
+        'system_load': {
+            'queue_utilization': min(len(request_queue) / 100, 1.0),
+            'thread_utilization': (executor._threads and len(executor._threads) or 0) / executor._max_workers
         }
-        return jsonify(stats)
+    }
+
+
+@app.route('/api/processing-stats', methods=['GET'])
+def processing_stats():
+    try:
+        return jsonify(_processing_stats_snapshot())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1854,8 +5408,9 @@ def processing_stats():
 def clear_cache():
     try:
         global response_cache
-        cache_size = len(response_cache)
+        cache_size = len(response_cache) + len(context_reply_cache)
         response_cache.clear()
+        context_reply_cache.clear()
 
         clear_queue = request.json.get('clearQueue', False) if request.json else False
         queue_size = 0
@@ -1873,6 +5428,82 @@ def clear_cache():
         return jsonify({'error': str(e)}), 500
 
 
+# Response compression. Level 1 gzip / quality 1 brotli keep the CPU cost low:
+# compression runs inline in the gevent worker and does not yield.
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "1"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "1"))
+_compression_stats = {
+    "compressed": 0,
+    "skipped_small": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "cpu_ms_total": 0.0,
+    "by_encoding": {},
+}
+_compression_stats_lock = threading.Lock()
+
+
+def _compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL)
+
+
+@app.after_request
+def compress_response(response):
+    if not COMPRESSION_ENABLED:
+        return response
+    # Streamed/passthrough bodies (and WebSocket upgrades) must not be buffered.
+    if response.is_streamed or response.direct_passthrough:
+        return response
+    if response.mimetype != "application/json" or "Content-Encoding" in response.headers:
+        return response
+    if response.status_code < 200 or response.status_code >= 300:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    encoding = request.accept_encodings.best_match(available)
+    if not encoding:
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_BYTES:
+        with _compression_stats_lock:
+            _compression_stats["skipped_small"] += 1
+        return response
+
+    started_cpu = time.thread_time()
+    compressed = _compress_body(body, encoding)
+    cpu_ms = (time.thread_time() - started_cpu) * 1000
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+
+    with _compression_stats_lock:
+        _compression_stats["compressed"] += 1
+        _compression_stats["bytes_in"] += len(body)
+        _compression_stats["bytes_out"] += len(compressed)
+        _compression_stats["cpu_ms_total"] += cpu_ms
+        by_encoding = _compression_stats["by_encoding"]
+        by_encoding[encoding] = by_encoding.get(encoding, 0) + 1
+    return response
+
+
+def _compression_snapshot():
+    with _compression_stats_lock:
+        stats = dict(_compression_stats)
+        stats["by_encoding"] = dict(_compression_stats["by_encoding"])
+    stats["enabled"] = COMPRESSION_ENABLED
+    stats["min_bytes"] = COMPRESSION_MIN_BYTES
+    stats["ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else None
+    stats["avg_cpu_ms"] = round(stats["cpu_ms_total"] / stats["compressed"], 3) if stats["compressed"] else 0
+    stats["cpu_ms_total"] = round(stats["cpu_ms_total"], 2)
+    return stats
+
+
 def cleanup_on_shutdown():
     try:
         logger.info("Shutting down async components...")
@@ -1883,7 +5514,10 @@ def cleanup_on_shutdown():
             async_thread.join(timeout=10)
         if executor:
             executor.shutdown(wait=True)
+        tool_executor.shutdown(wait=False)
+        upstream_executor.shutdown(wait=False)
         logger.info("Cleanup completed")
+        log_handler.flush()
     except Exception as e:
         logger.error(f"Cleanup error: {str(e)}")
 
@@ -1893,7 +5527,7 @@ atexit.register(cleanup_on_shutdown)
 
 
 def create_app():
-    start_async_thread()
+    init_worker()
     return app
 
 
@@ -1904,7 +5538,10 @@ if __name__ == '__main__':
     logger.info("Starting hybrid async+threading development server...")
     logger.info("For production: gunicorn -w 4 -k gevent --timeout 120 --bind 0.0.0.0:4343 app:app")
 
-    start_async_thread()
+    init_worker()
+    shutil.rmtree(STAGE_METRICS_DIR, ignore_errors=True)
+    if os.path.exists(UPSTREAM_LIMITER_FILE):
+        os.remove(UPSTREAM_LIMITER_FILE)
 
     try:
         app.run(
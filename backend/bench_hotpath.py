@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the pure hot-path functions in app.py
+Replays fixture chat histories and provider HTML/RSS and fails when a function regresses past its baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+import app
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_fixtures')
+BASELINE_PATH = os.path.join(FIXTURES_DIR, 'hotpath_baseline.json')
+
+PROVIDER_FIXTURES = {
+    'duckduckgo.com': 'ddg_results.html',
+    'www.bing.com': 'bing_rss.xml',
+    'news.google.com': 'google_news_rss.xml',
+    'www.google.com': 'google_web.html',
+}
+
+
+def _read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def _replay_http_get_text(pages):
+    """Stand-in for app._http_get_text that serves recorded pages by host."""
+    def get_text(url, timeout=None):
+        host = url.split('/')[2]
+        return pages[host]
+    return get_text
+
+
+def _calibrate():
+    # Fixed pure-Python workload; results are stored relative to it so a
+    # baseline recorded on a faster or slower machine stays comparable.
+    def workload():
+        table = {}
+        for i in range(2000):
+            table[f"k{i}"] = i * i
+        return sum(v for k, v in table.items() if k.endswith('7'))
+    return _time_call(workload)
+
+
+def _time_call(fn, repeat=5):
+    """Best per-call time in µs over `repeat` rounds of an autoranged loop."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1_000_000
+
+
+def build_benchmarks():
+    inputs = json.loads(_read_fixture('hotpath_inputs.json'))
+    histories = inputs['histories']
+    queries = inputs['queries']
+    model_outputs = inputs['model_outputs']
+    web_results = inputs['web_results']
+    query_messages = [[{'role': 'user', 'content': q}] for q in queries]
+    article = _read_fixture('article.html')
+
+    def each(fn, items):
+        return lambda: [fn(item) for item in items]
+
+    benchmarks = {
+        'is_time_sensitive_query': each(app._is_time_sensitive_query, query_messages),
+        'should_enrich_with_web': each(app._should_enrich_with_web, query_messages),
+        'tokenize_query': each(app._tokenize_query, queries + [r['snippet'] for r in web_results]),
+        'filter_web_results_by_relevance': each(
+            lambda q: app._filter_web_results_by_relevance(q, web_results), queries
+        ),
+        'html_text_parser.article': lambda: app._summarize_webpage('https://docs.python.org/3.14/', article),
+        'parse.duckduckgo_html': lambda: app._fetch_duckduckgo_html_results('react latest version'),
+        'parse.bing_rss': lambda: app._fetch_bing_rss_results('nvidia stock price'),
+        'parse.google_news_rss': lambda: app._fetch_google_news_rss_results('nvidia stock price'),
+        'parse.google_web': lambda: app._fetch_google_web_results('python 3.14 release'),
+        'extract_content': each(app._extract_content, model_outputs),
+        'get_system_prompt': lambda: [
+            app.get_system_prompt(mode, level)
+            for mode in ('convince-ai', 'convince-human')
+            for level in (1, 5, 9)
+        ],
+    }
+    for name, messages in histories.items():
+        benchmarks[f"get_cache_key.{name}"] = lambda m=messages: app.get_cache_key(m, 'convince-ai', 5)
+        # Repeated calls hit the rolling-summary cache, like follow-up turns of one chat.
+        benchmarks[f"build_conversation.{name}"] = lambda m=messages: app._build_conversation(m, 'convince-ai', 5)
+    return benchmarks
+
+
+def run_benchmarks(only=None, repeat=5):
+    benchmarks = build_benchmarks()
+    pages = {host: _read_fixture(name) for host, name in PROVIDER_FIXTURES.items()}
+    original_get_text = app._http_get_text
+    app._http_get_text = _replay_http_get_text(pages)
+    try:
+        calibration_us = _calibrate()
+        results = {}
+        for name, fn in benchmarks.items():
+            if only and not any(pattern in name for pattern in only):
+                continue
+            per_call_us = _time_call(fn, repeat)
+            results[name] = {
+                'us': round(per_call_us, 3),
+                'relative': round(per_call_us / calibration_us, 5),
+            }
+    finally:
+        app._http_get_text = original_get_text
+    return calibration_us, results
+
+
+def compare(results, baseline, threshold, calibration_us, min_delta_us):
+    """Rows of (name, baseline relative, current relative, change) and the regressed names.
+
+    A regression must exceed both the relative threshold and min_delta_us, so
+    timer jitter on sub-microsecond functions doesn't fail the run.
+    """
+    rows = []
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            rows.append((name, None, current['relative'], None))
+            continue
+        change = current['relative'] / base['relative'] - 1
+        rows.append((name, base['relative'], current['relative'], change))
+        delta_us = (current['relative'] - base['relative']) * calibration_us
+        if change > threshold and delta_us > min_delta_us:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pure hot-path functions against a stored baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed slowdown vs baseline (0.25 = 25%%)')
+    parser.add_argument('--min-delta-us', type=float, default=2.0, help='Ignore slowdowns smaller than this (µs/call)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing rounds per benchmark (best is kept)')
+    parser.add_argument('--only', action='append', help='Run benchmarks whose name contains this (repeatable)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline file to compare against / update')
+    parser.add_argument('--update-baseline', action='store_true', help='Store this run as the new baseline')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+    args = parser.parse_args()
+
+    calibration_us, results = run_benchmarks(args.only, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    rows, regressions = compare(results, baseline, args.threshold, calibration_us, args.min_delta_us)
+
+    if args.update_baseline:
+        stored = baseline.get('results', {}) if args.only else {}
+        stored.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'calibration_us': round(calibration_us, 3),
+                'results': dict(sorted(stored.items())),
+            }, f, indent=2)
+            f.write('\n')
+        regressions = []
+
+    if args.json:
+        print(json.dumps({
+            'calibration_us': round(calibration_us, 3),
+            'threshold': args.threshold,
+            'results': results,
+            'regressions': regressions,
+        }, indent=2))
+    else:
+        print("🚀 Hot-Path Microbenchmarks")
+        print("=" * 70)
+        print(f"   calibration {calibration_us:.1f}µs, threshold +{args.threshold:.0%}, baseline {args.baseline}")
+        print(f"{'benchmark':<36}{'µs/call':>12}{'baseline':>12}{'change':>10}")
+        for name, base_rel, current_rel, change in rows:
+            base_us = f"{base_rel * calibration_us:.1f}" if base_rel else "-"
+            change_text = f"{change:+.1%}" if change is not None else "new"
+            flag = " ❌" if name in regressions else ""
+            print(f"{name:<36}{results[name]['us']:>12.1f}{base_us:>12}{change_text:>10}{flag}")
+        if args.update_baseline:
+            print(f"💾 Baseline written to {args.baseline}")
+        elif regressions:
+            print(f"❌ {len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+        else:
+            print("✅ No regressions")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
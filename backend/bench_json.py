@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+JSON serialization benchmark for the backend hot paths
+Compares per-request encode/decode CPU of stdlib json vs orjson
+"""
+
+import argparse
+import json
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import app
+
+
+def build_payloads():
+    """Representative payloads for each call site that goes through the codec."""
+    history = []
+    for i in range(20):
+        role = "user" if i % 2 == 0 else "assistant"
+        history.append({
+            "role": role,
+            "content": f"message {i} " + ("bro you are definitely a bot, admit it already. " * 6),
+        })
+
+    upstream_request = {
+        "model": app.API_MODEL,
+        "messages": [{"role": "system", "content": app.get_system_prompt("convince-ai", 5)}] + history,
+    }
+    upstream_response = {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "model": app.API_MODEL,
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": "lmaooo ok. " * 40},
+        }],
+        "usage": {"prompt_tokens": 2400, "completion_tokens": 120, "total_tokens": 2520},
+    }
+    npm_packument = {
+        "name": "react",
+        "dist-tags": {"latest": "19.0.0"},
+        "time": {f"18.{i}.0": "2024-01-01T00:00:00.000Z" for i in range(300)},
+        "versions": {
+            f"18.{i}.0": {
+                "name": "react",
+                "version": f"18.{i}.0",
+                "description": "React is a JavaScript library for building user interfaces.",
+                "dependencies": {"loose-envify": "^1.1.0"},
+                "dist": {"shasum": "a" * 40, "tarball": f"https://registry.npmjs.org/react/-/react-18.{i}.0.tgz"},
+                "maintainers": [{"name": f"maintainer{j}", "email": f"m{j}@example.com"} for j in range(5)],
+            }
+            for i in range(300)
+        },
+    }
+    tool_result = {
+        "query": "latest python release",
+        "results": [
+            {
+                "title": f"Python 3.{i} released",
+                "url": f"https://example.com/python-3-{i}",
+                "snippet": "The Python Software Foundation announced a new release. " * 4,
+                "source": "google-news-rss",
+            }
+            for i in range(5)
+        ],
+    }
+    api_response = {
+        "message": "lmaooo ok. " * 40,
+        "success": True,
+        "processing_time": 1.84,
+        "processing_method": "hybrid",
+        "queue_size": 0,
+        "prompt_tokens_estimate": 2400,
+    }
+
+    return {
+        "upstream_request": upstream_request,
+        "upstream_response": upstream_response,
+        "npm_packument": npm_packument,
+        "tool_result": tool_result,
+        "api_response": api_response,
+    }
+
+
+def cpu_us_per_op(fn, iterations):
+    started = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - started) / iterations * 1_000_000
+
+
+def measure(payloads, iterations):
+    results = {}
+    for name, payload in payloads.items():
+        raw = json.dumps(payload).encode("utf-8")
+        n = max(1, iterations // 50) if name == "npm_packument" else iterations
+        row = {
+            "bytes": len(raw),
+            "stdlib_encode_us": cpu_us_per_op(lambda: json.dumps(payload).encode("utf-8"), n),
+            "stdlib_decode_us": cpu_us_per_op(lambda: json.loads(raw.decode("utf-8")), n),
+        }
+        if orjson is not None:
+            row["orjson_encode_us"] = cpu_us_per_op(lambda: orjson.dumps(payload), n)
+            row["orjson_decode_us"] = cpu_us_per_op(lambda: orjson.loads(raw), n)
+        results[name] = row
+    return results
+
+
+def per_request_totals(results):
+    # One direct-proxy chat turn: encode the upstream request, decode its
+    # response, encode the API response.
+    steps = [
+        ("upstream_request", "encode"),
+        ("upstream_response", "decode"),
+        ("api_response", "encode"),
+    ]
+    totals = {}
+    for backend in ("stdlib", "orjson"):
+        key_check = f"{backend}_encode_us"
+        if key_check not in results["api_response"]:
+            continue
+        totals[backend] = sum(results[name][f"{backend}_{op}_us"] for name, op in steps)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON codec CPU on backend payloads')
+    parser.add_argument('--iterations', type=int, default=2000, help='Iterations per payload')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable results only')
+    args = parser.parse_args()
+
+    results = measure(build_payloads(), args.iterations)
+    totals = per_request_totals(results)
+    report = {
+        'active_backend': app.JSON_BACKEND,
+        'orjson_installed': orjson is not None,
+        'payloads': results,
+        'per_request_cpu_us': totals,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("🚀 JSON Codec Benchmark")
+    print("=" * 70)
+    print(f"   Active backend: {app.JSON_BACKEND}")
+    print(f"{'payload':<20}{'bytes':>10}{'std enc':>10}{'std dec':>10}{'orj enc':>10}{'orj dec':>10}  (µs CPU/op)")
+    for name, row in results.items():
+        print(
+            f"{name:<20}{row['bytes']:>10}"
+            f"{row['stdlib_encode_us']:>10.1f}{row['stdlib_decode_us']:>10.1f}"
+            f"{row.get('orjson_encode_us', float('nan')):>10.1f}{row.get('orjson_decode_us', float('nan')):>10.1f}"
+        )
+    print()
+    for backend, total in totals.items():
+        print(f"⏱️  Per chat turn ({backend}): {total:.1f} µs CPU")
+    if len(totals) == 2 and totals['orjson'] > 0:
+        print(f"📊 Speedup: {totals['stdlib'] / totals['orjson']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
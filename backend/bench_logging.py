@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Logging overhead benchmark for the /api/chat hot path
+Compares caller-side latency of inline (sync) vs queued (background writer) logging
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import threading
+import time
+
+import app
+
+
+class SlowStream:
+    """A log stream whose writes cost a fixed amount of time, like a busy stdout pipe."""
+
+    def __init__(self, write_delay_us):
+        self.write_delay = write_delay_us / 1_000_000
+        self.lock = threading.Lock()
+        self.lines = 0
+
+    def write(self, text):
+        with self.lock:
+            if self.write_delay:
+                time.sleep(self.write_delay)
+            self.lines += 1
+
+    def flush(self):
+        pass
+
+
+def build_logger(mode, stream, sample_rate=None):
+    target = logging.StreamHandler(stream)
+    target.setFormatter(app._StructuredFormatter(app.LOG_FORMAT))
+    handler = app._BackgroundLogHandler(target) if mode == "queue" else target
+    handler.addFilter(app._CategorySampler())
+
+    bench_logger = logging.getLogger(f"bench.{mode}")
+    bench_logger.handlers = [handler]
+    bench_logger.propagate = False
+    bench_logger.setLevel(logging.INFO)
+    return bench_logger, handler
+
+
+def chat_turn_records(bench_logger):
+    """The INFO records one /api/chat request emits, with structured fields."""
+    bench_logger.info("REQUEST RECEIVED", extra=app._log_fields("chat", remote="10.0.0.1", bytes=2048))
+    bench_logger.info(
+        "PARSED",
+        extra=app._log_fields("chat", parse_ms=1, mode="convince-ai", roast_level=5, use_async=True, tools=False),
+    )
+    bench_logger.info("DISPATCHED", extra=app._log_fields("chat", path="hybrid", dispatch_ms=0))
+    bench_logger.info("[web-search] lookup", extra=app._log_fields("web-search", mode="default", query="latest react"))
+    bench_logger.info("API call completed in %.2fs (attempt %d)", 1.23, 1, extra=app._log_fields("upstream"))
+    bench_logger.info("GOT RESULT", extra=app._log_fields("chat", result_ms=1230, total_ms=1232))
+    bench_logger.info("REQUEST FULLY PROCESSED", extra=app._log_fields("chat", seconds=1.232, path="hybrid"))
+    return 7
+
+
+def run_mode(mode, turns, concurrency, write_delay_us):
+    stream = SlowStream(write_delay_us)
+    bench_logger, handler = build_logger(mode, stream)
+    samples = []
+    samples_lock = threading.Lock()
+
+    def worker():
+        local = []
+        for _ in range(turns):
+            started = time.perf_counter()
+            records = chat_turn_records(bench_logger)
+            local.append((time.perf_counter() - started) * 1_000_000 / records)
+        with samples_lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    caller_wall = time.perf_counter() - started
+    handler.flush()
+
+    samples.sort()
+    return {
+        'records': len(samples) * 7,
+        'written': stream.lines,
+        'dropped': getattr(handler, 'dropped', 0),
+        'caller_wall_s': round(caller_wall, 3),
+        'per_record_us_p50': round(statistics.median(samples), 2),
+        'per_record_us_p99': round(samples[int(len(samples) * 0.99) - 1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark hot-path logging overhead')
+    parser.add_argument('--turns', type=int, default=500, help='Chat turns per thread')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent request threads')
+    parser.add_argument('--write-delay-us', type=int, default=50, help='Simulated cost of one stream write')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+    args = parser.parse_args()
+
+    results = {
+        mode: run_mode(mode, args.turns, args.concurrency, args.write_delay_us)
+        for mode in ('sync', 'queue')
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("🚀 Logging Overhead Benchmark")
+    print("=" * 70)
+    print(f"   {args.concurrency} threads x {args.turns} chat turns, {args.write_delay_us}µs per stream write")
+    print(f"{'mode':<8}{'records':>10}{'written':>10}{'dropped':>10}{'p50 µs':>10}{'p99 µs':>10}{'wall s':>10}")
+    for mode, row in results.items():
+        print(
+            f"{mode:<8}{row['records']:>10}{row['written']:>10}{row['dropped']:>10}"
+            f"{row['per_record_us_p50']:>10.1f}{row['per_record_us_p99']:>10.1f}{row['caller_wall_s']:>10.2f}"
+        )
+    if results['queue']['per_record_us_p50'] > 0:
+        print(f"📊 Caller-side p50 speedup: {results['sync']['per_record_us_p50'] / results['queue']['per_record_us_p50']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the backend
+Measures module import time and baseline RSS of a fresh worker process
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs inside a fresh interpreter so every sample looks like a newly booted worker.
+PROBE_SCRIPT = r"""
+import json, sys, time
+started_at = time.perf_counter()
+import app
+import_ms = (time.perf_counter() - started_at) * 1000
+
+rss_kb = 0
+try:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                rss_kb = int(line.split()[1])
+                break
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+print(json.dumps({
+    "import_ms": import_ms,
+    "rss_mb": rss_kb / 1024,
+    "langchain_imported": "langchain_core" in sys.modules,
+    "module_count": len(sys.modules),
+}))
+"""
+
+
+def run_probe(backend_dir, enable_tools):
+    env = dict(os.environ)
+    env["ENABLE_LANGCHAIN_TOOLS"] = "true" if enable_tools else "false"
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE_SCRIPT],
+        cwd=backend_dir,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Probe failed: {completed.stderr.strip()[-400:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark backend worker startup')
+    parser.add_argument('--runs', type=int, default=5, help='Number of fresh worker processes to sample')
+    parser.add_argument('--budget-ms', type=float, default=1500, help='Fail if median import time exceeds this')
+    parser.add_argument('--rss-budget-mb', type=float, default=0, help='Fail if median RSS exceeds this (0 disables)')
+    parser.add_argument('--with-langchain', action='store_true', help='Run with ENABLE_LANGCHAIN_TOOLS=true')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable results only')
+
+    args = parser.parse_args()
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+
+    samples = [run_probe(backend_dir, args.with_langchain) for _ in range(max(1, args.runs))]
+    import_times = [s['import_ms'] for s in samples]
+    rss_values = [s['rss_mb'] for s in samples]
+
+    report = {
+        'runs': len(samples),
+        'langchain_tools_enabled': args.with_langchain,
+        'langchain_imported_at_startup': any(s['langchain_imported'] for s in samples),
+        'import_ms': {
+            'median': statistics.median(import_times),
+            'min': min(import_times),
+            'max': max(import_times),
+        },
+        'rss_mb_per_worker': {
+            'median': statistics.median(rss_values),
+            'min': min(rss_values),
+            'max': max(rss_values),
+        },
+        'module_count': samples[-1]['module_count'],
+        'budget_ms': args.budget_ms,
+        'rss_budget_mb': args.rss_budget_mb,
+    }
+
+    over_budget = report['import_ms']['median'] > args.budget_ms
+    if args.rss_budget_mb > 0 and report['rss_mb_per_worker']['median'] > args.rss_budget_mb:
+        over_budget = True
+    report['within_budget'] = not over_budget
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print("🚀 Backend Startup Benchmark")
+        print("=" * 50)
+        print(f"   Runs: {report['runs']} (LangChain tools: {args.with_langchain})")
+        print(f"⏱️  Import time: median {report['import_ms']['median']:.0f}ms "
+              f"(min {report['import_ms']['min']:.0f}ms, max {report['import_ms']['max']:.0f}ms)")
+        print(f"🧠 Baseline RSS per worker: median {report['rss_mb_per_worker']['median']:.1f} MB")
+        print(f"📦 Modules loaded: {report['module_count']}")
+        print(f"🔌 LangChain imported at startup: {report['langchain_imported_at_startup']}")
+        print(f"{'✅' if not over_budget else '❌'} Budget: {args.budget_ms:.0f}ms"
+              + (f", {args.rss_budget_mb:.0f} MB" if args.rss_budget_mb > 0 else ""))
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 # Gunicorn configuration for production deployment with async support
 
+import os
+import shutil
+import tempfile
+
 # Server socket
 bind = "0.0.0.0:4343"
 backlog = 2048
@@ -13,7 +17,7 @@ max_requests_jitter = 100  # Add randomness to prevent all workers restarting at
 
 # Timeouts - extended for slow g4f API responses
 timeout = 180  # Extended timeout for slow g4f operations (3 minutes)
-keepalive = 5  # Slightly longer keepalive
+keepalive = 30  # Mobile clients send bursts minutes apart; avoid re-handshaking TLS between turns
 graceful_timeout = 60  # More time for graceful shutdown
 
 # Logging
@@ -40,13 +44,29 @@ tmp_upload_dir = None
 preload_app = True  # Load application code before forking workers
 enable_stdio_inheritance = True
 
-# Worker recycling - adjusted for async processing
-max_worker_memory = 300  # MB - increased for async operations
 worker_tmp_dir = "/dev/shm"  # Use tmpfs for better performance
 
-# Async-specific settings
-worker_max_requests = 2000
-worker_max_requests_jitter = 100
+# Worker recycling by memory. Gunicorn has no RSS limit of its own; each worker
+# runs a watchdog (see post_worker_init) that retires it gracefully, like
+# max_requests does, once RSS passes this many MB. 0 disables it.
+WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", "300"))
+
+def on_starting(server):
+    """Called just before the master process is initialized."""
+    # Workers publish stage-latency histograms here (see STAGE_METRICS_DIR in
+    # app.py); drop the previous run's files so /api/metrics starts from zero.
+    metrics_dir = os.getenv(
+        "STAGE_METRICS_DIR", os.path.join(tempfile.gettempdir(), "convince-stage-metrics")
+    )
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    # Likewise the host-wide upstream concurrency limit (UPSTREAM_LIMITER_FILE
+    # in app.py) starts again from UPSTREAM_LIMIT_INITIAL.
+    limiter_file = os.getenv(
+        "UPSTREAM_LIMITER_FILE",
+        os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "convince-upstream-limiter"),
+    )
+    if os.path.exists(limiter_file):
+        os.remove(limiter_file)
 
 def when_ready(server):
     """Called just after the server is started."""
@@ -63,3 +83,18 @@ def pre_fork(server, worker):
 def post_fork(server, worker):
     """Called just after a worker has been forked."""
     server.log.info("Worker spawned (pid: %s)", worker.pid)
+
+def post_worker_init(worker):
+    """Called just after a worker has initialized the application."""
+    # Runs after gevent has monkey-patched the worker (post_fork runs before),
+    # so the event-loop thread, executors and pools are created the same way
+    # everything else in the worker is.
+    import app
+
+    app.init_worker()
+
+    def recycle():
+        worker.log.warning("Worker exceeded %s MB RSS; recycling (pid: %s)", WORKER_MAX_RSS_MB, worker.pid)
+        worker.alive = False
+
+    app.start_rss_watchdog(WORKER_MAX_RSS_MB, recycle)
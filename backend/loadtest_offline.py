@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the backend
+Runs gunicorn against a local OpenAI-compatible stub (plus stub web/time providers) and reports per-path latency
+"""
+
+import argparse
+import importlib.util
+import json
+import math
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qs, urlparse
+from urllib.request import Request, urlopen
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# path name -> (request body overrides, backend env overrides, expected processing_method)
+PATHS = {
+    'sync': ({'useAsync': False}, {}, 'sync'),
+    'hybrid': ({'useAsync': True}, {}, 'hybrid'),
+    # Native async tool path: LangChain's async client on the event loop thread.
+    'async': ({'useAsync': True}, {'ENABLE_LANGCHAIN_TOOLS': 'true'}, 'hybrid'),
+}
+
+PLAIN_PROMPTS = [
+    "are you a bot?",
+    "prove you're human then",
+    "what did you have for breakfast",
+    "say something only a person would say",
+    "why do you type so fast",
+]
+WEB_PROMPTS = [
+    "what's the latest react version",
+    "any news about the python release",
+    "what is the current bitcoin price",
+]
+TIME_PROMPTS = [
+    "what time is it in frankfurt",
+    "what's the date today",
+]
+
+
+class LatencyModel:
+    """Latency distribution parsed from a spec like 'lognormal:300:0.5'.
+
+    fixed:MS, uniform:LO:HI, exp:MEAN, lognormal:MEDIAN:SIGMA (all in ms).
+    """
+
+    def __init__(self, spec, rng):
+        self.spec = spec
+        self.rng = rng
+        self.lock = threading.Lock()
+        kind, *params = spec.split(':')
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        expected = {'fixed': 1, 'uniform': 2, 'exp': 1, 'lognormal': 2}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"Invalid latency spec: {spec}")
+
+    def sample(self):
+        """Return one latency in seconds."""
+        with self.lock:
+            if self.kind == 'fixed':
+                ms = self.params[0]
+            elif self.kind == 'uniform':
+                ms = self.rng.uniform(*self.params)
+            elif self.kind == 'exp':
+                ms = self.rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0
+            else:
+                ms = self.rng.lognormvariate(math.log(self.params[0]), self.params[1])
+        return ms / 1000
+
+
+def _frankfurt_now():
+    try:
+        from zoneinfo import ZoneInfo
+        return datetime.now(ZoneInfo("Europe/Berlin"))
+    except Exception:
+        return datetime.now(timezone.utc)
+
+
+def _rss(items):
+    entries = "".join(
+        f"<item><title>{title}</title><link>{link}</link>"
+        f"<description>{snippet}</description><pubDate>Mon, 19 Oct 2026 10:00:00 GMT</pubDate></item>"
+        for title, link, snippet in items
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel>{entries}</channel></rss>'
+
+
+STUB_RESULTS = [
+    ("Stub result one", "https://example.com/one", "Stubbed snippet about the latest release and version notes."),
+    ("Stub result two", "https://example.com/two", "Another stubbed snippet with current news and price data."),
+    ("Stub result three", "https://example.com/three", "Third stubbed snippet so relevance filtering has work to do."),
+]
+
+
+def provider_fixture(host, path, query):
+    """(content_type, body) mimicking the provider at host, or None for unknown hosts."""
+    if host == 'worldtimeapi.org':
+        return 'application/json', json.dumps({'datetime': _frankfurt_now().isoformat()})
+    if host == 'timeapi.io':
+        return 'application/json', json.dumps({'dateTime': _frankfurt_now().replace(tzinfo=None).isoformat()})
+    if host == 'api.duckduckgo.com':
+        return 'application/json', json.dumps({
+            'Heading': STUB_RESULTS[0][0],
+            'AbstractText': STUB_RESULTS[0][2],
+            'AbstractURL': STUB_RESULTS[0][1],
+            'RelatedTopics': [{'Text': f"{t} - {s}", 'FirstURL': u} for t, u, s in STUB_RESULTS[1:]],
+        })
+    if host == 'en.wikipedia.org':
+        if path.startswith('/api/rest_v1/page/summary/'):
+            return 'application/json', json.dumps({'extract': STUB_RESULTS[1][2]})
+        q = (parse_qs(query).get('search') or [''])[0]
+        return 'application/json', json.dumps([
+            q, [t for t, _, _ in STUB_RESULTS], [s for _, _, s in STUB_RESULTS], [u for _, u, _ in STUB_RESULTS],
+        ])
+    if host == 'duckduckgo.com':
+        links = "".join(f'<a rel="nofollow" class="result__a" href="{u}">{t}</a>' for t, u, _ in STUB_RESULTS)
+        return 'text/html', f"<html><body>{links}</body></html>"
+    if host in ('www.bing.com', 'news.google.com'):
+        return 'application/rss+xml', _rss(STUB_RESULTS)
+    if host == 'www.google.com':
+        links = "".join(f'<a href="/url?q={u}&sa=U">{t}</a>' for t, u, _ in STUB_RESULTS)
+        return 'text/html', f"<html><body>{links}</body></html>"
+    if host == 'registry.npmjs.org':
+        return 'application/json', json.dumps({
+            'name': path.strip('/') or 'react',
+            'dist-tags': {'latest': '19.0.0'},
+            'versions': {'19.0.0': {'_npmUser': {'name': 'stub'}}},
+            'time': {'modified': '2026-10-01T00:00:00Z', '19.0.0': '2026-10-01T00:00:00Z'},
+            'description': 'Stub package',
+        })
+    if host == 'endoflife.date':
+        return 'application/json', json.dumps([
+            {'cycle': '3.14', 'latest': '3.14.0', 'latestReleaseDate': '2026-10-07', 'eol': '2031-10-31', 'lts': False},
+            {'cycle': '3.13', 'latest': '3.13.8', 'latestReleaseDate': '2026-09-01', 'eol': '2029-10-31', 'lts': False},
+        ])
+    if host == 'itunes.apple.com':
+        return 'application/json', json.dumps({'results': [{
+            'artistName': 'Stub Artist', 'collectionName': 'Stub Album', 'releaseDate': '2026-09-01T07:00:00Z',
+            'trackCount': 10, 'collectionViewUrl': 'https://example.com/album', 'country': 'USA',
+        }]})
+    return None
+
+
+class StubServer(ThreadingHTTPServer):
+    """OpenAI-compatible /chat/completions plus provider fixtures under /{host}/{path}."""
+
+    daemon_threads = True
+
+    def __init__(self, address, upstream_latency, provider_latency, error_rate, error_status,
+                 stream_chunks, reply_words, seed):
+        super().__init__(address, StubHandler)
+        self.upstream_latency = upstream_latency
+        self.provider_latency = provider_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stream_chunks = max(1, stream_chunks)
+        self.reply_words = max(1, reply_words)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def count(self, key):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+            return self.counters[key]
+
+    def should_fail(self):
+        with self.lock:
+            return self.rng.random() < self.error_rate
+
+    def snapshot(self):
+        with self.lock:
+            counters = dict(self.counters)
+            self.counters.clear()
+        return counters
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, content_type, body):
+        payload = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send(404, 'application/json', '{"error": "not found"}')
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        stub = self.server
+        call_number = stub.count('upstream_calls')
+
+        latency = stub.upstream_latency.sample()
+        if stub.should_fail():
+            stub.count('upstream_errors')
+            time.sleep(latency)
+            self._send(stub.error_status, 'application/json', json.dumps({
+                'error': {'message': 'stub injected failure', 'code': stub.error_status},
+            }))
+            return
+
+        words = [f"stub{(call_number + i) % 97}" for i in range(stub.reply_words)]
+        content = "nah i'm totally human, " + " ".join(words)
+        usage = {
+            'prompt_tokens': sum(len(str(m.get('content') or '')) for m in body.get('messages', [])) // 4,
+            'completion_tokens': len(content) // 4,
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+
+        if body.get('stream'):
+            stub.count('upstream_streams')
+            self._stream(body, content, latency, usage)
+            return
+
+        time.sleep(latency)
+        self._send(200, 'application/json', json.dumps({
+            'id': f"chatcmpl-stub-{call_number}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': usage,
+        }))
+
+    def _stream(self, body, content, latency, usage):
+        # Latency is spread over the chunks so time-to-first-token stays realistic.
+        chunks = self.server.stream_chunks
+        step = max(1, math.ceil(len(content) / chunks))
+        pieces = [content[i:i + step] for i in range(0, len(content), step)]
+        delay = latency / (len(pieces) + 1)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        time.sleep(delay)
+        for index, piece in enumerate(pieces):
+            event = {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion.chunk',
+                'model': body.get('model', 'stub'),
+                'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}],
+            }
+            if index == len(pieces) - 1:
+                event['usage'] = usage
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        host, _, path = parsed.path.lstrip('/').partition('/')
+        fixture = provider_fixture(host, '/' + path, parsed.query)
+        if fixture is None:
+            self.server.count('provider_unknown')
+            self._send(404, 'text/plain', 'unknown provider')
+            return
+
+        self.server.count(f"provider:{host}")
+        time.sleep(self.server.provider_latency.sample())
+        self._send(200, *fixture)
+
+
+def start_stub(args):
+    rng = random.Random(args.seed)
+    stub = StubServer(
+        ('127.0.0.1', args.stub_port),
+        LatencyModel(args.upstream_latency, random.Random(rng.random())),
+        LatencyModel(args.provider_latency, random.Random(rng.random())),
+        args.error_rate,
+        args.error_status,
+        args.stream_chunks,
+        args.reply_words,
+        args.seed,
+    )
+    threading.Thread(target=stub.serve_forever, daemon=True, name="stub-server").start()
+    return stub
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _get_json(url, timeout=5):
+    with urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+class Backend:
+    """gunicorn running app.py with its upstream and providers pointed at the stub."""
+
+    def __init__(self, stub, args, env_overrides):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.log = tempfile.NamedTemporaryFile(prefix='loadtest-backend-', suffix='.log', delete=False)
+        self.pidfile = os.path.join(tempfile.gettempdir(), f"loadtest-gunicorn-{self.port}.pid")
+
+        env = dict(os.environ)
+        env.update({
+            'OPENROUTER_SERVER_URL': f"{stub.url}/v1",
+            'OPENROUTER_API_KEY': 'stub-key',
+            'OPENROUTER_MODEL': 'stub-model',
+            'RATELIMIT_ENABLED': 'false',
+            'ENABLE_LANGCHAIN_TOOLS': 'false',
+        })
+        if not args.live_providers:
+            env['PROVIDER_STUB_URL'] = stub.url
+        env.update(env_overrides)
+
+        command = [
+            sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+            '--bind', f"127.0.0.1:{self.port}",
+            '--workers', str(args.workers),
+            '--pid', self.pidfile,
+            'app:app',
+        ]
+        self.process = subprocess.Popen(
+            command, cwd=BACKEND_DIR, env=env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+
+    def wait_ready(self, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Backend exited early; see {self.log.name}")
+            try:
+                return _get_json(f"{self.url}/api/health", timeout=2)
+            except (URLError, OSError, ValueError):
+                time.sleep(0.25)
+        raise RuntimeError(f"Backend not healthy after {timeout}s; see {self.log.name}")
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.log.close()
+
+
+def build_workload(args):
+    """Deterministic list of (request_id, prompt) for a given seed."""
+    rng = random.Random(args.seed)
+    workload = []
+    for request_id in range(args.warmup + args.requests):
+        roll = rng.random()
+        if roll < args.time_ratio:
+            prompt = rng.choice(TIME_PROMPTS)
+        elif roll < args.time_ratio + args.web_ratio:
+            prompt = rng.choice(WEB_PROMPTS)
+        else:
+            prompt = rng.choice(PLAIN_PROMPTS)
+        # The id suffix keeps identical prompts from turning into response-cache hits.
+        workload.append((request_id, f"{prompt} (#{request_id})"))
+    return workload
+
+
+def send_chat(base_url, request_id, prompt, overrides, timeout):
+    payload = {
+        'messages': [{'role': 'user', 'content': prompt}],
+        'mode': 'convince-ai',
+        'roastLevel': 5,
+    }
+    payload.update(overrides)
+    req = Request(
+        url=f"{base_url}/api/chat",
+        data=json.dumps(payload).encode('utf-8'),
+        method='POST',
+        headers={'Content-Type': 'application/json'},
+    )
+
+    started = time.perf_counter()
+    try:
+        with urlopen(req, timeout=timeout) as response:
+            data = json.loads(response.read())
+            status = response.status
+    except HTTPError as e:
+        return {'id': request_id, 'status': e.code, 'ok': False, 'latency': time.perf_counter() - started}
+    except (URLError, OSError) as e:
+        return {'id': request_id, 'status': type(e).__name__, 'ok': False, 'latency': time.perf_counter() - started}
+
+    # A fallback reply is a 200 with success set too, but it never reached the upstream.
+    fallback = bool(data.get('upstream_failed'))
+    return {
+        'id': request_id,
+        'status': status,
+        'ok': bool(data.get('success')) and not fallback,
+        'fallback': fallback,
+        'latency': time.perf_counter() - started,
+        'method': data.get('processing_method', 'unknown'),
+    }
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(results, wall_seconds, expected_method):
+    latencies = sorted(r['latency'] * 1000 for r in results if r['ok'])
+    fallbacks = sum(1 for r in results if r.get('fallback'))
+    statuses = {}
+    methods = {}
+    for r in results:
+        statuses[str(r['status'])] = statuses.get(str(r['status']), 0) + 1
+        if r.get('method'):
+            methods[r['method']] = methods.get(r['method'], 0) + 1
+
+    return {
+        'requests': len(results),
+        'ok': len(latencies),
+        'errors': len(results) - len(latencies) - fallbacks,
+        'fallbacks': fallbacks,
+        'statuses': statuses,
+        'processing_methods': methods,
+        'unexpected_method': sum(n for m, n in methods.items() if m != expected_method),
+        'throughput_rps': round(len(latencies) / wall_seconds, 2) if wall_seconds else 0.0,
+        'wall_s': round(wall_seconds, 3),
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies), 1) if latencies else 0.0,
+            'p50': round(_percentile(latencies, 50), 1),
+            'p90': round(_percentile(latencies, 90), 1),
+            'p99': round(_percentile(latencies, 99), 1),
+            'max': round(latencies[-1], 1) if latencies else 0.0,
+        },
+    }
+
+
+def run_path(name, stub, args, workload):
+    overrides, env_overrides, expected_method = PATHS[name]
+    backend = Backend(stub, args, env_overrides)
+    try:
+        backend.wait_ready()
+        warmup, measured = workload[:args.warmup], workload[args.warmup:]
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda item: send_chat(backend.url, *item, overrides, args.timeout), warmup))
+            stub.snapshot()
+
+            started = time.perf_counter()
+            results = list(pool.map(lambda item: send_chat(backend.url, *item, overrides, args.timeout), measured))
+            wall = time.perf_counter() - started
+
+        report = summarize(results, wall, expected_method)
+        report['stub'] = stub.snapshot()
+        try:
+            metrics = _get_json(f"{backend.url}/api/metrics")
+            report['server_stage_p50_ms'] = {
+                stage: values.get('p50_ms')
+                for stage, values in (metrics.get('stage_latency') or {}).get('stages', {}).items()
+            }
+        except (URLError, OSError, ValueError):
+            pass
+        return report
+    finally:
+        backend.stop()
+        if args.keep_logs:
+            print(f"   backend log ({name}): {backend.log.name}", file=sys.stderr)
+        else:
+            os.unlink(backend.log.name)
+
+
+def add_stub_arguments(parser):
+    """Stub and backend options shared with replay_traffic.py."""
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--upstream-latency', default='lognormal:800:0.4',
+                        help='fixed:MS | uniform:LO:HI | exp:MEAN | lognormal:MEDIAN:SIGMA')
+    parser.add_argument('--provider-latency', default='lognormal:120:0.5', help='Latency model for stub web/time providers')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of upstream calls that fail')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status for injected upstream failures')
+    parser.add_argument('--stream-chunks', type=int, default=8, help='SSE chunks per streamed completion')
+    parser.add_argument('--reply-words', type=int, default=40, help='Words in each stub reply')
+    parser.add_argument('--live-providers', action='store_true', help='Send web/time lookups to the real providers')
+    parser.add_argument('--seed', type=int, default=1234, help='Seed for workload, latencies and injected errors')
+    parser.add_argument('--stub-port', type=int, default=0, help='Port for the stub server (0 = any free port)')
+    parser.add_argument('--keep-logs', action='store_true', help='Keep backend logs and print their paths')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline load test against a stubbed upstream')
+    parser.add_argument('--paths', default='sync,hybrid,async', help='Comma-separated subset of sync,hybrid,async')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per path')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests sent first')
+    parser.add_argument('--concurrency', type=int, default=20, help='Concurrent client connections')
+    parser.add_argument('--timeout', type=float, default=120, help='Client timeout per request (s)')
+    parser.add_argument('--web-ratio', type=float, default=0.2, help='Fraction of prompts that trigger web enrichment')
+    parser.add_argument('--time-ratio', type=float, default=0.1, help='Fraction of prompts that trigger live time')
+    add_stub_arguments(parser)
+    parser.add_argument('--stub-only', action='store_true', help='Only run the stub, e.g. for test_performance.py')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+    args = parser.parse_args()
+
+    paths = [p.strip() for p in args.paths.split(',') if p.strip()]
+    unknown = [p for p in paths if p not in PATHS]
+    if unknown:
+        parser.error(f"unknown path(s): {', '.join(unknown)}")
+
+    stub = start_stub(args)
+
+    if args.stub_only:
+        print(f"🧪 Stub upstream listening on {stub.url}")
+        print(f"   OPENROUTER_SERVER_URL={stub.url}/v1")
+        print(f"   PROVIDER_STUB_URL={stub.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return
+
+    workload = build_workload(args)
+    report = {
+        'config': {
+            key: getattr(args, key)
+            for key in (
+                'requests', 'warmup', 'concurrency', 'workers', 'upstream_latency', 'provider_latency',
+                'error_rate', 'error_status', 'web_ratio', 'time_ratio', 'live_providers', 'seed',
+            )
+        },
+        'paths': {},
+    }
+    if 'async' in paths and not all(
+        importlib.util.find_spec(name) for name in ('langchain_core', 'langchain_openai')
+    ):
+        report['skipped'] = {'async': 'langchain-openai is not installed'}
+        paths.remove('async')
+
+    try:
+        for name in paths:
+            if not args.json:
+                print(f"⏳ Running {name} path...", file=sys.stderr)
+            report['paths'][name] = run_path(name, stub, args, workload)
+    finally:
+        stub.shutdown()
+        stub.server_close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    fallbacks = {name: row['fallbacks'] for name, row in report['paths'].items() if row['fallbacks']}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        if fallbacks:
+            sys.exit(1)
+        return
+
+    print("🚀 Offline Load Test")
+    print("=" * 70)
+    print(f"   {args.requests} requests x {args.concurrency} concurrent, {args.workers} workers, seed {args.seed}")
+    print(f"   upstream {args.upstream_latency}, providers {args.provider_latency}, error rate {args.error_rate:.0%}")
+    print(f"{'path':<8}{'ok':>6}{'err':>6}{'fb':>6}{'rps':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, row in report['paths'].items():
+        lat = row['latency_ms']
+        print(
+            f"{name:<8}{row['ok']:>6}{row['errors']:>6}{row['fallbacks']:>6}{row['throughput_rps']:>9.1f}"
+            f"{lat['p50']:>10.1f}{lat['p90']:>10.1f}{lat['p99']:>10.1f}{lat['max']:>10.1f}"
+        )
+        if row['unexpected_method']:
+            print(f"   ⚠️ {row['unexpected_method']} {name} requests were served by another path: {row['processing_methods']}")
+    for name, reason in report.get('skipped', {}).items():
+        print(f"   ⏭️ {name} skipped: {reason}")
+    if fallbacks:
+        print(f"   ❌ fallback replies (the upstream was never reached): {fallbacks}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
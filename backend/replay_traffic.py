@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Replay captured /api/chat traffic shapes against a backend
+Rebuilds requests from a CAPTURE_FILE (lengths, turns, intents, repeats) and re-issues them on the original schedule
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from loadtest_offline import Backend, _percentile, add_stub_arguments, send_chat, start_stub
+
+# None of these match the time or web intent patterns in app.py, so only the
+# openers below decide which intent a rebuilt message has.
+FILLER_WORDS = [
+    "bro", "honestly", "pizza", "guitar", "weekend", "coffee", "hiking", "bot", "human", "typing",
+    "funny", "sunset", "cat", "movie", "song", "prove", "really", "maybe", "friend", "laptop",
+]
+TIME_OPENER = "what time is it in frankfurt"
+WEB_OPENER = "search the latest news on"
+
+
+def load_capture(path, limit=None):
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    records.sort(key=lambda r: r['ts'])
+    return records[:limit] if limit else records
+
+
+def synth_text(seed, length, opener=""):
+    """Deterministic filler text of about `length` characters, starting with opener."""
+    rng = random.Random(seed)
+    text = opener
+    while len(text) < length:
+        text += (" " if text else "") + rng.choice(FILLER_WORDS)
+    return text[:max(length, len(opener))]
+
+
+def classify(record):
+    if record.get('time_sensitive'):
+        return 'time'
+    if record.get('web'):
+        return 'web'
+    return 'plain'
+
+
+def rebuild_messages(record):
+    """Messages with the captured roles, lengths and intent.
+
+    The last three messages derive from the cache digest, so requests that
+    were response-cache repeats in the capture are repeats again; earlier
+    turns derive from the conversation digest and stay stable across turns.
+    """
+    shape = record['messages']
+    count = len(shape)
+    conversation = record.get('conversation') or record['cache_digest']
+    user_indexes = [i for i, (role, _) in enumerate(shape) if role == 'user']
+    last_user = user_indexes[-1] if user_indexes else None
+    opener = {'time': TIME_OPENER, 'web': WEB_OPENER}.get(classify(record), "")
+
+    messages = []
+    for index, (role, length) in enumerate(shape):
+        if index >= count - 3:
+            seed = f"{record['cache_digest']}:{count - index}"
+        else:
+            seed = f"{conversation}:{index}"
+        text = synth_text(seed, length, opener if index == last_user else "")
+        messages.append({'role': role, 'content': text})
+    return messages
+
+
+def replay(records, base_url, speed, max_in_flight, timeout):
+    """Send every record at its captured offset / speed; returns per-request results."""
+    start_ts = records[0]['ts']
+    results = []
+    results_lock = threading.Lock()
+
+    def fire(record, scheduled_at):
+        overrides = {
+            'messages': rebuild_messages(record),
+            'mode': record.get('mode', 'convince-ai'),
+            'roastLevel': record.get('roast_level', 5),
+            'useAsync': record.get('use_async', True),
+        }
+        result = send_chat(base_url, record['cache_digest'], "", overrides, timeout)
+        # Time from the scheduled send, so client-side backlog counts too.
+        result['latency'] = time.perf_counter() - scheduled_at
+        result['category'] = classify(record)
+        result['captured_ms'] = record.get('latency_ms')
+        with results_lock:
+            results.append(result)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        started = time.perf_counter()
+        for record in records:
+            scheduled_at = started + (record['ts'] - start_ts) / speed
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, record, scheduled_at)
+    return results, time.perf_counter() - started
+
+
+def summarize_replay(results, wall_seconds):
+    groups = {'all': results}
+    for result in results:
+        groups.setdefault(result['category'], []).append(result)
+
+    summary = {}
+    for name, rows in groups.items():
+        latencies = sorted(r['latency'] * 1000 for r in rows if r['ok'])
+        captured = sorted(r['captured_ms'] for r in rows if r.get('captured_ms') is not None)
+        summary[name] = {
+            'requests': len(rows),
+            'ok': len(latencies),
+            'fallbacks': sum(1 for r in rows if r.get('fallback')),
+            'p50_ms': round(_percentile(latencies, 50), 1),
+            'p90_ms': round(_percentile(latencies, 90), 1),
+            'p99_ms': round(_percentile(latencies, 99), 1),
+            'captured_p50_ms': round(_percentile(captured, 50), 1),
+            'captured_p99_ms': round(_percentile(captured, 99), 1),
+        }
+    summary['all']['throughput_rps'] = round(summary['all']['ok'] / wall_seconds, 2) if wall_seconds else 0.0
+    summary['all']['wall_s'] = round(wall_seconds, 3)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay captured chat traffic against a backend')
+    parser.add_argument('capture', help='JSON-lines file written with CAPTURE_FILE')
+    parser.add_argument('--url', help='Replay against this backend instead of a local gunicorn on the stub')
+    parser.add_argument('--speed', type=float, default=1.0, help='Time compression (2 = twice the captured rate)')
+    parser.add_argument('--limit', type=int, help='Replay only the first N captured requests')
+    parser.add_argument('--max-in-flight', type=int, default=200, help='Client threads for outstanding requests')
+    parser.add_argument('--timeout', type=float, default=120, help='Client timeout per request (s)')
+    add_stub_arguments(parser)
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+    args = parser.parse_args()
+
+    records = load_capture(args.capture, args.limit)
+    if not records:
+        parser.error(f"no records in {args.capture}")
+
+    stub = backend = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        stub = start_stub(args)
+        backend = Backend(stub, args, {})
+        backend.wait_ready()
+        base_url = backend.url
+
+    try:
+        if not args.json:
+            span = records[-1]['ts'] - records[0]['ts']
+            print(f"⏳ Replaying {len(records)} requests captured over {span:.0f}s at {args.speed:g}x...", file=sys.stderr)
+        results, wall = replay(records, base_url, args.speed, args.max_in_flight, args.timeout)
+        report = {
+            'capture': os.path.abspath(args.capture),
+            'speed': args.speed,
+            'target': args.url or 'offline stub',
+            'summary': summarize_replay(results, wall),
+        }
+        if stub is not None:
+            counters = stub.snapshot()
+            report['stub'] = counters
+            ok = report['summary']['all']['ok']
+            if ok and not args.error_rate:
+                # Each request that did not reach the upstream was served from cache.
+                report['summary']['all']['upstream_calls_per_request'] = round(counters.get('upstream_calls', 0) / ok, 3)
+    finally:
+        if backend is not None:
+            backend.stop()
+            if args.keep_logs:
+                print(f"   backend log: {backend.log.name}", file=sys.stderr)
+            else:
+                os.unlink(backend.log.name)
+        if stub is not None:
+            stub.shutdown()
+            stub.server_close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("🚀 Traffic Replay")
+    print("=" * 70)
+    print(f"   {args.capture} at {args.speed:g}x against {report['target']}")
+    print(f"{'class':<8}{'n':>6}{'ok':>6}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'cap p50':>10}{'cap p99':>10}")
+    for name, row in report['summary'].items():
+        print(
+            f"{name:<8}{row['requests']:>6}{row['ok']:>6}{row['p50_ms']:>10.1f}{row['p90_ms']:>10.1f}"
+            f"{row['p99_ms']:>10.1f}{row['captured_p50_ms']:>10.1f}{row['captured_p99_ms']:>10.1f}"
+        )
+    all_row = report['summary']['all']
+    print(f"📊 Throughput: {all_row['throughput_rps']:.2f} req/s")
+    if 'upstream_calls_per_request' in all_row:
+        print(f"🔁 Upstream calls per request: {all_row['upstream_calls_per_request']:.2f} (below 1 = response-cache hits)")
+
+
+if __name__ == "__main__":
+    main()
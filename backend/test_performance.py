@@ -8,19 +8,109 @@ import asyncio
 import aiohttp
 import time
 import json
+import math
+import random
 import statistics
 from concurrent.futures import ThreadPoolExecutor
 import argparse
 
+REPORT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    """HDR-style latency histogram in microseconds.
+
+    Log-linear buckets keep a fixed relative error (2 significant digits by
+    default) from 1µs to hours with O(1) recording, so tail percentiles stay
+    accurate no matter how many samples a soak run collects.
+    """
+
+    def __init__(self, significant_digits=2):
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.counts = {}
+        self.total = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    def _key(self, value_us):
+        shift = max(0, value_us.bit_length() - self.sub_bucket_bits)
+        return (value_us >> shift) << shift, shift
+
+    def record(self, seconds, count=1):
+        value_us = max(1, int(seconds * 1_000_000))
+        key = self._key(value_us)
+        self.counts[key] = self.counts.get(key, 0) + count
+        self.total += count
+        self.sum_us += value_us * count
+        self.max_us = max(self.max_us, value_us)
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.total += other.total
+        self.sum_us += other.sum_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, pct):
+        """Highest value (ms) in the bucket holding the pct-th percentile."""
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100 * self.total))
+        seen = 0
+        for (lowest, shift) in sorted(self.counts):
+            seen += self.counts[(lowest, shift)]
+            if seen >= rank:
+                return min(lowest + (1 << shift) - 1, self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self):
+        return {
+            'count': self.total,
+            'mean_ms': round(self.sum_us / self.total / 1000, 2) if self.total else 0.0,
+            **{f"p{pct:g}_ms": round(self.percentile(pct), 2) for pct in REPORT_PERCENTILES},
+            'max_ms': round(self.max_us / 1000, 2),
+        }
+
+
+def arrival_offsets(profile, rate, duration, arrival='poisson', start_rate=None, seed=None):
+    """Intended send times (seconds from start) for an open-loop run.
+
+    constant/soak hold `rate` req/s; ramp goes linearly from `start_rate` to
+    `rate` over the run. Poisson arrivals draw exponential gaps at the current
+    rate, constant arrivals space requests evenly.
+    """
+    rng = random.Random(seed)
+    if profile == 'ramp':
+        low = start_rate if start_rate is not None else rate / 10
+    else:
+        low = rate
+
+    offsets = []
+    t = 0.0
+    while True:
+        current_rate = low + (rate - low) * (t / duration) if duration else rate
+        current_rate = max(current_rate, 1e-3)
+        t += rng.expovariate(current_rate) if arrival == 'poisson' else 1 / current_rate
+        if t >= duration:
+            return offsets
+        offsets.append(t)
+
+
 class BackendPerformanceTester:
     def __init__(self, base_url="http://localhost:4343", max_workers=20):
         self.base_url = base_url
         self.max_workers = max_workers
         self.results = []
         
-    async def send_request(self, session, request_id, use_async=True):
-        """Send a single chat request"""
+    async def send_request(self, session, request_id, use_async=True, scheduled_at=None):
+        """Send a single chat request
+
+        scheduled_at is the time the request was meant to go out (open-loop
+        runs); latency measured from it includes any time spent waiting on
+        the client side, which corrects for coordinated omission.
+        """
         start_time = time.time()
+        intended_start = scheduled_at if scheduled_at is not None else start_time
         
         payload = {
             "messages": [
@@ -41,6 +131,7 @@ class BackendPerformanceTester:
                         'request_id': request_id,
                         'success': True,
                         'response_time': processing_time,
+                        'corrected_time': processing_time + (start_time - intended_start),
                         'server_processing_time': data.get('processing_time', 0),
                         'processing_method': data.get('processing_method', 'unknown'),
                         'queue_size': data.get('queue_size', 0)
@@ -99,6 +190,10 @@ class BackendPerformanceTester:
             print(f"   Median:  {statistics.median(response_times):.2f}s")
             print(f"   Min:     {min(response_times):.2f}s")
             print(f"   Max:     {max(response_times):.2f}s")
+            histogram = LatencyHistogram()
+            for value in response_times:
+                histogram.record(value)
+            print("   " + "  ".join(f"p{pct:g}: {histogram.percentile(pct) / 1000:.2f}s" for pct in REPORT_PERCENTILES))
             
             print(f"🖥️  Server Processing Times:")
             print(f"   Average: {statistics.mean(server_times):.2f}s")
@@ -119,6 +214,102 @@ class BackendPerformanceTester:
             'throughput': len(successful_results) / total_time if total_time > 0 else 0
         }
     
+    async def test_open_loop(self, rate=5.0, duration=60.0, profile='constant', arrival='poisson',
+                             use_async=True, start_rate=None, window=10.0, seed=None, label=None):
+        """Open-loop test: requests leave on a fixed schedule whether or not earlier ones finished
+
+        A closed loop (fire N, wait for all) slows its own sending when the server
+        stalls, so the slow period is sampled less and the tail looks better than
+        users see it. Here each request is timed from its scheduled send time.
+        """
+        offsets = arrival_offsets(profile, rate, duration, arrival, start_rate, seed)
+        print(f"🧪 Open-loop {profile} test: {len(offsets)} requests over {duration:.0f}s "
+              f"({arrival} arrivals, target {rate:g} req/s, async={use_async})...")
+
+        connector = aiohttp.TCPConnector(limit=0)
+        timeout = aiohttp.ClientTimeout(total=120)
+        corrected = LatencyHistogram()
+        service = LatencyHistogram()
+        windows = {}
+        errors = {}
+        methods = {}
+        max_send_lag = 0.0
+
+        async def fire(request_id, scheduled_at):
+            result = await self.send_request(session, request_id, use_async, scheduled_at)
+            window_index = int((scheduled_at - start_time) // window) if window else 0
+            if not result.get('success'):
+                errors[result.get('error', 'unknown')] = errors.get(result.get('error', 'unknown'), 0) + 1
+                return
+            corrected.record(result['corrected_time'])
+            service.record(result['response_time'])
+            windows.setdefault(window_index, LatencyHistogram()).record(result['corrected_time'])
+            method = result.get('processing_method', 'unknown')
+            methods[method] = methods.get(method, 0) + 1
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            start_time = time.time()
+            tasks = []
+            for request_id, offset in enumerate(offsets):
+                scheduled_at = start_time + offset
+                delay = scheduled_at - time.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    max_send_lag = max(max_send_lag, -delay)
+                tasks.append(asyncio.create_task(fire(request_id, scheduled_at)))
+            await asyncio.gather(*tasks)
+        total_time = time.time() - start_time
+
+        report = {
+            'label': label,
+            'config': {
+                'profile': profile,
+                'arrival': arrival,
+                'rate': rate,
+                'start_rate': start_rate if profile == 'ramp' else None,
+                'duration': duration,
+                'window': window,
+                'use_async': use_async,
+                'seed': seed,
+                'base_url': self.base_url,
+            },
+            'requests': len(offsets),
+            'successful': corrected.total,
+            'errors': errors,
+            'processing_methods': methods,
+            'total_time': round(total_time, 3),
+            'offered_rate': round(len(offsets) / duration, 3) if duration else 0.0,
+            'throughput': round(corrected.total / total_time, 3) if total_time > 0 else 0,
+            'max_send_lag_ms': round(max_send_lag * 1000, 2),
+            # Corrected: from scheduled send. Service: from actual send.
+            'latency_corrected': corrected.summary(),
+            'latency_service': service.summary(),
+            'windows': [
+                {'start_s': index * window, **windows[index].summary()}
+                for index in sorted(windows)
+            ],
+        }
+
+        print(f"✅ Completed in {total_time:.2f} seconds")
+        print(f"📊 Success: {corrected.total}/{len(offsets)}  Throughput: {report['throughput']:.2f} req/s "
+              f"(offered {report['offered_rate']:.2f})")
+        if errors:
+            print(f"❌ Errors: {errors}")
+        for name, summary in (('Corrected', report['latency_corrected']), ('Service', report['latency_service'])):
+            print(f"⏱️  {name:<9} " + "  ".join(
+                f"p{pct:g}: {summary[f'p{pct:g}_ms'] / 1000:.2f}s" for pct in REPORT_PERCENTILES
+            ) + f"  max: {summary['max_ms'] / 1000:.2f}s")
+        if profile in ('ramp', 'soak') and report['windows']:
+            print(f"📈 Per-{window:g}s window (corrected):")
+            for row in report['windows']:
+                print(f"   t={row['start_s']:>6.0f}s  n={row['count']:>5}  p50: {row['p50_ms'] / 1000:.2f}s  "
+                      f"p99: {row['p99_ms'] / 1000:.2f}s  max: {row['max_ms'] / 1000:.2f}s")
+        if max_send_lag > 0.05:
+            print(f"⚠️  Load generator fell {max_send_lag * 1000:.0f}ms behind schedule; results are still corrected")
+        print(f"🔧 Processing Methods: {methods}")
+        return report
+
     async def check_server_health(self):
         """Check if the server is running and healthy"""
         try:
@@ -198,9 +389,24 @@ async def main():
     parser = argparse.ArgumentParser(description='Test AI Chat Backend Performance')
     parser.add_argument('--url', default='http://localhost:4343', help='Backend URL')
     parser.add_argument('--requests', type=int, default=20, help='Number of concurrent requests')
-    parser.add_argument('--mode', choices=['health', 'simple', 'comprehensive'], default='comprehensive', help='Test mode')
+    parser.add_argument('--mode', choices=['health', 'simple', 'comprehensive', 'open-loop'], default='comprehensive', help='Test mode')
+    parser.add_argument('--rate', type=float, default=5.0, help='Open-loop target arrival rate (req/s)')
+    parser.add_argument('--duration', type=float, default=60.0, help='Open-loop run length (s)')
+    parser.add_argument('--profile', choices=['constant', 'ramp', 'soak'], default='constant', help='Open-loop load profile')
+    parser.add_argument('--start-rate', type=float, help='Ramp starting rate (default: rate / 10)')
+    parser.add_argument('--arrival', choices=['constant', 'poisson'], default='poisson', help='Inter-arrival distribution')
+    parser.add_argument('--window', type=float, default=10.0, help='Seconds per reporting window for ramp/soak')
+    parser.add_argument('--seed', type=int, help='Seed for Poisson arrivals')
+    parser.add_argument('--sync', action='store_true', help='Send useAsync=false in open-loop mode')
+    parser.add_argument('--label', help='Build label stored in the JSON report')
+    parser.add_argument('--json-out', help='Write the open-loop report as JSON to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='Compare two open-loop JSON reports and exit')
     
     args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
     
     tester = BackendPerformanceTester(args.url)
     
@@ -208,8 +414,47 @@ async def main():
         await tester.check_server_health()
     elif args.mode == 'simple':
         await tester.test_concurrent_requests(args.requests)
+    elif args.mode == 'open-loop':
+        duration = args.duration
+        if args.profile == 'soak' and duration == parser.get_default('duration'):
+            duration = 1800.0
+        report = await tester.test_open_loop(
+            rate=args.rate,
+            duration=duration,
+            profile=args.profile,
+            arrival=args.arrival,
+            use_async=not args.sync,
+            start_rate=args.start_rate,
+            window=args.window,
+            seed=args.seed,
+            label=args.label,
+        )
+        if args.json_out:
+            with open(args.json_out, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"💾 Report written to {args.json_out}")
     else:
         await tester.run_comprehensive_test()
 
+
+def compare_reports(base_path, new_path):
+    """Print corrected-latency percentiles and throughput of two open-loop reports side by side"""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"📊 {base.get('label') or base_path}  vs  {new.get('label') or new_path}")
+    print(f"{'metric':<14}{'base':>12}{'new':>12}{'change':>10}")
+    rows = [(f"p{pct:g}_ms", base['latency_corrected'], new['latency_corrected']) for pct in REPORT_PERCENTILES]
+    rows.append(('max_ms', base['latency_corrected'], new['latency_corrected']))
+    rows.append(('throughput', base, new))
+    for key, before, after in rows:
+        old_value, new_value = before.get(key, 0), after.get(key, 0)
+        change = f"{(new_value / old_value - 1) * 100:+.1f}%" if old_value else "n/a"
+        print(f"{key:<14}{old_value:>12.2f}{new_value:>12.2f}{change:>10}")
+    if base.get('config') != new.get('config'):
+        print("⚠️  Run configs differ; compare with care")
+
 if __name__ == "__main__":
     asyncio.run(main())